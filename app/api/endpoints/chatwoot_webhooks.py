@@ -5,6 +5,7 @@ from fastapi import APIRouter, Request, HTTPException
 from typing import Any, Dict, Optional, Tuple, List
 
 from app.core.config import settings
+from app.core.logs import get_logger
 from app.api.services.tenant_service import TenantService
 from app.api.services.evolution_service import EvolutionService
 
@@ -12,16 +13,19 @@ from app.api.services.evolution_service import EvolutionService
 router = APIRouter(prefix="/integrations/chatwoot", tags=["Chatwoot Webhooks"])
 
 
+_log = get_logger("chatwoot.webhook")
+
+
 def log_info(msg: str, extra: dict | None = None):
-    print(f"CHATWOOT_WEBHOOK_INFO: {msg} extra={extra or {}}")
+    _log.info("CHATWOOT_WEBHOOK_INFO", step=msg, extra=extra or {})
 
 
 def log_ignore(reason: str, extra: dict | None = None):
-    print(f"CHATWOOT_WEBHOOK_IGNORED: reason={reason} extra={extra or {}}")
+    _log.info("CHATWOOT_WEBHOOK_IGNORED", reason=reason, extra=extra or {})
 
 
 def log_err(msg: str, extra: dict | None = None):
-    print(f"CHATWOOT_WEBHOOK_ERROR: {msg} extra={extra or {}}")
+    _log.error("CHATWOOT_WEBHOOK_ERROR", step=msg, extra=extra or {})
 
 
 def _dig_only(s: str) -> str:
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.api.models.disponibilidade import ProfissionalDisponibilidade
+from app.api.services.google_token_service import GoogleTokenNotFound
+from app.api.services.slot_service import SlotService
 from app.schemas.disponibilidade import DisponibilidadePayload
 
 router = APIRouter()
@@ -54,4 +59,34 @@ def salvar_disponibilidade(payload: DisponibilidadePayload, db: Session = Depend
 
     db.commit()
 
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@router.get("/profissionais/{user_id}/horarios-livres")
+def get_horarios_livres(
+    user_id: int,
+    inicio: Optional[date] = Query(None, description="Primeiro dia (YYYY-MM-DD); padrão = hoje no fuso do profissional"),
+    dias: int = Query(7, ge=1, description="Quantidade de dias a partir de `inicio`"),
+    db: Session = Depends(get_db),
+):
+    try:
+        return SlotService.free_slots(db, user_id, first_day=inicio, days=dias)
+    except GoogleTokenNotFound as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/profissionais/{user_id}/proximos-horarios")
+def get_proximos_horarios(
+    user_id: int,
+    n: int = Query(3, ge=1, le=50, description="Quantos horários devolver"),
+    dias: Optional[int] = Query(None, ge=1, description="Horizonte de busca em dias"),
+    db: Session = Depends(get_db),
+):
+    try:
+        return SlotService.next_slots(db, user_id, n=n, days=dias)
+    except GoogleTokenNotFound as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -4,6 +4,7 @@ from typing import List, Literal, Optional, Any, Dict
 
 from app.core.security import verify_n8n_api_key
 from app.api.services.evolution_service import EvolutionService
+from app.api.services.outbound_dispatcher import OutboundDispatcher
 
 router = APIRouter(prefix="/evolution", tags=["Evolution"])
 
@@ -256,3 +257,72 @@ def evo_webhook_find(instance_name: str):
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Evolution error: {str(e)}")
 
+
+
+class TrimWebhookIn(BaseModel):
+    # vazio = EVOLUTION_WEBHOOK_EVENTS
+    events: Optional[List[str]] = None
+
+
+@router.post("/webhook/{instance_name}/trim", response_model=WebhookOut, dependencies=[Depends(verify_n8n_api_key)])
+def evo_webhook_trim(instance_name: str, payload: Optional[TrimWebhookIn] = None):
+    """Remove da instância as assinaturas de eventos que o backend ignora (mantém url/flags)."""
+    try:
+        raw = EvolutionService.trim_webhook_events(
+            instance_name=instance_name,
+            events=payload.events if payload else None,
+        )
+        return {"ok": True, "instance_name": instance_name, "evolution_raw": raw}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Evolution error: {str(e)}")
+
+
+
+# ======================
+# Fila de saída (envio com ritmo por instância)
+# ======================
+
+class OutboundMessageIn(BaseModel):
+    instance_name: str = Field(..., examples=["tenant_1"])
+    # número SEM "+" e SEM espaços. Ex: 553499190547
+    to_number: str = Field(..., min_length=10, max_length=20, examples=["553499190547"])
+    text: Optional[str] = None
+    audio_url: Optional[str] = None
+    # id externo (ex.: id do lembrete): reenvio com o mesmo reference não duplica
+    reference: Optional[str] = None
+
+
+class OutboundBatchIn(BaseModel):
+    messages: List[OutboundMessageIn] = Field(..., min_length=1, max_length=500)
+
+
+@router.post("/outbound", dependencies=[Depends(verify_n8n_api_key)])
+async def evo_outbound_enqueue(payload: OutboundBatchIn):
+    """Enfileira envios (ex.: lote de lembretes) e responde na hora; acompanhar por GET /evolution/outbound/{id}."""
+    for m in payload.messages:
+        if not (m.text or "").strip() and not m.audio_url:
+            raise HTTPException(status_code=422, detail=f"mensagem sem text/audio_url (to={m.to_number})")
+
+    items = []
+    for m in payload.messages:
+        items.append(
+            await OutboundDispatcher.enqueue(
+                instance_name=m.instance_name,
+                to_number="".join(ch for ch in m.to_number if ch.isdigit()),
+                text=None if m.audio_url else m.text.strip(),
+                media_url=m.audio_url,
+                source="api",
+                reference=m.reference,
+            )
+        )
+    return {"ok": True, "items": items}
+
+
+@router.get("/outbound/{message_id}", dependencies=[Depends(verify_n8n_api_key)])
+def evo_outbound_status(message_id: int):
+    item = OutboundDispatcher.get_item(message_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="mensagem não encontrada")
+    return item
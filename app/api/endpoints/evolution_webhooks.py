@@ -1,33 +1,42 @@
 from __future__ import annotations
 
-import base64
-import json
+import mimetypes
+from functools import partial
 from fastapi import APIRouter, Request
-from typing import Any, Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, BinaryIO, Dict, Optional
 
+from app.core.circuit import find_circuit_open
 from app.core.config import settings
-from app.api.services.chatwoot_service import ChatwootService
+from app.core.logs import get_logger
+from app.core.media import MediaTooLarge, extract_base64_payload, open_base64_media
+from app.core.media_store import media_store, normalize_sha256
+from app.api.services.chatwoot_service import ChatwootService, AsyncChatwootService, ChatwootNotFound
+from app.api.services.chatwoot_resolution_service import ChatwootResolutionService
 from app.api.services.tenant_service import TenantService
-from app.api.services.evolution_service import EvolutionService
+from app.api.services.evolution_service import AsyncEvolutionService
 from app.db.session import SessionLocal
 from app.api.services.conversation_map_service import ConversationMapService
+from app.api.services.evolution_ingest_service import EvolutionIngestService
+from app.api.services.evolution_prefilter import EvolutionPrefilter
+from app.api.services.dead_letter_service import DeadLetterService
 
 router = APIRouter(prefix="/webhooks/evolution", tags=["Evolution Webhooks"])
 
 
+_log = get_logger("evolution.webhook")
+
+
 def log_ignore(instance_name: str, reason: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"EVOLUTION_IGNORED: instance={instance_name} reason={reason} extra={extra}")
+    _log.info("EVOLUTION_IGNORED", instance=instance_name, reason=reason, extra=extra or {})
 
 
 def log_info(instance_name: str, msg: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"EVOLUTION_INFO: instance={instance_name} msg={msg} extra={extra}")
+    _log.info("EVOLUTION_INFO", instance=instance_name, step=msg, extra=extra or {})
 
 
 def log_err(instance_name: str, msg: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"EVOLUTION_ERROR: instance={instance_name} msg={msg} extra={extra}")
+    _log.error("EVOLUTION_ERROR", instance=instance_name, step=msg, extra=extra or {})
 
 
 def extract_instance_name(payload: Dict[str, Any]) -> Optional[str]:
@@ -233,40 +242,148 @@ def safe_extract_id(obj: Any, label: str, instance_name: str) -> Optional[int]:
         return None
 
 
-@router.post("/{event}")
-async def evolution_webhook(event: str, request: Request):
-    payload: Dict[str, Any] = await request.json()
+def save_conversation_map(instance_name: str, account_id: int, conversation_id: int, phone: str) -> None:
+    try:
+        db = SessionLocal()
+        try:
+            ConversationMapService.upsert_map(
+                db=db,
+                chatwoot_account_id=account_id,
+                chatwoot_conversation_id=conversation_id,
+                wa_phone_digits=phone,
+            )
+            log_info(
+                instance_name,
+                "cw_map_saved",
+                {
+                    "account_id": account_id,
+                    "conversation_id": conversation_id,
+                    "phone": phone,
+                },
+            )
+        finally:
+            db.close()
+    except Exception as e:
+        log_err(instance_name, "cw_map_save_failed", {"error": repr(e), "conversation_id": conversation_id})
+
+
+async def open_message_media(instance_name: str, message: Dict[str, Any]) -> BinaryIO:
+    """
+    Arquivo (leitura em blocos) com a mídia da mensagem: cache local por fileSha256
+    primeiro; senão baixa da Evolution (resposta lida em streaming, abortada no teto)
+    e grava no cache. Levanta MediaTooLarge.
+    """
+    sha256_hex = normalize_sha256(message.get("file_sha256")) if settings.MEDIA_CACHE_ENABLED else None
+
+    if sha256_hex:
+        cached_path = await run_in_threadpool(media_store.get, sha256_hex)
+        if cached_path:
+            log_info(instance_name, "media_cache_hit", {"sha256": sha256_hex, "type": message.get("type")})
+            return open(cached_path, "rb")
+
+    raw_media_message = message.get("raw_media_message")
+    if not raw_media_message:
+        raise RuntimeError(f"Mídia recebida sem raw_media_message (type={message.get('type')})")
+
+    evo_media = await AsyncEvolutionService.download_media_base64(
+        instance_name=instance_name,
+        message=raw_media_message,
+    )
+
+    possible_base64 = extract_base64_payload(evo_media)
+    if not possible_base64:
+        raise RuntimeError(f"Evolution não retornou base64 da mídia: {list(evo_media.keys()) if isinstance(evo_media, dict) else type(evo_media).__name__}")
+
+    # decodifica sob demanda (sem bytes/JSON intermediários)
+    media_file = open_base64_media(possible_base64)
+
+    if sha256_hex:
+        try:
+            cached_path = await run_in_threadpool(media_store.put, sha256_hex, media_file)
+        except OSError as e:
+            log_err(instance_name, "media_cache_store_failed", {"sha256": sha256_hex, "error": repr(e)})
+            cached_path = None
+        if cached_path:
+            return open(cached_path, "rb")
+        media_file.seek(0)
+
+    return media_file
+
+
+def log_ignore_counted(instance_name: str, reason: str, extra: dict | None = None):
+    """Ignorados do pré-filtro: só contador (log opcional via EVOLUTION_LOG_IGNORED_EVENTS)."""
+    EvolutionPrefilter.count_ignored(reason)
+    if EvolutionPrefilter.log_enabled():
+        log_ignore(instance_name, reason, extra)
+
+
+def prefilter_event(event: str, instance_name: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Filtros baratos (sem I/O) sobre o payload já decodificado.
+    Retorna a resposta de "ignored" ou None se o evento deve ser processado.
+    """
+    if EvolutionPrefilter.check_event(event):
+        log_ignore_counted(instance_name, "non_message_event", {"event": event})
+        return {"ok": True, "ignored": "non_message_event", "event": event}
+
+    if extract_from_me(payload):
+        log_ignore_counted(instance_name, "from_me", {"remote_jid": extract_remote_jid(payload)})
+        return {"ok": True, "ignored": "from_me"}
+
+    remote_jid = extract_remote_jid(payload)
+
+    if isinstance(remote_jid, str) and remote_jid.endswith("@g.us"):
+        log_ignore_counted(instance_name, "group_message", {"remote_jid": remote_jid})
+        return {"ok": True, "ignored": "group_message"}
 
+    return None
+
+
+async def process_evolution_event(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Processa um messages-upsert já pré-filtrado (Chatwoot contato/conversa/mensagem).
+    Levanta exceção em caso de falha — quem chama decide (inline: engole; fila: retry).
+
+    Dedup por key.id: claim antes de tocar no Chatwoot, complete no fim
+    (inclusive nos ignores determinísticos), release se falhar -> retry reprocessa.
+    """
     instance_name = extract_instance_name(payload) or "unknown"
-    msg_type = "n/a"
-    remote_jid = None
-    dedup_key = None
+    remote_jid = extract_remote_jid(payload)
+    dedup_key = extract_dedup_key(payload)
 
-    try:
-        print(f"EVOLUTION_WEBHOOK: event={event} instance={instance_name}")
+    if not dedup_key:
+        return await _process_message(event, payload, instance_name, remote_jid, None)
 
-        if event != "messages-upsert":
-            log_ignore(instance_name, "non_message_event", {"event": event})
-            return {"ok": True, "ignored": "non_message_event", "event": event}
+    claimed = await run_in_threadpool(TenantService.claim_message, instance_name=instance_name, message_id=dedup_key)
+    if not claimed:
+        log_ignore(instance_name, "duplicate", {"message_id": dedup_key, "remote_jid": remote_jid})
+        return {"ok": True, "ignored": "duplicate", "message_id": dedup_key}
+    log_info(instance_name, "dedup_key_new", {"message_id": dedup_key, "remote_jid": remote_jid})
 
-        if extract_from_me(payload):
-            remote_jid = extract_remote_jid(payload)
-            log_ignore(instance_name, "from_me", {"remote_jid": remote_jid})
-            return {"ok": True, "ignored": "from_me"}
+    try:
+        result = await _process_message(event, payload, instance_name, remote_jid, dedup_key)
+    except Exception:
+        try:
+            await run_in_threadpool(TenantService.release_message, instance_name=instance_name, message_id=dedup_key)
+        except Exception as e:
+            log_err(instance_name, "dedup_release_failed", {"message_id": dedup_key, "error": repr(e)})
+        raise
 
-        remote_jid = extract_remote_jid(payload)
+    await run_in_threadpool(TenantService.mark_message_processed, instance_name=instance_name, message_id=dedup_key)
+    log_info(instance_name, "dedup_marked_processed", {"message_id": dedup_key})
+    return result
 
-        if isinstance(remote_jid, str) and remote_jid.endswith("@g.us"):
-            log_ignore(instance_name, "group_message", {"remote_jid": remote_jid})
-            return {"ok": True, "ignored": "group_message"}
 
-        dedup_key = extract_dedup_key(payload)
-        if dedup_key:
-            if TenantService.is_duplicate_message(instance_name=instance_name, message_id=dedup_key):
-                log_ignore(instance_name, "duplicate", {"message_id": dedup_key, "remote_jid": remote_jid})
-                return {"ok": True, "ignored": "duplicate", "message_id": dedup_key}
-            log_info(instance_name, "dedup_key_new", {"message_id": dedup_key, "remote_jid": remote_jid})
+async def _process_message(
+    event: str,
+    payload: Dict[str, Any],
+    instance_name: str,
+    remote_jid: Optional[str],
+    dedup_key: Optional[str],
+) -> Dict[str, Any]:
+    msg_type = "n/a"
 
+    try:
         message = extract_message(payload)
         msg_type = message.get("type", "unknown")
         if msg_type == "unknown":
@@ -280,7 +397,7 @@ async def evolution_webhook(event: str, request: Request):
             log_ignore(instance_name, "no_phone", {"remote_jid": remote_jid, "push_name": push_name, "type": msg_type})
             return {"ok": True, "ignored": "no_phone"}
 
-        tenant = TenantService.get_by_evolution_instance(instance_name)
+        tenant = await run_in_threadpool(TenantService.get_by_evolution_instance, instance_name)
         if not tenant:
             log_ignore(instance_name, "tenant_not_found", {"instance": instance_name, "phone": phone})
             return {"ok": True, "ignored": "tenant_not_found"}
@@ -300,155 +417,149 @@ async def evolution_webhook(event: str, request: Request):
             log_ignore(instance_name, "tenant_chatwoot_not_configured", {"tenant_id": tenant.get("id")})
             return {"ok": True, "ignored": "tenant_chatwoot_not_configured"}
 
-        cw = ChatwootService(
+        cw = AsyncChatwootService(
             base_url=settings.CHATWOOT_BASE_URL,
             api_token=tenant["chatwoot_api_token"],
             account_id=int(tenant["chatwoot_account_id"]),
         )
 
+        inbox_id = int(tenant["chatwoot_inbox_id"])
         contact_name = push_name or phone
-        contact = cw.get_or_create_contact(name=contact_name, phone_e164=f"+{phone}")
-        contact_id = safe_extract_id(contact, "contact", instance_name)
-        log_info(instance_name, "chatwoot_contact_result", {"contact_id": contact_id, "name": contact_name, "phone": phone})
+
+        # contato/conversa já conhecidos não custam chamada ao Chatwoot
+        link = await ChatwootResolutionService.resolve(cw, inbox_id=inbox_id, phone_digits=str(phone), contact_name=contact_name)
+        contact_id = link.get("contact_id")
+        conv_id = link.get("conversation_id")
+        log_info(
+            instance_name,
+            "chatwoot_resolution_result",
+            {"contact_id": contact_id, "conversation_id": conv_id, "source": link.get("source"), "inbox_id": inbox_id, "phone": phone},
+        )
 
         if not contact_id:
             log_err(instance_name, "stop_no_contact_id", {"note": "Chatwoot respondeu sem id para contato"})
             return {"ok": True, "ignored": "chatwoot_no_contact_id"}
 
-        conv = cw.get_or_create_conversation(
-            inbox_id=int(tenant["chatwoot_inbox_id"]),
-            contact_id=int(contact_id)
-        )
-        conv_id = safe_extract_id(conv, "conversation", instance_name)
-        log_info(instance_name, "chatwoot_conversation_result", {"conversation_id": conv_id, "inbox_id": tenant.get("chatwoot_inbox_id")})
-
         if not conv_id:
             log_err(instance_name, "stop_no_conversation_id", {"note": "Chatwoot respondeu sem id para conversa"})
             return {"ok": True, "ignored": "chatwoot_no_conversation_id"}
 
-        try:
-            db = SessionLocal()
-            try:
-                ConversationMapService.upsert_map(
-                    db=db,
-                    chatwoot_account_id=int(tenant["chatwoot_account_id"]),
-                    chatwoot_conversation_id=int(conv_id),
-                    wa_phone_digits=str(phone),
-                )
-                log_info(
-                    instance_name,
-                    "cw_map_saved",
-                    {
-                        "account_id": int(tenant["chatwoot_account_id"]),
-                        "conversation_id": int(conv_id),
-                        "phone": phone,
-                    },
-                )
-            finally:
-                db.close()
-        except Exception as e:
-            log_err(instance_name, "cw_map_save_failed", {"error": repr(e), "conversation_id": conv_id})
+        if link.get("source") not in ("cache", "db"):
+            await run_in_threadpool(
+                save_conversation_map,
+                instance_name,
+                int(tenant["chatwoot_account_id"]),
+                int(conv_id),
+                str(phone),
+            )
 
-        created = None
+        media_file = None
 
         if msg_type == "text":
             content = message.get("content") or "(sem texto)"
-            created = cw.create_message(
-                conversation_id=int(conv_id),
+            send = partial(
+                cw.create_message,
                 content=content,
                 message_type="incoming"
             )
 
                 
         elif msg_type == "audio":
-            raw_media_message = message.get("raw_media_message")
-
-            if not raw_media_message:
-                raise RuntimeError("Áudio recebido sem raw_media_message")
-
-            evo_media = EvolutionService.download_media_base64(
-                instance_name=instance_name,
-                message=raw_media_message,
-            )
-
-            possible_base64 = (
-                evo_media.get("base64")
-                or evo_media.get("data")
-                or evo_media.get("media")
-                or evo_media.get("file")
-                or evo_media.get("buffer")
-            )
-
-            if isinstance(possible_base64, dict):
-                possible_base64 = (
-                    possible_base64.get("base64")
-                    or possible_base64.get("data")
-                )
-
-            if not possible_base64 or not isinstance(possible_base64, str):
-                raise RuntimeError(f"Evolution não retornou base64 do áudio: {evo_media}")
-
-            if possible_base64.startswith("data:") and "," in possible_base64:
-                possible_base64 = possible_base64.split(",", 1)[1]
-
-            audio_bytes = base64.b64decode(possible_base64)
-
             safe_mime = (message.get("mimetype") or "audio/ogg").split(";")[0].strip()
 
-            normalized_content = json.dumps(
-                {
-                    "kind": "audio",
-                    "mime_type": safe_mime,
-                    "filename": "audio.ogg",
-                    "audio_base64": possible_base64,
-                    "seconds": message.get("seconds"),
-                    "ptt": message.get("ptt"),
-                },
-                ensure_ascii=False,
-            )
-
-            created = cw.create_message_with_media_bytes(
-                conversation_id=int(conv_id),
-                file_bytes=audio_bytes,
-                message_type="incoming",
-                media_type="audio",
-                filename="audio.ogg",
-                mime_type=safe_mime,
-                is_recorded_audio=True,
-            )
+            try:
+                media_file = await open_message_media(instance_name, message)
+            except MediaTooLarge as e:
+                log_ignore(instance_name, "media_too_large", {"type": "audio", "error": str(e)})
+
+            if media_file is None:
+                send = partial(
+                    cw.create_message,
+                    content="🎤 Áudio recebido (acima do limite de tamanho para anexo)",
+                    message_type="incoming",
+                )
+            else:
+                send = partial(
+                    cw.create_message_with_media_bytes,
+                    file_bytes=media_file,
+                    message_type="incoming",
+                    media_type="audio",
+                    filename="audio.ogg",
+                    mime_type=safe_mime,
+                    is_recorded_audio=True,
+                )
 
-        elif msg_type == "image":
+        elif msg_type in ("image", "document"):
             url = message.get("url")
-            caption = message.get("caption") or "🖼️ Imagem recebida"
-            created = cw.create_message(
-                conversation_id=int(conv_id),
-                content=caption,
-                message_type="incoming",
-                attachments=[{"file_type": "image", "external_url": url}] if url else None,
-            )
+            if msg_type == "image":
+                content = message.get("caption") or "🖼️ Imagem recebida"
+                mime = (message.get("mimetype") or "image/jpeg").split(";")[0].strip()
+                filename = "image" + (mimetypes.guess_extension(mime) or ".jpg")
+            else:
+                content = message.get("fileName") or "📎 Documento recebido"
+                mime = (message.get("mimetype") or "").split(";")[0].strip() or None
+                filename = message.get("fileName") or "document.bin"
 
-        elif msg_type == "document":
-            url = message.get("url")
-            fname = message.get("fileName") or "📎 Documento recebido"
-            created = cw.create_message(
-                conversation_id=int(conv_id),
-                content=fname,
-                message_type="incoming",
-                attachments=[{"file_type": "file", "external_url": url}] if url else None,
-            )
+            try:
+                media_file = await open_message_media(instance_name, message)
+            except Exception as e:
+                # sem a mídia decifrada: mantém o comportamento antigo (link externo)
+                log_err(instance_name, "media_download_failed", {"type": msg_type, "error": repr(e)})
+
+            if media_file is None:
+                send = partial(
+                    cw.create_message,
+                    content=content,
+                    message_type="incoming",
+                    attachments=[{"file_type": "image" if msg_type == "image" else "file", "external_url": url}] if url else None,
+                )
+            else:
+                send = partial(
+                    cw.create_message_with_media_bytes,
+                    file_bytes=media_file,
+                    content=content,
+                    message_type="incoming",
+                    media_type=msg_type,
+                    filename=filename,
+                    mime_type=mime,
+                )
 
         else:
             log_ignore(instance_name, "unhandled_type", {"type": msg_type})
             return {"ok": True, "ignored": "unhandled_type"}
 
+        try:
+            try:
+                created = await send(conversation_id=int(conv_id))
+            except ChatwootNotFound:
+                # conversa (ou contato) sumiu do Chatwoot: revalida e tenta uma vez
+                log_info(instance_name, "chatwoot_conversation_stale", {"conversation_id": conv_id, "phone": phone})
+                link = await ChatwootResolutionService.resolve(
+                    cw, inbox_id=inbox_id, phone_digits=str(phone), contact_name=contact_name, refresh=True
+                )
+                contact_id = link.get("contact_id")
+                conv_id = link.get("conversation_id")
+                if not conv_id:
+                    raise
+                await run_in_threadpool(
+                    save_conversation_map,
+                    instance_name,
+                    int(tenant["chatwoot_account_id"]),
+                    int(conv_id),
+                    str(phone),
+                )
+                created = await send(conversation_id=int(conv_id))
+        finally:
+            if media_file is not None:
+                media_file.close()
+
         msg_id = safe_extract_id(created, "message", instance_name)
         log_info(instance_name, "chatwoot_message_result", {"message_id": msg_id, "conversation_id": conv_id})
 
-        if dedup_key:
-            TenantService.mark_message_processed(instance_name=instance_name, message_id=dedup_key)
-            log_info(instance_name, "dedup_marked_processed", {"message_id": dedup_key})
-
-        print(f"EVOLUTION_WEBHOOK_OK: instance={instance_name} type={msg_type} contact_id={contact_id} conv_id={conv_id} msg_id={msg_id}")
+        _log.info(
+            "EVOLUTION_WEBHOOK_OK",
+            instance=instance_name, type=msg_type, contact_id=contact_id, conv_id=conv_id, msg_id=msg_id,
+        )
 
         return {
             "ok": True,
@@ -473,4 +584,99 @@ async def evolution_webhook(event: str, request: Request):
                 "error": repr(e),
             },
         )
-        return {"ok": True, "ignored": "exception", "error": str(e)}
+        raise
+
+
+@router.post("/{event}")
+async def evolution_webhook(event: str, request: Request):
+    # 1) pelo path: presence/chats/contacts/messages-update nem têm o corpo lido
+    reason = EvolutionPrefilter.check_event(event)
+    if reason:
+        log_ignore_counted("unknown", reason, {"event": event})
+        return {"ok": True, "ignored": reason, "event": event}
+
+    # 2) nos bytes crus: fromMe / grupo sem decodificar o JSON
+    body = await request.body()
+    reason = EvolutionPrefilter.check_raw(body)
+    if reason:
+        log_ignore_counted("unknown", reason)
+        return {"ok": True, "ignored": reason}
+
+    try:
+        payload = EvolutionPrefilter.parse(body)
+    except ValueError as e:
+        log_ignore_counted("unknown", "invalid_json", {"error": str(e)})
+        return {"ok": True, "ignored": "invalid_json"}
+
+    instance_name = extract_instance_name(payload) or "unknown"
+
+    try:
+        # 3) confirmação estrutural (variações de serialização que o filtro cru não pega)
+        ignored = prefilter_event(event, instance_name, payload)
+        if ignored is not None:
+            return ignored
+
+        EvolutionPrefilter.count_accepted()
+        _log.info("EVOLUTION_WEBHOOK", event_name=event, instance=instance_name)
+
+        if settings.EVOLUTION_INGEST_MODE == "queue":
+            # redelivery já processado nem chega a ocupar a fila
+            dedup_key = extract_dedup_key(payload)
+            if dedup_key and await run_in_threadpool(
+                TenantService.is_duplicate_message, instance_name=instance_name, message_id=dedup_key
+            ):
+                log_ignore(instance_name, "duplicate", {"message_id": dedup_key, "remote_jid": extract_remote_jid(payload)})
+                return {"ok": True, "ignored": "duplicate", "message_id": dedup_key}
+
+            # persiste e responde na hora; o pool de workers faz o round-trip com o Chatwoot
+            try:
+                event_id = await run_in_threadpool(
+                    EvolutionIngestService.persist,
+                    instance_name,
+                    event,
+                    payload,
+                    dedup_key,
+                    extract_remote_jid(payload),
+                )
+            except Exception as e:
+                log_err(instance_name, "ingest_persist_failed", {"event": event, "error": repr(e)})
+                raise
+            queued = EvolutionIngestService.submit(instance_name, event_id, extract_remote_jid(payload))
+            log_info(instance_name, "ingest_queued", {"event_id": event_id, "in_memory_queue": queued})
+            return {"ok": True, "queued": True, "event_id": event_id}
+
+        # inline: mesma conversa processa em ordem; conversas diferentes em paralelo
+        return await EvolutionIngestService.run_ordered(
+            instance_name,
+            extract_remote_jid(payload),
+            partial(process_evolution_event, event, payload),
+        )
+
+    except Exception as e:
+        # 200 pro upstream (sem retry storm), mas o payload fica no dead-letter pro retrier
+        dead_letter_id = None
+        try:
+            dead_letter_id = await run_in_threadpool(
+                DeadLetterService.record,
+                "evolution",
+                event,
+                payload,
+                repr(e),
+                instance_name,
+                extract_dedup_key(payload),
+                1,
+                getattr(find_circuit_open(e), "retry_after", None),
+            )
+        except Exception as dl_err:
+            log_err(instance_name, "dead_letter_record_failed", {"event": event, "error": repr(dl_err)})
+        return {"ok": True, "ignored": "exception", "error": str(e), "dead_letter_id": dead_letter_id}
+
+
+async def replay_evolution_event(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Handler do dead-letter: reprocessa em ordem com a conversa (fora da fila); levanta exceção se falhar de novo."""
+    instance_name = extract_instance_name(payload) or "unknown"
+    return await EvolutionIngestService.run_ordered(
+        instance_name,
+        extract_remote_jid(payload),
+        partial(process_evolution_event, event, payload),
+    )
@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-import requests
 
-from app.db.session import get_db
-from app.api.services.google_token_service import GoogleTokenService
+from app.api.services.google_freebusy_service import GoogleFreeBusyService
 
 router = APIRouter(prefix="/google", tags=["Google Calendar"])
 
@@ -25,43 +24,21 @@ class AvailabilityRequest(BaseModel):
 # ============================
 
 @router.post("/availability")
-def check_calendar_availability(payload: AvailabilityRequest, db: Session = Depends(get_db)):
-
-    # 1. Buscar token válido (renova automaticamente se expirado)
-    try:
-        access_token = GoogleTokenService.get_valid_access_token(
-            db,
-            payload.user_id
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    # 2. Preparar corpo da requisição FreeBusy
-    freebusy_body = {
-        "timeMin": payload.start_date,
-        "timeMax": payload.end_date,
-        "timeZone": payload.timezone,
-        "items": [{"id": payload.calendar_id}],
-    }
-
-    # 3. Chamar Google Calendar API
-    response = requests.post(
-        "https://www.googleapis.com/calendar/v3/freeBusy",
-        headers={"Authorization": f"Bearer {access_token}"},
-        json=freebusy_body
-    )
+def check_calendar_availability(payload: AvailabilityRequest):
+    result = GoogleFreeBusyService.query(
+        [(payload.user_id, payload.calendar_id)],
+        payload.start_date,
+        payload.end_date,
+        tz=payload.timezone,
+    )[payload.user_id]
 
-    if response.status_code != 200:
+    if result["errors"]:
         raise HTTPException(
             status_code=400,
-            detail=f"Erro ao consultar disponibilidade: {response.text}"
+            detail=f"Erro ao consultar disponibilidade: {result['errors']}"
         )
 
-    data = response.json()
-
-    # 4. Formatar resposta final
-    calendar_data = data.get("calendars", {}).get(payload.calendar_id, {})
-    busy_slots = calendar_data.get("busy", [])
+    busy_slots = result["calendars"].get(payload.calendar_id, [])
 
     return {
         "calendar_id": payload.calendar_id,
@@ -70,3 +47,45 @@ def check_calendar_availability(payload: AvailabilityRequest, db: Session = Depe
         "start": payload.start_date,
         "end": payload.end_date
     }
+
+
+class AvailabilityBatchItem(BaseModel):
+    user_id: int = Field(..., description="Profissional (dono do token Google)")
+    calendar_id: str = Field("primary", description="ID do calendário")
+
+
+class AvailabilityBatchRequest(BaseModel):
+    items: List[AvailabilityBatchItem] = Field(..., min_length=1)
+    start_date: str = Field(..., description="ISO datetime início (RFC3339)")
+    end_date: str = Field(..., description="ISO datetime fim (RFC3339)")
+    timezone: str = Field("America/Sao_Paulo", description="Fuso horário da resposta")
+
+
+@router.post("/availability/batch")
+def check_calendar_availability_batch(payload: AvailabilityBatchRequest):
+    """
+    Disponibilidade de vários profissionais de uma vez: agendas do mesmo profissional
+    vão no mesmo FreeBusy (até 50 por request) e profissionais diferentes em paralelo.
+    `busy` = ocupado mesclado entre todas as agendas do profissional.
+    """
+    result = GoogleFreeBusyService.query(
+        [(item.user_id, item.calendar_id) for item in payload.items],
+        payload.start_date,
+        payload.end_date,
+        tz=payload.timezone,
+    )
+
+    return {
+        "start": payload.start_date,
+        "end": payload.end_date,
+        "professionals": [
+            {
+                "user_id": user_id,
+                "is_available": len(entry["busy"]) == 0 and not entry["errors"],
+                "busy": entry["busy"],
+                "calendars": entry["calendars"],
+                "errors": entry["errors"],
+            }
+            for user_id, entry in result.items()
+        ],
+    }
@@ -5,26 +5,36 @@ from app.db.session import get_db
 from app.api.services.google_token_service import GoogleTokenService
 from app.api.services.google_calendar_service import google_calendar_service
 from app.api.services.google_calendar_events_service import GoogleCalendarEventsService
-from app.schemas.google_events import GoogleEventCreateIn, GoogleEventCreateOut, GoogleEventUpdateIn, GoogleEventUpdateOut
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.schemas.google_events import GoogleEventCreateIn, GoogleEventCreateOut, GoogleEventUpdateIn, GoogleEventUpdateOut, GoogleEventBulkIn, GoogleEventListOut
+from app.api.services.google_calendar_batch_service import GoogleCalendarBatchService
 from app.api.services.google_calendar_events_crud import google_calendar_events_crud
 from datetime import datetime
 
 router = APIRouter(prefix="/google/events", tags=["google-calendar"])
 
 
-@router.get("/list")
+@router.get("/list", response_model=GoogleEventListOut)
 def list_google_events(
     user_id: int = Query(..., description="ID do usuário (tenant/profissional)"),
     calendar_id: str = Query("primary", description="ID da agenda no Google (default: primary)"),
     telefone: str | None = Query(None, description="Filtra eventos que contenham o telefone em summary/description"),
     db: Session = Depends(get_db),
 ):
+    """
+    Eventos vindos do espelho local, no formato GoogleEventListItemOut: os campos que o
+    sync guarda (id, status, summary, description, location, start, end, htmlLink...),
+    não o recurso completo do Google (sem attendees, organizer, reminders etc).
+    """
     token = GoogleTokenService.get_by_user(db, user_id)
     if not token:
         raise HTTPException(status_code=404, detail="Usuário não conectado ao Google")
 
     try:
-        events = google_calendar_service.list_events(token, calendar_id)
+        # espelho local (sync incremental) em vez de listar a agenda inteira no Google;
+        # com o 1º sync pendente a leitura vai direto no Google
+        rows = GoogleCalendarSyncService.read_range(db, user_id, calendar_id=calendar_id)
+        events = [r.raw for r in rows if r.raw]
 
         if telefone:
             tel = telefone.strip()
@@ -54,6 +64,7 @@ def delete_google_event(
 
     try:
         google_calendar_service.delete_event(db, token, calendar_id, event_id)
+        GoogleCalendarSyncService.write_through(db, user_id, calendar_id, deleted_id=event_id)
         return {"status": "deleted", "event_id": event_id, "calendar_id": calendar_id}
     except Exception as e:
         # Se quiser melhorar depois: parsear e.status_code do Google
@@ -79,6 +90,7 @@ def create_google_event(payload: GoogleEventCreateIn, db: Session = Depends(get_
             description=payload.description or "",
             timezone=payload.timezone or "America/Sao_Paulo",
         )
+        GoogleCalendarSyncService.write_through(db, payload.user_id, payload.calendar_id or "primary", item=event)
 
         return GoogleEventCreateOut(
             status="ok",
@@ -121,6 +133,7 @@ def update_google_event(payload: GoogleEventUpdateIn, db: Session = Depends(get_
             end=payload.end_datetime,
             timezone=payload.timezone or "America/Sao_Paulo",
         )
+        GoogleCalendarSyncService.write_through(db, payload.user_id, payload.calendar_id or "primary", item=updated)
 
         return GoogleEventUpdateOut(
             status="ok",
@@ -241,3 +254,20 @@ def update_event_normalized(
         raise HTTPException(status_code=422, detail=f"Campo obrigatório ausente: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/bulk", summary="Create/update/delete em massa (batch do Google, 50 por request)")
+def bulk_events(payload: GoogleEventBulkIn, db: Session = Depends(get_db)):
+    """
+    Ex.: remarcar um dia inteiro (várias `update` só com start/end) ou cancelar a
+    semana de um profissional (várias `delete`). Resultado por item em `results`,
+    na mesma ordem de `operations`; falha de um item não derruba os outros.
+    """
+    try:
+        return GoogleCalendarBatchService.execute(
+            db,
+            payload.user_id,
+            [op.model_dump() for op in payload.operations],
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.services.google_calendar_watch_service import GoogleCalendarWatchService
+
+router = APIRouter(prefix="/google/calendar", tags=["google-calendar"])
+
+
+@router.post("/notifications")
+async def google_calendar_notifications(request: Request):
+    """
+    Webhook dos canais events.watch. O Google não manda corpo: tudo vem nos headers
+    X-Goog-*. Responde 200 na hora (o Google re-tenta com backoff em erro) e o sync
+    incremental do calendário roda na lane de push.
+    """
+    target = await run_in_threadpool(GoogleCalendarWatchService.handle_notification, request.headers)
+    if target is not None:
+        GoogleCalendarWatchService.schedule_sync(*target)
+    return Response(status_code=200)
@@ -0,0 +1,123 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+from app.core.security import verify_n8n_api_key
+from app.core.background import background_tasks_info
+from app.core import circuit
+from app.core.logs import logging_stats
+from app.core.media_store import media_store
+from app.api.endpoints.tenant_integration import chatwoot_ordering
+from app.api.services.evolution_ingest_service import EvolutionIngestService
+from app.api.services.evolution_prefilter import EvolutionPrefilter
+from app.api.services.message_dedup_service import MessageDedupService
+from app.api.services.tenant_service import TenantService
+from app.api.services.chatwoot_resolution_service import ChatwootResolutionService
+from app.api.services.chatwoot_routing_service import ChatwootRoutingService
+from app.api.services.dead_letter_service import DeadLetterService
+from app.api.services.outbound_dispatcher import OutboundDispatcher
+from app.api.services.google_token_service import GoogleTokenManager
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_calendar_watch_service import GoogleCalendarWatchService
+from app.api.services.google_freebusy_service import GoogleFreeBusyService
+from app.api.services.slot_service import SlotService
+from app.api.services.google_calendar_batch_service import GoogleCalendarBatchService
+
+router = APIRouter(prefix="/ops", tags=["Ops"], dependencies=[Depends(verify_n8n_api_key)])
+
+
+@router.get("/health")
+def ops_health():
+    """Estado dos circuit breakers: ok | degraded (conta/instância aberta) | down (upstream aberto)."""
+    return circuit.health()
+
+
+@router.get("/metrics")
+def ops_metrics():
+    return {
+        "evolution_prefilter": EvolutionPrefilter.stats(),
+        "evolution_ingest": EvolutionIngestService.stats(),
+        "chatwoot_events_ordering": chatwoot_ordering.stats(),
+        "message_dedup": MessageDedupService.stats(),
+        "tenant_routing_cache": TenantService.routing_cache_stats(),
+        "chatwoot_routing_cache": ChatwootRoutingService.stats(),
+        "chatwoot_resolution_cache": ChatwootResolutionService.stats(),
+        "media_cache": media_store.stats(),
+        "background_tasks": background_tasks_info(),
+        "logging": logging_stats(),
+        "dead_letters": DeadLetterService.stats(),
+        "outbound": OutboundDispatcher.stats(),
+        "google_tokens": GoogleTokenManager.stats(),
+        "google_calendar_sync": GoogleCalendarSyncService.stats(),
+        "google_calendar_watch": GoogleCalendarWatchService.stats(),
+        "google_freebusy": GoogleFreeBusyService.stats(),
+        "slots": SlotService.stats(),
+        "google_batch": GoogleCalendarBatchService.stats(),
+        "circuits": circuit.breakers_snapshot(),
+    }
+
+
+# ======================
+# Dead-letter dos webhooks
+# ======================
+
+class DeadLetterReplayIn(BaseModel):
+    source: Optional[str] = Field(None, examples=["evolution"])
+    # 'dead' (esgotou tentativas) ou 'pending' (antecipa o próximo retry);
+    # 'retrying' não: a linha já está com um retrier e seria processada duas vezes
+    status: Literal["dead", "pending"] = Field("dead", examples=["dead"])
+    ids: Optional[List[int]] = None
+    limit: int = Field(100, ge=1, le=1000)
+
+
+@router.get("/dead-letters")
+def list_dead_letters(
+    status: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    include_payload: bool = Query(False),
+):
+    return {
+        "items": DeadLetterService.list_items(status=status, source=source, limit=limit, include_payload=include_payload),
+        "counts": DeadLetterService.stats(),
+    }
+
+
+@router.post("/dead-letters/{dead_letter_id}/replay")
+async def replay_dead_letter(dead_letter_id: int):
+    """Reprocessa agora um item 'pending' ou 'dead' e devolve o resultado."""
+    result = await DeadLetterService.replay(dead_letter_id)
+    if result is None:
+        raise HTTPException(status_code=409, detail="item inexistente, já reprocessado ou em retry")
+    return result
+
+
+@router.post("/dead-letters/replay")
+async def replay_dead_letters(payload: DeadLetterReplayIn):
+    """Replay em lote: reagenda pro retrier (que processa em série, no ritmo dele)."""
+    scheduled = await run_in_threadpool(
+        DeadLetterService.schedule_replay,
+        payload.source,
+        payload.status,
+        payload.ids,
+        payload.limit,
+    )
+    return {"ok": True, "scheduled": scheduled}
+
+
+# ======================
+# Fila de saída (WhatsApp)
+# ======================
+
+@router.get("/outbound")
+def list_outbound(
+    status: Optional[str] = Query(None),
+    instance_name: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    return {
+        "items": OutboundDispatcher.list_items(status=status, instance_name=instance_name, limit=limit),
+        "counts": OutboundDispatcher.status_counts(),
+    }
@@ -1,28 +1,41 @@
 from __future__ import annotations
 
+import logging
+
 from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from functools import partial
 from typing import Any, Dict, Optional
+
+from app.core import fastjson
+from app.core.circuit import find_circuit_open
 from app.core.config import settings
+from app.core.logs import get_logger
+from app.core.lanes import KeyedSerializer
 from app.api.services.tenant_service import TenantService
 from app.db.session import SessionLocal
-from app.api.services.tenant_integration_service import TenantIntegrationService
-from app.api.services.evolution_service import EvolutionService
-from app.api.services.chatwoot_service import ChatwootService
+from app.api.services.evolution_service import AsyncEvolutionService
+from app.api.services.chatwoot_service import ChatwootService, AsyncChatwootService
 from app.api.services.conversation_map_service import ConversationMapService
+from app.api.services.chatwoot_routing_service import ChatwootRoutingService
+from app.api.services.dead_letter_service import DeadLetterService
+from app.api.services.outbound_dispatcher import OutboundDispatcher
 
 router = APIRouter(prefix="/integrations/chatwoot", tags=["Chatwoot Integration"])
 
+# envio Chatwoot -> Evolution serializado pela conversa exata (sem teto entre conversas)
+chatwoot_ordering = KeyedSerializer("chatwoot_events")
+
+_log = get_logger("chatwoot.events")
+
 def _log_info(msg: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"CHATWOOT_EVT_INFO: msg={msg} extra={extra}")
+    _log.info("CHATWOOT_EVT_INFO", step=msg, extra=extra or {})
 
 def _log_ignore(reason: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"CHATWOOT_EVT_IGNORED: reason={reason} extra={extra}")
+    _log.info("CHATWOOT_EVT_IGNORED", reason=reason, extra=extra or {})
 
 def _log_err(msg: str, extra: dict | None = None):
-    extra = extra or {}
-    print(f"CHATWOOT_EVT_ERROR: msg={msg} extra={extra}")
+    _log.error("CHATWOOT_EVT_ERROR", step=msg, extra=extra or {})
 
 def _safe_int(v: Any) -> Optional[int]:
     try:
@@ -96,195 +109,240 @@ def _extract_recipient_phone(payload: Dict[str, Any], conv: Dict[str, Any]) -> O
 def _normalize_phone_for_evolution(phone: str) -> str:
     return "".join(ch for ch in phone if ch.isdigit())
 
-@router.post("/events")
-async def chatwoot_events(request: Request, secret: str = Query(default="")):
-    payload: Dict[str, Any] = await request.json()
-    event_name = _extract_event_name(payload)
-    msg = _extract_message(payload)
-    conv = _extract_conversation(payload)
-
-    _log_info("received", {"event": event_name, "has_message": bool(msg), "has_conversation": bool(conv)})
+# --- acesso ao banco (sync) — chamado via run_in_threadpool pra não travar o event loop ---
 
+def _save_mapped_phone(account_id: int, conversation_id: int, phone_digits: str) -> None:
+    db = SessionLocal()
     try:
-        if not msg or not conv:
-            _log_ignore("missing_message_or_conversation", {"event": event_name})
-            return {"ok": True}
+        ConversationMapService.upsert_map(
+            db=db,
+            chatwoot_account_id=account_id,
+            chatwoot_conversation_id=conversation_id,
+            wa_phone_digits=phone_digits,
+        )
+    finally:
+        db.close()
+    ChatwootRoutingService.remember_phone(account_id, conversation_id, phone_digits)
+
+async def _deliver_outgoing(
+    payload: Dict[str, Any],
+    msg: Dict[str, Any],
+    conv: Dict[str, Any],
+    account_id: int,
+    inbox_id: int,
+    conversation_id: Optional[int],
+) -> Dict[str, Any]:
+    # tenant + instância + telefone mapeado da conversa: 1 query (JOIN) no miss, 0 com cache quente
+    route = await run_in_threadpool(ChatwootRoutingService.resolve, account_id, inbox_id, conversation_id)
+    if route is None:
+        raise HTTPException(status_code=404, detail="tenant not found")
+
+    user_id = route["user_id"]
+    _log_info("tenant_resolved", {"user_id": user_id, "account_id": account_id, "inbox_id": inbox_id, "source": route["source"]})
+
+    instance_name = route["instance_name"]
+    if not instance_name:
+        _log_ignore("no_integration_or_instance", {"user_id": user_id})
+        return {"ok": True}
+
+    # =========================================================================
+    # 7) RESOLUÇÃO DE TELEFONE (ROBUSTA)
+    # =========================================================================
+    
+    # Tentativa 1: Payload direto
+    raw_phone = _extract_recipient_phone(payload, conv)
+    
+    # Tentativa 2: Banco de Dados (Map) — já veio junto no roteamento
+    if not raw_phone and route["mapped_phone"]:
+        raw_phone = route["mapped_phone"]
+        _log_info("phone_resolved_via_map", {"conv_id": conversation_id, "phone": raw_phone})
+
+    # Tentativa 3: API do Chatwoot (Fallback Final com Debug e Múltiplas Estratégias)
+    if not raw_phone:
+        chatwoot_token = getattr(settings, "CHATWOOT_API_TOKEN", None)
+        
+        _log_info("api_fallback_check", {
+            "token_present": bool(chatwoot_token), 
+            "conv_id": conversation_id
+        })
 
-        message_type = msg.get("message_type") or msg.get("type")
-        if message_type != "outgoing":
-            _log_ignore("not_outgoing", {"message_type": message_type, "event": event_name})
-            return {"ok": True}
+        if chatwoot_token and conversation_id:
+            try:
+                cw_temp = AsyncChatwootService(
+                    base_url=settings.CHATWOOT_BASE_URL,
+                    api_token=chatwoot_token,
+                    account_id=account_id,
+                )
+                full_conv = await cw_temp.get_conversation(conversation_id)
+
+                # --- DEBUG: começo do JSON da conversa (só serializa com a categoria em DEBUG) ---
+                if _log.is_enabled(logging.DEBUG):
+                    _log.debug("DEBUG_API_RESPONSE", body=fastjson.dumps(full_conv)[:600].decode("utf-8", "replace"))
+                # -------------------------------------------------------------------
+                
+                # Estratégia 3.A: contact_inbox -> source_id (Geralmente é o telefone/UID no WhatsApp)
+                ci = full_conv.get("contact_inbox")
+                if isinstance(ci, dict):
+                    raw_phone = ci.get("source_id")
+                    if raw_phone: _log_info("phone_found_in_contact_inbox", {"val": raw_phone})
+
+                # Estratégia 3.B: meta -> sender -> phone_number
+                if not raw_phone:
+                    meta = full_conv.get("meta", {})
+                    sender = meta.get("sender")
+                    if isinstance(sender, dict):
+                        raw_phone = sender.get("phone_number")
+                        if raw_phone: _log_info("phone_found_in_meta_sender", {"val": raw_phone})
+
+                # Estratégia 3.C: meta -> contact -> phone_number
+                if not raw_phone:
+                    meta = full_conv.get("meta", {})
+                    contact_obj = meta.get("contact")
+                    if isinstance(contact_obj, dict):
+                        raw_phone = contact_obj.get("phone_number")
+                        if raw_phone: _log_info("phone_found_in_meta_contact", {"val": raw_phone})
+
+                # Estratégia 3.D: Busca ID do contato e faz nova chamada (O mais lento, mas garantido)
+                if not raw_phone:
+                    cid_temp = _extract_contact_id(full_conv)
+                    if cid_temp:
+                        _log_info("fetching_contact_directly", {"contact_id": cid_temp})
+                        c_data = await cw_temp.get_contact(cid_temp)
+                        raw_phone = ChatwootService.extract_phone_from_contact(c_data)
+
+                # Se achou em qualquer estratégia, salva no Map (Self-Healing)
+                if raw_phone:
+                    try:
+                        await run_in_threadpool(
+                            _save_mapped_phone,
+                            int(account_id),
+                            int(conversation_id),
+                            _normalize_phone_for_evolution(raw_phone),
+                        )
+                    except: pass
+
+            except Exception as ex_api:
+                _log_err("api_fallback_failed", {"error": str(ex_api)})
+
+    if not raw_phone:
+        _log_ignore("missing_recipient_phone", {"note": "failed all strategies", "conv_id": conversation_id})
+        return {"ok": True}
 
-        if bool(msg.get("private")):
-            _log_ignore("private_note", {"event": event_name})
-            return {"ok": True}
+    to_phone = _normalize_phone_for_evolution(raw_phone)
+    
+    # =========================================================================
 
-        account_id = _extract_account_id(payload, conv)
-        inbox_id = _extract_inbox_id(conv)
-        if not account_id or not inbox_id:
-            _log_ignore("missing_ids", {"account_id": account_id, "inbox_id": inbox_id})
-            return {"ok": True}
+    content = (msg.get("content") or "").strip()
+    attachments = msg.get("attachments") or []
 
-        # _log_info("routing_keys", {"account_id": account_id, "inbox_id": inbox_id})
+    _log_info("sending_msg", {"instance": instance_name, "to": to_phone, "content_len": len(content)})
 
-        db = SessionLocal()
-        try:
-            user_id = TenantIntegrationService.resolve_user_id(db=db, chatwoot_account_id=account_id, chatwoot_inbox_id=inbox_id)
-        finally:
-            db.close()
+    audio_url = None
+    for att in attachments:
+        if not isinstance(att, dict): continue
+        ft = (att.get("file_type") or att.get("type") or "").lower()
+        ct = (att.get("content_type") or "").lower()
+        if ft == "audio" or ct.startswith("audio/"):
+            audio_url = att.get("data_url") or att.get("url") or att.get("file_url")
+            break
 
-        _log_info("tenant_resolved", {"user_id": user_id, "account_id": account_id, "inbox_id": inbox_id})
+    if not audio_url and not content:
+        return {"ok": True}
 
-        db = SessionLocal()
-        try:
-            integration = (
-                db.query(__import__("app.api.models.tenant_integration", fromlist=["TenantIntegration"]).TenantIntegration)
-                .filter_by(user_id=user_id)
-                .first()
-            )
-        finally:
-            db.close()
+    if settings.OUTBOUND_MODE == "queue":
+        # fila da instância (ritmo/retry no dispatcher): o webhook responde sem esperar o envio
+        queued = await OutboundDispatcher.enqueue(
+            instance_name=instance_name,
+            to_number=to_phone,
+            text=None if audio_url else content,
+            media_url=audio_url,
+            source="chatwoot",
+            reference=msg.get("id"),
+        )
+        return {"ok": True, "outbound_id": queued["id"], "outbound_status": queued["status"]}
+
+    if audio_url:
+        await AsyncEvolutionService.send_audio(instance_name=instance_name, to_number=to_phone, audio_url=audio_url)
+    else:
+        await AsyncEvolutionService.send_text(instance_name=instance_name, to_number=to_phone, text=content)
+
+    return {"ok": True}
+
+
+async def process_chatwoot_event(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Filtra e entrega um evento do Chatwoot (outgoing -> Evolution).
+    Levanta exceção em caso de falha — quem chama decide (webhook: dead-letter; retrier: reagenda).
+    """
+    event_name = _extract_event_name(payload)
+    msg = _extract_message(payload)
+    conv = _extract_conversation(payload)
 
-        if not integration or not getattr(integration, "evolution_instance_id", None):
-            _log_ignore("no_integration_or_instance", {"user_id": user_id})
-            return {"ok": True}
+    _log_info("received", {"event": event_name, "has_message": bool(msg), "has_conversation": bool(conv)})
 
-        instance_name = str(integration.evolution_instance_id)
+    if not msg or not conv:
+        _log_ignore("missing_message_or_conversation", {"event": event_name})
+        return {"ok": True}
 
-        # =========================================================================
-        # 7) RESOLUÇÃO DE TELEFONE (ROBUSTA)
-        # =========================================================================
-        
-        # Tentativa 1: Payload direto
-        raw_phone = _extract_recipient_phone(payload, conv)
-        
-        # Garante que temos o ID da conversa (essencial para as próximas etapas)
-        conversation_id = _extract_id(conv) or _safe_int(conv.get("id"))
+    message_type = msg.get("message_type") or msg.get("type")
+    if message_type != "outgoing":
+        _log_ignore("not_outgoing", {"message_type": message_type, "event": event_name})
+        return {"ok": True}
 
-        # Tentativa 2: Banco de Dados (Map)
-        if not raw_phone and conversation_id:
-            db_map = SessionLocal()
-            try:
-                mapped_phone = ConversationMapService.get_phone_by_conversation(
-                    db=db_map,
-                    chatwoot_account_id=int(account_id),
-                    chatwoot_conversation_id=int(conversation_id)
-                )
-                if mapped_phone:
-                    raw_phone = mapped_phone
-                    _log_info("phone_resolved_via_map", {"conv_id": conversation_id, "phone": raw_phone})
-            except Exception as e:
-                _log_err("map_service_error", {"error": str(e)})
-            finally:
-                db_map.close()
-
-        # Tentativa 3: API do Chatwoot (Fallback Final com Debug e Múltiplas Estratégias)
-        if not raw_phone:
-            chatwoot_token = getattr(integration, "chatwoot_api_token", None) or getattr(settings, "CHATWOOT_API_TOKEN", None)
-            
-            _log_info("api_fallback_check", {
-                "token_present": bool(chatwoot_token), 
-                "conv_id": conversation_id
-            })
-
-            if chatwoot_token and conversation_id:
-                try:
-                    cw_temp = ChatwootService(
-                        base_url=settings.CHATWOOT_BASE_URL,
-                        api_token=chatwoot_token,
-                        account_id=account_id,
-                    )
-                    full_conv = cw_temp.get_conversation(conversation_id)
-
-                    # --- DEBUG: Imprime o começo do JSON para vermos a estrutura real ---
-                    import json
-                    try:
-                        # Imprime os primeiros 600 caracteres para não poluir demais, mas mostrar o inicio
-                        print(f"DEBUG_API_RESPONSE: {json.dumps(full_conv, default=str)[:600]}")
-                    except: 
-                        print("DEBUG_API_RESPONSE: (erro ao converter json)")
-                    # -------------------------------------------------------------------
-                    
-                    # Estratégia 3.A: contact_inbox -> source_id (Geralmente é o telefone/UID no WhatsApp)
-                    ci = full_conv.get("contact_inbox")
-                    if isinstance(ci, dict):
-                        raw_phone = ci.get("source_id")
-                        if raw_phone: _log_info("phone_found_in_contact_inbox", {"val": raw_phone})
-
-                    # Estratégia 3.B: meta -> sender -> phone_number
-                    if not raw_phone:
-                        meta = full_conv.get("meta", {})
-                        sender = meta.get("sender")
-                        if isinstance(sender, dict):
-                            raw_phone = sender.get("phone_number")
-                            if raw_phone: _log_info("phone_found_in_meta_sender", {"val": raw_phone})
-
-                    # Estratégia 3.C: meta -> contact -> phone_number
-                    if not raw_phone:
-                        meta = full_conv.get("meta", {})
-                        contact_obj = meta.get("contact")
-                        if isinstance(contact_obj, dict):
-                            raw_phone = contact_obj.get("phone_number")
-                            if raw_phone: _log_info("phone_found_in_meta_contact", {"val": raw_phone})
-
-                    # Estratégia 3.D: Busca ID do contato e faz nova chamada (O mais lento, mas garantido)
-                    if not raw_phone:
-                        cid_temp = _extract_contact_id(full_conv)
-                        if cid_temp:
-                            _log_info("fetching_contact_directly", {"contact_id": cid_temp})
-                            c_data = cw_temp.get_contact(cid_temp)
-                            raw_phone = ChatwootService.extract_phone_from_contact(c_data)
-
-                    # Se achou em qualquer estratégia, salva no Map (Self-Healing)
-                    if raw_phone:
-                        try:
-                            db_save = SessionLocal()
-                            ConversationMapService.upsert_map(
-                                db=db_save,
-                                chatwoot_account_id=int(account_id),
-                                chatwoot_conversation_id=int(conversation_id),
-                                wa_phone_digits=_normalize_phone_for_evolution(raw_phone),
-                            )
-                            db_save.commit()
-                            db_save.close()
-                        except: pass
-
-                except Exception as ex_api:
-                    _log_err("api_fallback_failed", {"error": str(ex_api)})
-
-        if not raw_phone:
-            _log_ignore("missing_recipient_phone", {"note": "failed all strategies", "conv_id": conversation_id})
-            return {"ok": True}
-
-        to_phone = _normalize_phone_for_evolution(raw_phone)
-        
-        # =========================================================================
+    if bool(msg.get("private")):
+        _log_ignore("private_note", {"event": event_name})
+        return {"ok": True}
 
-        content = (msg.get("content") or "").strip()
-        attachments = msg.get("attachments") or []
+    account_id = _extract_account_id(payload, conv)
+    inbox_id = _extract_inbox_id(conv)
+    if not account_id or not inbox_id:
+        _log_ignore("missing_ids", {"account_id": account_id, "inbox_id": inbox_id})
+        return {"ok": True}
 
-        _log_info("sending_msg", {"instance": instance_name, "to": to_phone, "content_len": len(content)})
+    # _log_info("routing_keys", {"account_id": account_id, "inbox_id": inbox_id})
 
-        audio_url = None
-        for att in attachments:
-            if not isinstance(att, dict): continue
-            ft = (att.get("file_type") or att.get("type") or "").lower()
-            ct = (att.get("content_type") or "").lower()
-            if ft == "audio" or ct.startswith("audio/"):
-                audio_url = att.get("data_url") or att.get("url") or att.get("file_url")
-                break
+    # Garante que temos o ID da conversa (essencial para as próximas etapas)
+    conversation_id = _extract_id(conv) or _safe_int(conv.get("id"))
 
-        if audio_url:
-            EvolutionService.send_audio(instance_name=instance_name, to_number=to_phone, audio_url=audio_url)
-        else:
-            if not content:
-                return {"ok": True}
-            EvolutionService.send_text(instance_name=instance_name, to_number=to_phone, text=content)
+    # mesma conversa em ordem de envio; conversas diferentes em paralelo
+    return await chatwoot_ordering.run(
+        (inbox_id, conversation_id),
+        partial(_deliver_outgoing, payload, msg, conv, account_id, inbox_id, conversation_id),
+    )
 
-        return {"ok": True}
 
+@router.post("/events")
+async def chatwoot_events(request: Request, secret: str = Query(default="")):
+    payload: Dict[str, Any] = await request.json()
+
+    try:
+        return await process_chatwoot_event(payload)
     except HTTPException:
         raise
     except Exception as e:
+        event_name = _extract_event_name(payload)
         _log_err("exception", {"event": event_name, "error": repr(e)})
-        return {"ok": True}
\ No newline at end of file
+
+        # 200 pro Chatwoot (sem retry storm), mas o evento fica no dead-letter pro retrier
+        dead_letter_id = None
+        try:
+            msg = _extract_message(payload) or {}
+            dead_letter_id = await run_in_threadpool(
+                DeadLetterService.record,
+                "chatwoot",
+                event_name,
+                payload,
+                repr(e),
+                None,
+                str(msg.get("id")) if msg.get("id") is not None else None,
+                1,
+                getattr(find_circuit_open(e), "retry_after", None),
+            )
+        except Exception as dl_err:
+            _log_err("dead_letter_record_failed", {"event": event_name, "error": repr(dl_err)})
+        return {"ok": True, "dead_letter_id": dead_letter_id}
+
+
+async def replay_chatwoot_event(event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Handler do dead-letter (o nome do evento já está no payload)."""
+    return await process_chatwoot_event(payload)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, BigInteger, String, DateTime, func
+from app.db.base_class import Base
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # nome do cache compartilhado (ex.: 'tenant_routing')
+    name = Column(String, primary_key=True)
+    # incrementado a cada invalidação; cada worker compara com a última que viu
+    version = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
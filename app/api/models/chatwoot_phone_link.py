@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Integer, String, DateTime, func, UniqueConstraint
+from app.db.base_class import Base
+
+
+class ChatwootPhoneLink(Base):
+    """
+    Resolução (conta, inbox, telefone do paciente) -> contato/conversa no Chatwoot.
+    Evita contacts/search + POST conversations a cada mensagem recebida.
+    """
+
+    __tablename__ = "chatwoot_phone_links"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    chatwoot_account_id = Column(Integer, nullable=False)
+    chatwoot_inbox_id = Column(Integer, nullable=False)
+    # somente dígitos ex: 5534999999999
+    wa_phone_digits = Column(String(32), nullable=False)
+
+    chatwoot_contact_id = Column(Integer, nullable=False)
+    chatwoot_conversation_id = Column(Integer, nullable=False, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("chatwoot_account_id", "chatwoot_inbox_id", "wa_phone_digits", name="uq_cw_link_account_inbox_phone"),
+    )
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, JSON, Index, func
+from app.db.base_class import Base
+
+
+class EvolutionInboundEvent(Base):
+    __tablename__ = "evolution_inbound_events"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+
+    instance_name = Column(String, nullable=False, index=True)
+    event = Column(String, nullable=False)
+
+    # key.id / key.remoteJid do WhatsApp (ajuda a rastrear)
+    message_id = Column(String, nullable=True, index=True)
+    remote_jid = Column(String, nullable=True)
+
+    # payload bruto recebido da Evolution
+    payload = Column(JSON, nullable=False)
+
+    # 'pending' | 'processing' | 'done' | 'failed'
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_evo_inbound_status_next", "status", "next_attempt_at"),
+        # ordem por conversa: "há evento anterior em aberto?"
+        Index("ix_evo_inbound_conversation", "instance_name", "remote_jid", "id"),
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey, Index, func
+from app.db.base_class import Base
+
+
+class GoogleCalendarChannel(Base):
+    __tablename__ = "google_calendar_channels"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    calendar_id = Column(String, nullable=False, default="primary")
+
+    # X-Goog-Channel-ID (gerado por nós) / X-Goog-Resource-ID (devolvido pelo Google)
+    channel_id = Column(String, nullable=False, unique=True)
+    resource_id = Column(String, nullable=True)
+    # X-Goog-Channel-Token: segredo conferido em cada notificação
+    token = Column(String, nullable=False)
+
+    # 'active' | 'stopped' | 'expired'
+    status = Column(String, nullable=False, default="active")
+    expiration = Column(DateTime(timezone=True), nullable=True)
+
+    # última notificação de mudança (X-Goog-Resource-State != 'sync')
+    last_notified_at = Column(DateTime(timezone=True), nullable=True)
+    last_message_number = Column(BigInteger, nullable=True)
+    notifications = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_google_calendar_channels_calendar", "user_id", "calendar_id", "status"),
+    )
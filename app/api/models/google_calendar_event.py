@@ -0,0 +1,40 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, Index, UniqueConstraint, func
+from app.db.base_class import Base
+
+
+class GoogleCalendarEvent(Base):
+    """
+    Espelho local dos eventos do Google Calendar (mantido pelo sync incremental via syncToken).
+    Mesmos campos do CalendarEventSnapshot + o que a agenda precisa pra listar sem ir ao Google.
+    """
+
+    __tablename__ = "google_calendar_events"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    calendar_id = Column(String, nullable=False, default="primary")
+    google_event_id = Column(String, nullable=False)
+
+    summary = Column(Text, nullable=True)
+    description = Column(Text, nullable=True)
+    location = Column(Text, nullable=True)
+    start_datetime = Column(DateTime(timezone=True), nullable=True)
+    end_datetime = Column(DateTime(timezone=True), nullable=True)
+    all_day = Column(Boolean, nullable=False, default=False)
+    # 'confirmed' | 'tentative' | 'cancelled' (apagado no Google)
+    status = Column(String, nullable=True)
+    html_link = Column(Text, nullable=True)
+    last_google_updated = Column(DateTime(timezone=True), nullable=True)
+
+    # recurso do Google como veio (start/end originais com offset, recorrência etc)
+    raw = Column(JSON, nullable=True)
+
+    # última rodada de sync que trouxe o evento (full resync marca o que sumiu como cancelled)
+    synced_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "calendar_id", "google_event_id", name="uq_google_calendar_events_event"),
+        Index("ix_google_calendar_events_range", "user_id", "calendar_id", "start_datetime"),
+    )
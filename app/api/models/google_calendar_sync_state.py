@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, func
+from app.db.base_class import Base
+
+
+class GoogleCalendarSyncState(Base):
+    __tablename__ = "google_calendar_sync_states"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    calendar_id = Column(String, nullable=False, default="primary")
+
+    # nextSyncToken da última página; None = próximo sync é completo
+    sync_token = Column(Text, nullable=True)
+
+    last_synced_at = Column(DateTime(timezone=True), nullable=True)
+    last_full_sync_at = Column(DateTime(timezone=True), nullable=True)
+    full_syncs = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    # lease do sync em andamento (um worker por vez; renovado a cada página)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    # sync completo em background que falhou: próxima tentativa
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "calendar_id", name="uq_google_calendar_sync_states_calendar"),
+    )
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, Index, UniqueConstraint, func
+from app.db.base_class import Base
+
+
+class OutboundMessage(Base):
+    __tablename__ = "outbound_messages"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+
+    instance_name = Column(String, nullable=False, index=True)
+    to_number = Column(String, nullable=False)
+
+    # 'text' | 'audio'
+    kind = Column(String, nullable=False, default="text")
+    text = Column(Text, nullable=True)
+    media_url = Column(Text, nullable=True)
+
+    # origem do envio ('chatwoot', 'api'...) + id externo (ex.: id da mensagem no Chatwoot)
+    source = Column(String, nullable=False, default="api")
+    reference = Column(String, nullable=True)
+
+    # 'pending' | 'sending' | 'sent' | 'failed'
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    # key.id devolvido pela Evolution
+    provider_message_id = Column(String, nullable=True)
+
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_outbound_messages_status_next", "status", "next_attempt_at"),
+        # retry do webhook / replay do mesmo envio não duplica (reference NULL não conflita)
+        UniqueConstraint("source", "reference", name="uq_outbound_messages_source_reference"),
+        # ordem por destinatário: "há envio anterior em aberto pra esse número?"
+        Index("ix_outbound_messages_recipient", "instance_name", "to_number", "id"),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, func
+from app.db.base_class import Base
+
+
+class ProcessedMessage(Base):
+    __tablename__ = "processed_messages"
+
+    # (instância Evolution, key.id do WhatsApp)
+    instance_name = Column(String, primary_key=True)
+    message_id = Column(String, primary_key=True)
+
+    # 'claimed' (alguém está processando) | 'done'
+    status = Column(String, nullable=False, default="claimed")
+
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, JSON, Index, func
+from app.db.base_class import Base
+
+
+class WebhookDeadLetter(Base):
+    __tablename__ = "webhook_dead_letters"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+
+    # 'evolution' | 'chatwoot'
+    source = Column(String, nullable=False, index=True)
+    event = Column(String, nullable=False)
+
+    # instância Evolution / key.id ou id da mensagem Chatwoot (rastreio)
+    instance_name = Column(String, nullable=True, index=True)
+    reference = Column(String, nullable=True, index=True)
+
+    # payload bruto recebido no webhook
+    payload = Column(JSON, nullable=False)
+
+    # 'pending' | 'retrying' | 'replayed' | 'dead'
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=1)
+    last_error = Column(Text, nullable=True)
+
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_webhook_dead_letters_status_next", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,71 @@
+# app/api/services/cache_version_service.py
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.db.session import SessionLocal
+from app.db.upsert import insert_for
+from app.api.models.cache_version import CacheVersion
+
+_log = get_logger("cache_version")
+
+# caches de roteamento (TenantService + ChatwootRoutingService)
+TENANT_ROUTING = "tenant_routing"
+
+
+class CacheVersionService:
+    """
+    Invalidação entre workers dos caches em memória (cada processo do uvicorn tem o seu).
+
+    Quem altera o dado chama `bump(name)`: uma linha em cache_versions ganha +1.
+    Quem lê o cache chama `current(name)` e, se a versão mudou desde a última vez,
+    limpa o próprio cache. A leitura no banco é no máximo a cada
+    CACHE_VERSION_CHECK_SECONDS por processo, então esse é o atraso máximo.
+    """
+
+    # name -> (versão, monotonic da última leitura)
+    _seen: Dict[str, Tuple[int, float]] = {}
+
+    @staticmethod
+    def bump(name: str) -> None:
+        db = SessionLocal()
+        try:
+            stmt = insert_for(db, CacheVersion).values(name=name, version=1)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[CacheVersion.name],
+                set_={"version": CacheVersion.version + 1, "updated_at": datetime.now(timezone.utc)},
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # os outros workers caem no TTL do cache; o dado em si já foi gravado
+            _log.warning("CACHE_VERSION_BUMP_FAILED", cache=name, error=repr(e))
+        finally:
+            db.close()
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        now = time.monotonic()
+        seen = cls._seen.get(name)
+        if seen is not None and now - seen[1] < float(settings.CACHE_VERSION_CHECK_SECONDS):
+            return seen[0]
+
+        db = SessionLocal()
+        try:
+            version = db.execute(select(CacheVersion.version).where(CacheVersion.name == name)).scalar_one_or_none()
+        except Exception as e:
+            _log.warning("CACHE_VERSION_READ_FAILED", cache=name, error=repr(e))
+            return seen[0] if seen is not None else 0
+        finally:
+            db.close()
+
+        version = int(version or 0)
+        cls._seen[name] = (version, now)
+        return version
@@ -0,0 +1,194 @@
+# app/api/services/chatwoot_resolution_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, delete
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.upsert import insert_for
+from app.api.models.chatwoot_phone_link import ChatwootPhoneLink
+from app.api.models.chatwoot_conversation_map import ChatwootConversationMap
+from app.api.services.chatwoot_service import AsyncChatwootService, ChatwootNotFound
+
+_MISS = object()
+
+
+class ChatwootResolutionService:
+    """
+    Resolve (account_id, inbox_id, telefone) -> (contact_id, conversation_id) reaproveitando
+    ids conhecidos: memória -> tabela chatwoot_phone_links -> seed do chatwoot_conversation_map
+    (validado 1x no Chatwoot, porque o map antigo não guarda inbox) -> search/create no Chatwoot.
+
+    Ids conhecidos só são revalidados quando o Chatwoot devolve 404 (resolve(..., refresh=True)).
+    """
+
+    _links = TTLCache(
+        maxsize=settings.CHATWOOT_RESOLUTION_CACHE_SIZE,
+        ttl_seconds=settings.CHATWOOT_RESOLUTION_CACHE_TTL_SECONDS,
+        name="chatwoot_resolution",
+    )
+
+    @staticmethod
+    def _key(account_id: int, inbox_id: int, phone: str) -> Tuple[int, int, str]:
+        digits = "".join(ch for ch in (phone or "") if ch.isdigit())
+        return (int(account_id), int(inbox_id), digits)
+
+    # =========================
+    # DB (sync -> threadpool)
+    # =========================
+    @classmethod
+    def _lookup(cls, key: Tuple[int, int, str]) -> Optional[Dict[str, Any]]:
+        cached = cls._links.get(key, _MISS)
+        if cached is not _MISS:
+            return dict(cached, source="cache")
+
+        account_id, inbox_id, phone = key
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(ChatwootPhoneLink.chatwoot_contact_id, ChatwootPhoneLink.chatwoot_conversation_id)
+                .where(ChatwootPhoneLink.chatwoot_account_id == account_id)
+                .where(ChatwootPhoneLink.chatwoot_inbox_id == inbox_id)
+                .where(ChatwootPhoneLink.wa_phone_digits == phone)
+            ).first()
+            if row:
+                link = {"contact_id": row[0], "conversation_id": row[1]}
+                cls._links.set(key, link)
+                return dict(link, source="db")
+
+            seed = db.execute(
+                select(ChatwootConversationMap.chatwoot_conversation_id)
+                .where(ChatwootConversationMap.chatwoot_account_id == account_id)
+                .where(ChatwootConversationMap.wa_phone_digits == phone)
+                .order_by(ChatwootConversationMap.updated_at.desc())
+                .limit(1)
+            ).scalar_one_or_none()
+            if seed:
+                return {"contact_id": None, "conversation_id": int(seed), "source": "seed"}
+
+            return None
+        finally:
+            db.close()
+
+    @classmethod
+    def _remember(cls, key: Tuple[int, int, str], contact_id: int, conversation_id: int) -> None:
+        account_id, inbox_id, phone = key
+        db = SessionLocal()
+        try:
+            db.execute(
+                insert_for(db, ChatwootPhoneLink)
+                .values(
+                    chatwoot_account_id=account_id,
+                    chatwoot_inbox_id=inbox_id,
+                    wa_phone_digits=phone,
+                    chatwoot_contact_id=int(contact_id),
+                    chatwoot_conversation_id=int(conversation_id),
+                )
+                .on_conflict_do_update(
+                    index_elements=["chatwoot_account_id", "chatwoot_inbox_id", "wa_phone_digits"],
+                    set_={
+                        "chatwoot_contact_id": int(contact_id),
+                        "chatwoot_conversation_id": int(conversation_id),
+                    },
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        cls._links.set(key, {"contact_id": int(contact_id), "conversation_id": int(conversation_id)})
+
+    @classmethod
+    def _forget(cls, key: Tuple[int, int, str]) -> None:
+        cls._links.delete(key)
+
+        account_id, inbox_id, phone = key
+        db = SessionLocal()
+        try:
+            db.execute(
+                delete(ChatwootPhoneLink)
+                .where(ChatwootPhoneLink.chatwoot_account_id == account_id)
+                .where(ChatwootPhoneLink.chatwoot_inbox_id == inbox_id)
+                .where(ChatwootPhoneLink.wa_phone_digits == phone)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    # =========================
+    # RESOLUÇÃO (async)
+    # =========================
+    @classmethod
+    async def _validate_seed(cls, cw: AsyncChatwootService, inbox_id: int, conversation_id: int) -> Optional[int]:
+        """Confere se a conversa do map antigo é deste inbox; devolve o contact_id dela."""
+        try:
+            conv = await cw.get_conversation(conversation_id)
+        except ChatwootNotFound:
+            return None
+
+        if not isinstance(conv, dict) or conv.get("inbox_id") != inbox_id:
+            return None
+
+        sender = (conv.get("meta") or {}).get("sender") or {}
+        return cw._extract_id(sender)
+
+    @classmethod
+    async def resolve(
+        cls,
+        cw: AsyncChatwootService,
+        inbox_id: int,
+        phone_digits: str,
+        contact_name: str,
+        refresh: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Retorna {"contact_id", "conversation_id", "source"}.
+        source: cache | db | seed | created
+        refresh=True descarta o vínculo conhecido (Chatwoot respondeu 404).
+        """
+        key = cls._key(cw.account_id, inbox_id, phone_digits)
+        known_contact_id = None
+
+        if refresh:
+            cached = cls._links.get(key)
+            known_contact_id = (cached or {}).get("contact_id")
+            await run_in_threadpool(cls._forget, key)
+        else:
+            link = await run_in_threadpool(cls._lookup, key)
+            if link and link["source"] != "seed":
+                return link
+
+            if link:
+                contact_id = await cls._validate_seed(cw, int(inbox_id), link["conversation_id"])
+                if contact_id:
+                    await run_in_threadpool(cls._remember, key, contact_id, link["conversation_id"])
+                    return {"contact_id": contact_id, "conversation_id": link["conversation_id"], "source": "seed"}
+
+        conv = None
+        contact_id = known_contact_id
+        if contact_id:
+            try:
+                conv = await cw.create_conversation(inbox_id=int(inbox_id), contact_id=int(contact_id))
+            except ChatwootNotFound:
+                contact_id = None
+
+        if conv is None:
+            contact = await cw.get_or_create_contact(name=contact_name, phone_e164=f"+{key[2]}")
+            contact_id = cw._extract_id(contact)
+            if not contact_id:
+                return {"contact_id": None, "conversation_id": None, "source": "created"}
+            conv = await cw.create_conversation(inbox_id=int(inbox_id), contact_id=int(contact_id))
+
+        conversation_id = cw._extract_id(conv)
+        if conversation_id:
+            await run_in_threadpool(cls._remember, key, contact_id, conversation_id)
+
+        return {"contact_id": contact_id, "conversation_id": conversation_id, "source": "created"}
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return cls._links.stats()
@@ -0,0 +1,164 @@
+# app/api/services/chatwoot_routing_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, false, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.api.models.tenant_integration import TenantIntegration
+from app.api.models.chatwoot_conversation_map import ChatwootConversationMap
+from app.api.services.cache_version_service import TENANT_ROUTING, CacheVersionService
+
+_MISS = object()
+
+
+class ChatwootRoutingService:
+    """
+    Roteamento dos eventos outgoing do Chatwoot: (account_id, inbox_id, conversation_id)
+    -> user_id, instância Evolution e telefone mapeado da conversa.
+
+    Miss total = 1 query (tenant_integrations LEFT JOIN chatwoot_conversation_map);
+    integração em cache e conversa nova = 1 query só do telefone; tudo em cache = 0.
+
+    Integração por inbox_id (único por tenant) -> invalidada junto com o cache de tenant
+    (inclusive vinda de outro worker, pela versão compartilhada TENANT_ROUTING).
+    Telefone ausente fica em cache negativo curto; o self-healing (`remember_phone`) atualiza.
+    """
+
+    _integrations = TTLCache(
+        maxsize=settings.TENANT_CACHE_SIZE,
+        ttl_seconds=settings.CHATWOOT_ROUTING_CACHE_TTL_SECONDS,
+        name="chatwoot_routing_integration",
+    )
+    _phones = TTLCache(
+        maxsize=settings.TENANT_CACHE_SIZE,
+        ttl_seconds=settings.CHATWOOT_ROUTING_CACHE_TTL_SECONDS,
+        name="chatwoot_routing_phone",
+    )
+
+    _version: Optional[int] = None
+
+    @classmethod
+    def _sync_version(cls) -> None:
+        version = CacheVersionService.current(TENANT_ROUTING)
+        if version != cls._version:
+            if cls._version is not None:
+                cls._integrations.clear()
+                cls._phones.clear()
+            cls._version = version
+
+    @staticmethod
+    def _route(integration: Dict[str, Any], phone: Optional[str], source: str) -> Dict[str, Any]:
+        return {
+            "user_id": integration["user_id"],
+            "instance_name": integration["instance_name"],
+            "mapped_phone": phone,
+            "source": source,
+        }
+
+    @classmethod
+    def _cache_integration(cls, inbox_id: int, integration: Optional[Dict[str, Any]]) -> None:
+        ttl = None if integration else settings.CHATWOOT_ROUTING_NEGATIVE_TTL_SECONDS
+        cls._integrations.set(inbox_id, integration, ttl_seconds=ttl)
+
+    @classmethod
+    def _cache_phone(cls, key: tuple, phone: Optional[str]) -> None:
+        ttl = None if phone else settings.CHATWOOT_ROUTING_NEGATIVE_TTL_SECONDS
+        cls._phones.set(key, phone, ttl_seconds=ttl)
+
+    @classmethod
+    def resolve(cls, account_id: int, inbox_id: int, conversation_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Sync (DB) -> chamar via run_in_threadpool.
+        None = nenhum tenant com esse (account_id, inbox_id).
+        """
+        account_id, inbox_id = int(account_id), int(inbox_id)
+        cls._sync_version()
+        phone_key = (account_id, int(conversation_id)) if conversation_id else None
+
+        integration = cls._integrations.get(inbox_id, _MISS)
+        if integration is not _MISS and integration is not None and integration["account_id"] != account_id:
+            integration = None
+
+        phone = cls._phones.get(phone_key, _MISS) if phone_key else None
+
+        if integration is not _MISS and phone is not _MISS:
+            return cls._route(integration, phone, "cache") if integration else None
+
+        db = SessionLocal()
+        try:
+            if integration is _MISS:
+                map_join = (
+                    and_(
+                        ChatwootConversationMap.chatwoot_account_id == TenantIntegration.chatwoot_account_id,
+                        ChatwootConversationMap.chatwoot_conversation_id == phone_key[1],
+                    )
+                    if phone_key
+                    else false()
+                )
+                row = db.execute(
+                    select(
+                        TenantIntegration.user_id,
+                        TenantIntegration.evolution_instance_id,
+                        ChatwootConversationMap.wa_phone_digits,
+                    )
+                    .select_from(TenantIntegration)
+                    .outerjoin(ChatwootConversationMap, map_join)
+                    .where(TenantIntegration.chatwoot_account_id == account_id)
+                    .where(TenantIntegration.chatwoot_inbox_id == inbox_id)
+                    .limit(1)
+                ).first()
+
+                if row is None:
+                    cls._cache_integration(inbox_id, None)
+                    return None
+
+                integration = {
+                    "account_id": account_id,
+                    "user_id": int(row[0]),
+                    "instance_name": str(row[1]) if row[1] else None,
+                }
+                cls._cache_integration(inbox_id, integration)
+                phone = row[2]
+                if phone_key:
+                    cls._cache_phone(phone_key, phone)
+                return cls._route(integration, phone, "db")
+
+            if integration is None:
+                return None
+
+            phone = db.execute(
+                select(ChatwootConversationMap.wa_phone_digits)
+                .where(ChatwootConversationMap.chatwoot_account_id == account_id)
+                .where(ChatwootConversationMap.chatwoot_conversation_id == phone_key[1])
+            ).scalar_one_or_none()
+            cls._cache_phone(phone_key, phone)
+            return cls._route(integration, phone, "db")
+        finally:
+            db.close()
+
+    @classmethod
+    def remember_phone(cls, account_id: int, conversation_id: int, phone_digits: str) -> None:
+        """Depois do upsert no chatwoot_conversation_map (self-healing via API do Chatwoot)."""
+        if phone_digits:
+            cls._cache_phone((int(account_id), int(conversation_id)), phone_digits)
+
+    @classmethod
+    def invalidate(cls, inbox_ids=(), clear_all: bool = False) -> None:
+        if clear_all:
+            cls._integrations.clear()
+            cls._phones.clear()
+            return
+        for inbox_id in inbox_ids:
+            if inbox_id:
+                cls._integrations.delete(int(inbox_id))
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "integrations": cls._integrations.stats(),
+            "phones": cls._phones.stats(),
+        }
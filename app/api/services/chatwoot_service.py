@@ -1,16 +1,33 @@
 from __future__ import annotations
 
+import logging
 import mimetypes
+import httpx
 import requests
 
-from typing import Any, Dict, Optional, List
+from typing import Any, BinaryIO, Dict, Optional, List, Union
 
 import os
+
+from app.core.config import settings
+from app.core.http import get_session, upstream_request
+from app.core.logs import get_logger
+
+_log = get_logger("chatwoot")
+_http_log = get_logger("chatwoot.http")
+
+
+class ChatwootNotFound(RuntimeError):
+    """404 do Chatwoot (contato/conversa apagado ou id desatualizado)."""
+
+
 class ChatwootService:
-    def __init__(self, base_url: str, api_token: str, account_id: int):
+    def __init__(self, base_url: str, api_token: str, account_id: int, session: Optional[requests.Session] = None):
         self.base_url = base_url.rstrip("/")
         self.api_token = api_token
         self.account_id = account_id
+        # keep-alive: session pooled compartilhada por upstream (injetável)
+        self.http = session or get_session("chatwoot")
 
     def _headers(self) -> Dict[str, str]:
         return {
@@ -27,13 +44,17 @@ class ChatwootService:
         return f"{self.base_url}{path}"
 
     def _raise(self, r: requests.Response, msg: str):
+        if r.status_code == 404:
+            raise ChatwootNotFound(f"{msg}: {r.status_code} {r.text}")
         if r.status_code >= 300:
             raise RuntimeError(f"{msg}: {r.status_code} {r.text}")
 
     def _log_http(self, method: str, path: str, r: requests.Response, data: Any):
+        if not _http_log.is_enabled(logging.INFO):
+            return
         keys = list(data.keys()) if isinstance(data, dict) else None
-        print(
-            "CHATWOOT_HTTP:",
+        _http_log.info(
+            "CHATWOOT_HTTP",
             {"method": method, "path": path, "status": r.status_code, "keys": keys},
         )
 
@@ -184,8 +205,8 @@ class ChatwootService:
 
         n8n_response = self.send_audio_to_n8n(n8n_payload)
 
-        print(
-            "CHATWOOT_AUDIO_FORWARDED_TO_N8N:",
+        _log.info(
+            "CHATWOOT_AUDIO_FORWARDED_TO_N8N",
             {
                 "conversation_id": conversation_id,
                 "chatwoot_message_id": chatwoot_message_id,
@@ -323,7 +344,7 @@ class ChatwootService:
             "channel": channel_payload,
         }
 
-        r = requests.post(url, json=payload, headers=self._headers(), timeout=30)
+        r = self.http.post(url, json=payload, headers=self._headers())
         self._raise(r, "Chatwoot create_api_inbox failed")
 
         data = r.json()
@@ -345,8 +366,8 @@ class ChatwootService:
             )
         )
 
-        print(
-            "CHATWOOT_INBOX_CREATED:",
+        _log.info(
+            "CHATWOOT_INBOX_CREATED",
             {
                 "id": inbox_id,
                 "name": name,
@@ -365,7 +386,7 @@ class ChatwootService:
         path = f"/api/v1/accounts/{self.account_id}/contacts/search"
         url = self._url(path)
 
-        r = requests.get(url, params={"q": phone_e164}, headers=self._headers(), timeout=30)
+        r = self.http.get(url, params={"q": phone_e164}, headers=self._headers())
         self._raise(r, "Chatwoot search_contact failed")
         data = r.json()
         self._log_http("GET", path, r, data)
@@ -381,15 +402,15 @@ class ChatwootService:
         url = self._url(path)
 
         payload = {"name": name, "phone_number": phone_e164}
-        r = requests.post(url, json=payload, headers=self._headers(), timeout=30)
+        r = self.http.post(url, json=payload, headers=self._headers())
         self._raise(r, "Chatwoot create_contact failed")
         data = r.json()
         self._log_http("POST", path, r, data)
 
         contact = self._unwrap_contact(data)
 
-        print(
-            "CHATWOOT_CONTACT_CREATED:",
+        _log.info(
+            "CHATWOOT_CONTACT_CREATED",
             {"id": self._extract_id(contact), "name": name, "phone": phone_e164},
         )
         return contact if isinstance(contact, dict) else {"raw": contact}
@@ -397,13 +418,13 @@ class ChatwootService:
     def get_or_create_contact(self, name: str, phone_e164: str) -> Dict[str, Any]:
         found = self.search_contact(phone_e164=phone_e164)
         if found:
-            print("CHATWOOT_CONTACT_FOUND:", {"id": self._extract_id(found), "phone": phone_e164})
+            _log.info("CHATWOOT_CONTACT_FOUND", {"id": self._extract_id(found), "phone": phone_e164})
             return found
         return self.create_contact(name=name, phone_e164=phone_e164)
 
     def get_contact(self, contact_id: int) -> Dict[str, Any]:
         url = self._url(f"/api/v1/accounts/{self.account_id}/contacts/{contact_id}")
-        r = requests.get(url, headers=self._headers(), timeout=30)
+        r = self.http.get(url, headers=self._headers())
         self._raise(r, "Chatwoot get_contact failed")
         return r.json()
 
@@ -412,13 +433,13 @@ class ChatwootService:
         url = self._url(path)
 
         payload = {"inbox_id": inbox_id, "contact_id": contact_id}
-        r = requests.post(url, json=payload, headers=self._headers(), timeout=30)
+        r = self.http.post(url, json=payload, headers=self._headers())
         self._raise(r, "Chatwoot create_conversation failed")
         data = r.json()
         self._log_http("POST", path, r, data)
 
-        print(
-            "CHATWOOT_CONVERSATION_CREATED:",
+        _log.info(
+            "CHATWOOT_CONVERSATION_CREATED",
             {"id": self._extract_id(data), "inbox_id": inbox_id, "contact_id": contact_id},
         )
         return data if isinstance(data, dict) else {"raw": data}
@@ -428,7 +449,7 @@ class ChatwootService:
 
     def get_conversation(self, conversation_id: int) -> Dict[str, Any]:
         url = self._url(f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}")
-        r = requests.get(url, headers=self._headers(), timeout=30)
+        r = self.http.get(url, headers=self._headers())
         self._raise(r, "Chatwoot get_conversation failed")
         return r.json()
 
@@ -466,13 +487,13 @@ class ChatwootService:
         if attachments:
             payload["attachments"] = attachments
 
-        r = requests.post(url, json=payload, headers=self._headers(), timeout=30)
+        r = self.http.post(url, json=payload, headers=self._headers())
         self._raise(r, "Chatwoot create_message failed")
         data = r.json()
         self._log_http("POST", path, r, data)
 
-        print(
-            "CHATWOOT_MESSAGE_CREATED:",
+        _log.info(
+            "CHATWOOT_MESSAGE_CREATED",
             {"id": self._extract_id(data), "conversation_id": conversation_id, "type": message_type},
         )
         return data if isinstance(data, dict) else {"raw": data}
@@ -519,7 +540,7 @@ class ChatwootService:
         if isinstance(content, str) and content.strip():
             data["content"] = content.strip()
 
-        r = requests.post(
+        r = self.http.post(
             url,
             data=data,
             files=files,
@@ -530,8 +551,8 @@ class ChatwootService:
         data_resp = r.json()
         self._log_http("POST", path, r, data_resp)
 
-        print(
-            "CHATWOOT_MESSAGE_MEDIA_CREATED:",
+        _log.info(
+            "CHATWOOT_MESSAGE_MEDIA_CREATED",
             {
                 "id": self._extract_id(data_resp),
                 "conversation_id": conversation_id,
@@ -586,9 +607,9 @@ class ChatwootService:
         if is_recorded_audio:
             data["is_recorded_audio"] = f'["{safe_filename}"]'
 
-        print("CHATWOOT_MULTIPART_DATA:", data)
+        _log.debug("CHATWOOT_MULTIPART_DATA", data)
 
-        r = requests.post(
+        r = self.http.post(
             url,
             data=data,
             files=files,
@@ -599,8 +620,189 @@ class ChatwootService:
         data_resp = r.json()
         self._log_http("POST", path, r, data_resp)
 
-        print(
-            "CHATWOOT_MESSAGE_MEDIA_BYTES_CREATED:",
+        _log.info(
+            "CHATWOOT_MESSAGE_MEDIA_BYTES_CREATED",
+            {
+                "id": self._extract_id(data_resp),
+                "conversation_id": conversation_id,
+                "type": message_type,
+                "filename": safe_filename,
+                "mime_type": safe_mime,
+                "media_type": media_type,
+                "is_recorded_audio": is_recorded_audio,
+            },
+        )
+        return data_resp if isinstance(data_resp, dict) else {"raw": data_resp}
+
+
+class AsyncChatwootService(ChatwootService):
+    """
+    Variante não-bloqueante (httpx.AsyncClient compartilhado) dos métodos usados
+    nos webhooks: contato, conversa e mensagens. Provisionamento (inbox) continua
+    no client sync herdado.
+    """
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault("headers", self._headers())
+        kwargs.setdefault("timeout", settings.HTTP_TIMEOUT_CHATWOOT)
+        return await upstream_request("chatwoot", method, self._url(path), **kwargs)
+
+    async def search_contact(self, phone_e164: str) -> Optional[Dict[str, Any]]:
+        path = f"/api/v1/accounts/{self.account_id}/contacts/search"
+
+        r = await self._request("GET", path, params={"q": phone_e164})
+        self._raise(r, "Chatwoot search_contact failed")
+        data = r.json()
+        self._log_http("GET", path, r, data)
+
+        items = self._unwrap_payload(data)
+        if isinstance(items, list) and items:
+            return items[0]
+
+        return None
+
+    async def create_contact(self, name: str, phone_e164: str) -> Dict[str, Any]:
+        path = f"/api/v1/accounts/{self.account_id}/contacts"
+
+        payload = {"name": name, "phone_number": phone_e164}
+        r = await self._request("POST", path, json=payload)
+        self._raise(r, "Chatwoot create_contact failed")
+        data = r.json()
+        self._log_http("POST", path, r, data)
+
+        contact = self._unwrap_contact(data)
+
+        _log.info(
+            "CHATWOOT_CONTACT_CREATED",
+            {"id": self._extract_id(contact), "name": name, "phone": phone_e164},
+        )
+        return contact if isinstance(contact, dict) else {"raw": contact}
+
+    async def get_or_create_contact(self, name: str, phone_e164: str) -> Dict[str, Any]:
+        found = await self.search_contact(phone_e164=phone_e164)
+        if found:
+            _log.info("CHATWOOT_CONTACT_FOUND", {"id": self._extract_id(found), "phone": phone_e164})
+            return found
+        return await self.create_contact(name=name, phone_e164=phone_e164)
+
+    async def get_contact(self, contact_id: int) -> Dict[str, Any]:
+        r = await self._request("GET", f"/api/v1/accounts/{self.account_id}/contacts/{contact_id}")
+        self._raise(r, "Chatwoot get_contact failed")
+        return r.json()
+
+    async def create_conversation(self, inbox_id: int, contact_id: int) -> Dict[str, Any]:
+        path = f"/api/v1/accounts/{self.account_id}/conversations"
+
+        payload = {"inbox_id": inbox_id, "contact_id": contact_id}
+        r = await self._request("POST", path, json=payload)
+        self._raise(r, "Chatwoot create_conversation failed")
+        data = r.json()
+        self._log_http("POST", path, r, data)
+
+        _log.info(
+            "CHATWOOT_CONVERSATION_CREATED",
+            {"id": self._extract_id(data), "inbox_id": inbox_id, "contact_id": contact_id},
+        )
+        return data if isinstance(data, dict) else {"raw": data}
+
+    async def get_or_create_conversation(self, inbox_id: int, contact_id: int) -> Dict[str, Any]:
+        return await self.create_conversation(inbox_id=inbox_id, contact_id=contact_id)
+
+    async def get_conversation(self, conversation_id: int) -> Dict[str, Any]:
+        r = await self._request("GET", f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}")
+        self._raise(r, "Chatwoot get_conversation failed")
+        return r.json()
+
+    async def create_message(
+        self,
+        conversation_id: int,
+        content: str,
+        message_type: str = "incoming",
+        attachments: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        path = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}/messages"
+
+        payload: Dict[str, Any] = {
+            "content": content,
+            "message_type": message_type,
+        }
+
+        if attachments:
+            payload["attachments"] = attachments
+
+        r = await self._request("POST", path, json=payload)
+        self._raise(r, "Chatwoot create_message failed")
+        data = r.json()
+        self._log_http("POST", path, r, data)
+
+        _log.info(
+            "CHATWOOT_MESSAGE_CREATED",
+            {"id": self._extract_id(data), "conversation_id": conversation_id, "type": message_type},
+        )
+        return data if isinstance(data, dict) else {"raw": data}
+
+    async def create_message_with_media_bytes(
+        self,
+        conversation_id: int,
+        file_bytes: Union[bytes, BinaryIO],
+        content: str = "",
+        message_type: str = "incoming",
+        media_type: Optional[str] = None,
+        filename: Optional[str] = None,
+        mime_type: Optional[str] = None,
+        is_recorded_audio: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        file_bytes pode ser um arquivo (ex.: app.core.media.Base64Reader):
+        o httpx envia o multipart em blocos, sem montar o corpo inteiro em memória.
+        """
+        path = f"/api/v1/accounts/{self.account_id}/conversations/{conversation_id}/messages"
+
+        safe_filename, safe_mime = self._guess_filename_and_mime(
+            media_url=filename or "file.bin",
+            media_type=media_type,
+            fallback_filename=filename,
+            response_content_type=mime_type,
+        )
+
+        if (media_type or "").lower() == "audio":
+            safe_filename = filename or "audio.ogg"
+            safe_mime = (mime_type or "audio/ogg").split(";")[0].strip()
+
+        files = {
+            "attachments[]": (
+                safe_filename,
+                file_bytes,
+                safe_mime,
+            )
+        }
+
+        data = {
+            "message_type": message_type,
+        }
+
+        if isinstance(content, str) and content.strip():
+            data["content"] = content.strip()
+
+        if is_recorded_audio:
+            data["is_recorded_audio"] = f'["{safe_filename}"]'
+
+        _log.debug("CHATWOOT_MULTIPART_DATA", data)
+
+        r = await self._request(
+            "POST",
+            path,
+            data=data,
+            files=files,
+            headers=self._headers_multipart(),
+            timeout=60,
+        )
+        self._raise(r, "Chatwoot create_message_with_media_bytes failed")
+        data_resp = r.json()
+        self._log_http("POST", path, r, data_resp)
+
+        _log.info(
+            "CHATWOOT_MESSAGE_MEDIA_BYTES_CREATED",
             {
                 "id": self._extract_id(data_resp),
                 "conversation_id": conversation_id,
@@ -611,4 +813,4 @@ class ChatwootService:
                 "is_recorded_audio": is_recorded_audio,
             },
         )
-        return data_resp if isinstance(data_resp, dict) else {"raw": data_resp}
\ No newline at end of file
+        return data_resp if isinstance(data_resp, dict) else {"raw": data_resp}
@@ -0,0 +1,343 @@
+# app/api/services/dead_letter_service.py
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, func
+
+from app.core.circuit import find_circuit_open
+from app.core.config import settings
+from app.core.logs import bind_log_context, get_logger
+from app.db.session import SessionLocal
+from app.api.models.webhook_dead_letter import WebhookDeadLetter
+
+# handler(event, payload) -> resultado; levanta exceção se falhar de novo
+Handler = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+_log = get_logger("dead_letter")
+
+
+class DeadLetterService:
+    """
+    Dead-letter durável dos webhooks (Evolution / Chatwoot).
+
+    O endpoint continua respondendo 200 pro upstream (sem tempestade de retries do lado
+    de lá), mas o payload que falhou vai pra webhook_dead_letters com o erro e as tentativas.
+    O retrier (`retry_due`, tarefa periódica) reprocessa em lotes pequenos e em série,
+    com backoff exponencial; esgotadas as tentativas a linha fica 'dead' até um replay manual.
+
+    Cada source registra seu handler no startup (`register`).
+    """
+
+    _handlers: Dict[str, Handler] = {}
+
+    @classmethod
+    def register(cls, source: str, handler: Handler) -> None:
+        cls._handlers[source] = handler
+
+    # ======================
+    # Persistência
+    # ======================
+
+    @staticmethod
+    def record(
+        source: str,
+        event: str,
+        payload: Dict[str, Any],
+        error: str,
+        instance_name: Optional[str] = None,
+        reference: Optional[str] = None,
+        attempts: int = 1,
+        retry_after: Optional[float] = None,
+    ) -> int:
+        now = datetime.now(timezone.utc)
+        # circuito aberto: tenta de novo quando ele deve fechar, não no backoff padrão
+        delay = retry_after if retry_after is not None else DeadLetterService._retry_delay_seconds(1)
+        db = SessionLocal()
+        try:
+            row = WebhookDeadLetter(
+                source=source,
+                event=event,
+                payload=payload,
+                instance_name=instance_name,
+                reference=reference,
+                status="pending",
+                attempts=max(int(attempts), 1),
+                last_error=(error or "")[:2000],
+                next_attempt_at=now + timedelta(seconds=max(delay, 1.0)),
+            )
+            db.add(row)
+            db.commit()
+            dead_letter_id = int(row.id)
+        finally:
+            db.close()
+
+        _log.warning(
+            "DEAD_LETTER_RECORDED",
+            dead_letter_id=dead_letter_id, source=source, event_name=event, instance=instance_name,
+            reference=reference, error=error,
+        )
+        return dead_letter_id
+
+    @staticmethod
+    def _retry_delay_seconds(attempts: int) -> int:
+        base = max(int(settings.DEAD_LETTER_RETRY_BASE_SECONDS), 1)
+        delay = base * (2 ** max(attempts - 1, 0))
+        return min(delay, int(settings.DEAD_LETTER_RETRY_MAX_SECONDS))
+
+    @staticmethod
+    def _claim(dead_letter_id: int, statuses: tuple = ("pending",)) -> Optional[WebhookDeadLetter]:
+        """UPDATE condicional -> 'retrying': dois retriers (ou retrier + replay manual) nunca pegam a mesma linha."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            res = db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.id == dead_letter_id)
+                .where(WebhookDeadLetter.status.in_(statuses))
+                .values(status="retrying", locked_at=now)
+            )
+            db.commit()
+            if res.rowcount != 1:
+                return None
+
+            row = db.get(WebhookDeadLetter, dead_letter_id)
+            if row is not None:
+                db.expunge(row)
+            return row
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_replayed(dead_letter_id: int) -> None:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.id == dead_letter_id)
+                .values(status="replayed", resolved_at=now, locked_at=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_failed(dead_letter_id: int, attempts: int, error: str) -> str:
+        """Conta a tentativa e agenda a próxima, ou 'dead' quando esgota. Retorna o status final."""
+        now = datetime.now(timezone.utc)
+        attempts += 1
+        status = "dead" if attempts >= int(settings.DEAD_LETTER_MAX_ATTEMPTS) else "pending"
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.id == dead_letter_id)
+                .values(
+                    status=status,
+                    attempts=attempts,
+                    last_error=(error or "")[:2000],
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=DeadLetterService._retry_delay_seconds(attempts)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        return status
+
+    @staticmethod
+    def _defer(dead_letter_id: int, delay_seconds: float) -> None:
+        """Circuito aberto: reagenda sem contar tentativa."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.id == dead_letter_id)
+                .values(
+                    status="pending",
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=max(delay_seconds, 1.0)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def due_ids(limit: int) -> List[int]:
+        now = datetime.now(timezone.utc)
+        lease_cutoff = now - timedelta(seconds=int(settings.DEAD_LETTER_LEASE_SECONDS))
+
+        db = SessionLocal()
+        try:
+            # retrier que morreu no meio: devolve pra fila
+            db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.status == "retrying")
+                .where(WebhookDeadLetter.locked_at < lease_cutoff)
+                .values(status="pending", locked_at=None)
+            )
+            db.commit()
+
+            rows = db.execute(
+                select(WebhookDeadLetter.id)
+                .where(WebhookDeadLetter.status == "pending")
+                .where(WebhookDeadLetter.next_attempt_at <= now)
+                .order_by(WebhookDeadLetter.next_attempt_at.asc(), WebhookDeadLetter.id.asc())
+                .limit(limit)
+            ).scalars().all()
+            return [int(r) for r in rows]
+        finally:
+            db.close()
+
+    # ======================
+    # Replay
+    # ======================
+
+    @classmethod
+    async def _replay_row(cls, row: WebhookDeadLetter) -> Dict[str, Any]:
+        handler = cls._handlers.get(row.source)
+        try:
+            if handler is None:
+                raise RuntimeError(f"sem handler registrado para source={row.source}")
+            result = await handler(row.event, row.payload)
+        except Exception as e:
+            circuit = find_circuit_open(e)
+            if circuit is not None:
+                await run_in_threadpool(cls._defer, int(row.id), circuit.retry_after)
+                _log.info("DEAD_LETTER_DEFERRED", dead_letter_id=row.id, source=row.source, circuit=circuit.name)
+                return {"ok": False, "id": row.id, "status": "pending", "error": repr(e), "deferred": True}
+
+            status = await run_in_threadpool(cls._mark_failed, int(row.id), int(row.attempts), repr(e))
+            _log.warning(
+                "DEAD_LETTER_RETRY_FAILED",
+                dead_letter_id=row.id, source=row.source, attempts=row.attempts + 1, status=status, error=repr(e),
+            )
+            return {"ok": False, "id": row.id, "status": status, "error": repr(e)}
+
+        await run_in_threadpool(cls._mark_replayed, int(row.id))
+        _log.info("DEAD_LETTER_REPLAYED", dead_letter_id=row.id, source=row.source, attempts=row.attempts)
+        return {"ok": True, "id": row.id, "status": "replayed", "result": result}
+
+    @classmethod
+    async def retry_due(cls) -> int:
+        """Tarefa periódica: lote pequeno, em série (não vira rajada no Chatwoot/Evolution)."""
+        ids = await run_in_threadpool(cls.due_ids, int(settings.DEAD_LETTER_BATCH_SIZE))
+        replayed = 0
+        for dead_letter_id in ids:
+            row = await run_in_threadpool(cls._claim, dead_letter_id)
+            if row is None:
+                continue
+            bind_log_context(trace_id=f"dead-letter-{dead_letter_id}")
+            result = await cls._replay_row(row)
+            if result["ok"]:
+                replayed += 1
+        return replayed
+
+    @classmethod
+    async def replay(cls, dead_letter_id: int) -> Optional[Dict[str, Any]]:
+        """Replay manual imediato (pending ou dead). None se não existe / já reprocessado / em retry."""
+        row = await run_in_threadpool(cls._claim, dead_letter_id, ("pending", "dead"))
+        if row is None:
+            return None
+        return await cls._replay_row(row)
+
+    @staticmethod
+    def schedule_replay(
+        source: Optional[str] = None,
+        status: str = "dead",
+        ids: Optional[List[int]] = None,
+        limit: int = 100,
+    ) -> int:
+        """
+        Replay em lote: só reagenda (pending, vence agora) e devolve as tentativas;
+        quem executa é o retrier, no ritmo dele. Só 'dead' ou 'pending': linha em
+        'retrying' já foi pega por um retrier.
+        """
+        if status not in ("dead", "pending"):
+            raise ValueError(f"status inválido para replay: {status}")
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            q = select(WebhookDeadLetter.id).where(WebhookDeadLetter.status == status)
+            if source:
+                q = q.where(WebhookDeadLetter.source == source)
+            if ids:
+                q = q.where(WebhookDeadLetter.id.in_(ids))
+            target = db.execute(q.order_by(WebhookDeadLetter.id.asc()).limit(limit)).scalars().all()
+            if not target:
+                return 0
+
+            res = db.execute(
+                update(WebhookDeadLetter)
+                .where(WebhookDeadLetter.id.in_(target))
+                .where(WebhookDeadLetter.status == status)
+                .values(status="pending", attempts=0, next_attempt_at=now, locked_at=None)
+            )
+            db.commit()
+            return int(res.rowcount or 0)
+        finally:
+            db.close()
+
+    # ======================
+    # Consulta
+    # ======================
+
+    @staticmethod
+    def list_items(
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        limit: int = 50,
+        include_payload: bool = False,
+    ) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            q = select(WebhookDeadLetter)
+            if status:
+                q = q.where(WebhookDeadLetter.status == status)
+            if source:
+                q = q.where(WebhookDeadLetter.source == source)
+            rows = db.execute(q.order_by(WebhookDeadLetter.id.desc()).limit(limit)).scalars().all()
+
+            out = []
+            for r in rows:
+                item = {
+                    "id": r.id,
+                    "source": r.source,
+                    "event": r.event,
+                    "instance_name": r.instance_name,
+                    "reference": r.reference,
+                    "status": r.status,
+                    "attempts": r.attempts,
+                    "last_error": r.last_error,
+                    "next_attempt_at": r.next_attempt_at,
+                    "created_at": r.created_at,
+                    "resolved_at": r.resolved_at,
+                }
+                if include_payload:
+                    item["payload"] = r.payload
+                out.append(item)
+            return out
+        finally:
+            db.close()
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(WebhookDeadLetter.source, WebhookDeadLetter.status, func.count())
+                .group_by(WebhookDeadLetter.source, WebhookDeadLetter.status)
+            ).all()
+        finally:
+            db.close()
+
+        out: Dict[str, Dict[str, int]] = {}
+        for source, status, n in rows:
+            out.setdefault(source, {})[status] = int(n)
+        return out
@@ -0,0 +1,444 @@
+# app/api/services/evolution_ingest_service.py
+from __future__ import annotations
+
+import inspect
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, select, update
+from sqlalchemy.orm import aliased
+
+from app.core.circuit import find_circuit_open
+from app.core.config import settings
+from app.core.lanes import KeyedSerializer, LaneExecutor
+from app.core.logs import bind_log_context, get_logger, trace_id_var
+from app.db.session import SessionLocal
+from app.api.models.evolution_inbound_event import EvolutionInboundEvent
+from app.api.services.dead_letter_service import DeadLetterService
+
+# processor(event, payload) -> resultado; pode ser sync ou async
+Processor = Callable[[str, Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+_log = get_logger("evolution.ingest")
+
+
+class _IngestMetrics:
+    """Contadores por instância (em memória, por worker do uvicorn)."""
+
+    FIELDS = ("received", "enqueued", "deferred", "circuit_deferred", "processed", "failed_attempts", "retried", "dead")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {f: 0 for f in self.FIELDS})
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._latency_ms: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+
+    def incr(self, instance_name: str, field: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[instance_name][field] += n
+
+    def in_flight(self, instance_name: str, delta: int) -> None:
+        with self._lock:
+            self._in_flight[instance_name] += delta
+
+    def observe(self, instance_name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            lat = self._latency_ms[instance_name]
+            lat["count"] += 1
+            lat["total"] += elapsed_ms
+            lat["max"] = max(lat["max"], elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for inst in set(self._counters) | set(self._in_flight):
+                lat = self._latency_ms.get(inst) or {"count": 0, "total": 0.0, "max": 0.0}
+                out[inst] = {
+                    **self._counters[inst],
+                    "in_flight": self._in_flight.get(inst, 0),
+                    "processing_ms_avg": round(lat["total"] / lat["count"], 1) if lat["count"] else None,
+                    "processing_ms_max": round(lat["max"], 1) if lat["count"] else None,
+                }
+            return out
+
+
+class EvolutionIngestService:
+    """
+    Ingestão assíncrona do webhook da Evolution:
+      1) o endpoint valida e persiste o payload bruto (evolution_inbound_events)
+      2) responde imediatamente pra Evolution
+      3) lanes processam (Chatwoot etc) fora do request: mesmo (instance, remoteJid)
+         sempre na mesma lane, em ordem; conversas diferentes em paralelo
+
+    Retry é durável: a linha fica no banco com next_attempt_at (backoff exponencial)
+    e o poller (`requeue_due`) devolve pra fila o que venceu, inclusive após restart.
+    Enquanto um evento da conversa está pending/processing (inclusive em backoff ou
+    adiado por circuito aberto), os seguintes da mesma conversa ficam estacionados no
+    banco (`_claim` recusa) e só andam quando ele termina: a lane não fica presa, mas a
+    ordem por conversa se mantém. Esgotadas as tentativas o evento vai pro dead-letter
+    e a conversa destrava; o replay dele chega depois das mensagens mais novas
+    (troca aceita pra uma mensagem venenosa não travar a conversa).
+
+    O modo "inline" (`run_ordered`) não usa as lanes: serializa pela conversa exata no
+    próprio request (KeyedSerializer), sem teto entre conversas. Falha no inline vai
+    direto pro dead-letter, com a mesma ressalva de ordem do replay.
+    """
+
+    lanes = LaneExecutor(
+        "evolution_ingest",
+        lanes=settings.EVOLUTION_INGEST_CONCURRENCY,
+        lane_queue_size=max(int(settings.EVOLUTION_INGEST_QUEUE_SIZE) // max(int(settings.EVOLUTION_INGEST_CONCURRENCY), 1), 1),
+    )
+    inline = KeyedSerializer("evolution_inline")
+    _processor: Optional[Processor] = None
+    metrics = _IngestMetrics()
+
+    # ======================
+    # Persistência
+    # ======================
+
+    @staticmethod
+    def persist(
+        instance_name: str,
+        event: str,
+        payload: Dict[str, Any],
+        message_id: Optional[str] = None,
+        remote_jid: Optional[str] = None,
+    ) -> int:
+        db = SessionLocal()
+        try:
+            row = EvolutionInboundEvent(
+                instance_name=instance_name,
+                event=event,
+                payload=payload,
+                message_id=message_id,
+                remote_jid=remote_jid,
+                status="pending",
+                attempts=0,
+                next_attempt_at=datetime.now(timezone.utc),
+            )
+            db.add(row)
+            db.commit()
+            EvolutionIngestService.metrics.incr(instance_name, "received")
+            return int(row.id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _has_earlier_open():
+        """
+        Existe evento anterior da mesma conversa ainda em aberto (pending/processing)?
+        Correlacionado com a linha externa de EvolutionInboundEvent.
+        """
+        prior = aliased(EvolutionInboundEvent)
+        return exists().where(
+            prior.instance_name == EvolutionInboundEvent.instance_name,
+            prior.remote_jid == EvolutionInboundEvent.remote_jid,
+            prior.id < EvolutionInboundEvent.id,
+            prior.status.in_(("pending", "processing")),
+        )
+
+    @staticmethod
+    def _claim(event_id: int) -> Optional[EvolutionInboundEvent]:
+        """
+        Marca o evento como 'processing' de forma atômica (UPDATE condicional),
+        assim dois workers/processos nunca pegam o mesmo evento. Recusa também quando
+        um evento anterior da mesma conversa ainda está em aberto (fica estacionado).
+        """
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            res = db.execute(
+                update(EvolutionInboundEvent)
+                .where(EvolutionInboundEvent.id == event_id)
+                .where(EvolutionInboundEvent.status == "pending")
+                .where(~EvolutionIngestService._has_earlier_open())
+                .values(
+                    status="processing",
+                    attempts=EvolutionInboundEvent.attempts + 1,
+                    locked_at=now,
+                )
+            )
+            db.commit()
+            if res.rowcount != 1:
+                return None
+
+            row = db.get(EvolutionInboundEvent, event_id)
+            if row is not None:
+                db.expunge(row)
+            return row
+        finally:
+            db.close()
+
+    @staticmethod
+    def _retry_delay_seconds(attempts: int) -> int:
+        base = max(int(settings.EVOLUTION_INGEST_RETRY_BASE_SECONDS), 1)
+        delay = base * (2 ** max(attempts - 1, 0))
+        return min(delay, int(settings.EVOLUTION_INGEST_RETRY_MAX_SECONDS))
+
+    @staticmethod
+    def _mark_done(event_id: int) -> None:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(EvolutionInboundEvent)
+                .where(EvolutionInboundEvent.id == event_id)
+                .values(status="done", processed_at=now, locked_at=None, last_error=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_failed(event_id: int, attempts: int, error: str) -> str:
+        """Agenda retry com backoff ou marca 'failed' quando esgota tentativas. Retorna o status final."""
+        now = datetime.now(timezone.utc)
+        exhausted = attempts >= int(settings.EVOLUTION_INGEST_MAX_ATTEMPTS)
+        status = "failed" if exhausted else "pending"
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(EvolutionInboundEvent)
+                .where(EvolutionInboundEvent.id == event_id)
+                .values(
+                    status=status,
+                    last_error=error[:2000],
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=EvolutionIngestService._retry_delay_seconds(attempts)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        return status
+
+    @staticmethod
+    def _defer(event_id: int, delay_seconds: float) -> None:
+        """Upstream com circuito aberto: volta pra 'pending' sem gastar tentativa."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(EvolutionInboundEvent)
+                .where(EvolutionInboundEvent.id == event_id)
+                .values(
+                    status="pending",
+                    attempts=EvolutionInboundEvent.attempts - 1,
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=max(delay_seconds, 1.0)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def due_events(limit: int = 200) -> List[Tuple[int, str, Optional[str]]]:
+        """
+        Eventos prontos pra (re)processar:
+          - pending com next_attempt_at vencido
+          - processing com lease expirado (worker morreu no meio)
+        Só o primeiro em aberto de cada conversa (os estacionados esperam a vez).
+        """
+        now = datetime.now(timezone.utc)
+        lease_cutoff = now - timedelta(seconds=int(settings.EVOLUTION_INGEST_LEASE_SECONDS))
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(EvolutionInboundEvent)
+                .where(EvolutionInboundEvent.status == "processing")
+                .where(EvolutionInboundEvent.locked_at < lease_cutoff)
+                .values(status="pending", locked_at=None)
+            )
+            db.commit()
+
+            rows = db.execute(
+                select(EvolutionInboundEvent.id, EvolutionInboundEvent.instance_name, EvolutionInboundEvent.remote_jid)
+                .where(EvolutionInboundEvent.status == "pending")
+                .where(EvolutionInboundEvent.next_attempt_at <= now)
+                .where(~EvolutionIngestService._has_earlier_open())
+                .order_by(EvolutionInboundEvent.next_attempt_at.asc(), EvolutionInboundEvent.id.asc())
+                .limit(limit)
+            ).all()
+            return [(int(r[0]), r[1], r[2]) for r in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def next_parked(instance_name: str, remote_jid: str) -> Optional[int]:
+        """Próximo evento estacionado da conversa (o que destrava quando o anterior termina)."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(EvolutionInboundEvent.id, EvolutionInboundEvent.status, EvolutionInboundEvent.next_attempt_at)
+                .where(EvolutionInboundEvent.instance_name == instance_name)
+                .where(EvolutionInboundEvent.remote_jid == remote_jid)
+                .where(EvolutionInboundEvent.status.in_(("pending", "processing")))
+                .order_by(EvolutionInboundEvent.id.asc())
+                .limit(1)
+            ).first()
+        finally:
+            db.close()
+
+        if row is None or row[1] != "pending":
+            return None
+        due_at = row[2]
+        if due_at is not None and due_at.tzinfo is None:
+            due_at = due_at.replace(tzinfo=timezone.utc)
+        if due_at is not None and due_at > now:
+            return None
+        return int(row[0])
+
+    # ======================
+    # Lanes
+    # ======================
+
+    @staticmethod
+    def lane_key(instance_name: Optional[str], remote_jid: Optional[str], event_id: Any = None) -> tuple:
+        # sem remoteJid não há ordem a preservar: espalha pelo id
+        return (instance_name or "", remote_jid or f"event:{event_id}")
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls.lanes.is_running()
+
+    @classmethod
+    async def start(cls, processor: Processor) -> None:
+        cls._processor = processor
+        cls.lanes.start()
+
+    @classmethod
+    async def stop(cls) -> None:
+        await cls.lanes.stop()
+
+    @classmethod
+    async def run_ordered(cls, instance_name: str, remote_jid: Optional[str], job: Callable[[], Awaitable[Any]]) -> Any:
+        """Modo inline: espera o evento anterior da mesma conversa e devolve o resultado pro request."""
+        return await cls.inline.run(cls.lane_key(instance_name, remote_jid), job)
+
+    @classmethod
+    def submit(cls, instance_name: str, event_id: int, remote_jid: Optional[str] = None) -> bool:
+        """
+        Coloca o evento na lane da conversa. Se a lane estiver cheia (ou parada),
+        o evento continua 'pending' no banco e o poller pega depois — nunca bloqueia o webhook.
+        """
+        queued = cls.lanes.submit_nowait(
+            cls.lane_key(instance_name, remote_jid, event_id),
+            partial(cls._handle, event_id),
+        )
+        cls.metrics.incr(instance_name, "enqueued" if queued else "deferred")
+        return queued
+
+    @classmethod
+    async def requeue_due(cls) -> int:
+        if not cls.lanes.is_running():
+            return 0
+
+        stats = cls.lanes.stats()
+        free = stats["lanes"] * stats["lane_queue_size"] - stats["queued_total"]
+        if free <= 0:
+            return 0
+
+        due = await run_in_threadpool(cls.due_events, free)
+        requeued = 0
+        for event_id, instance_name, remote_jid in due:
+            if cls.lanes.submit_nowait(cls.lane_key(instance_name, remote_jid, event_id), partial(cls._handle, event_id)):
+                requeued += 1
+        return requeued
+
+    @classmethod
+    async def _handle(cls, event_id: int) -> None:
+        # reprocessamento pelo poller não tem request de origem: o trace é o evento
+        if trace_id_var.get() is None:
+            bind_log_context(trace_id=f"ingest-{event_id}")
+
+        row = await run_in_threadpool(cls._claim, event_id)
+        if row is None:
+            # outro worker/processo já pegou, já foi concluído, ou está estacionado
+            # atrás de um evento anterior da conversa (anda quando ele terminar)
+            return
+
+        instance_name = row.instance_name
+        if row.attempts > 1:
+            cls.metrics.incr(instance_name, "retried")
+
+        cls.metrics.in_flight(instance_name, +1)
+        started = time.perf_counter()
+        try:
+            await cls._run_processor(row.event, row.payload)
+        except Exception as e:
+            circuit = find_circuit_open(e)
+            if circuit is not None:
+                cls.metrics.incr(instance_name, "circuit_deferred")
+                await run_in_threadpool(cls._defer, event_id, circuit.retry_after)
+                _log.info("EVOLUTION_INGEST_DEFERRED", event_id=event_id, instance=instance_name, circuit=circuit.name)
+                return
+
+            cls.metrics.incr(instance_name, "failed_attempts")
+            status = await run_in_threadpool(cls._mark_failed, event_id, row.attempts, repr(e))
+            if status == "failed":
+                cls.metrics.incr(instance_name, "dead")
+                # tentativas rápidas esgotadas: segue no dead-letter com backoff longo
+                await run_in_threadpool(
+                    DeadLetterService.record,
+                    "evolution",
+                    row.event,
+                    row.payload,
+                    repr(e),
+                    instance_name,
+                    row.message_id,
+                    row.attempts,
+                )
+            _log.warning(
+                "EVOLUTION_INGEST_FAILED",
+                event_id=event_id, instance=instance_name, attempts=row.attempts, status=status, error=repr(e),
+            )
+            if status == "failed":
+                await cls._release_next(instance_name, row.remote_jid)
+            return
+        finally:
+            cls.metrics.in_flight(instance_name, -1)
+            cls.metrics.observe(instance_name, (time.perf_counter() - started) * 1000)
+
+        await run_in_threadpool(cls._mark_done, event_id)
+        cls.metrics.incr(instance_name, "processed")
+        await cls._release_next(instance_name, row.remote_jid)
+
+    @classmethod
+    async def _release_next(cls, instance_name: str, remote_jid: Optional[str]) -> None:
+        """Evento da conversa fechado: manda o próximo estacionado pra lane sem esperar o poller."""
+        if not remote_jid:
+            return
+        next_id = await run_in_threadpool(cls.next_parked, instance_name, remote_jid)
+        if next_id is not None:
+            cls.lanes.submit_nowait(cls.lane_key(instance_name, remote_jid, next_id), partial(cls._handle, next_id))
+
+    @classmethod
+    async def _run_processor(cls, event: str, payload: Dict[str, Any]) -> Any:
+        if cls._processor is None:
+            raise RuntimeError("EvolutionIngestService sem processor configurado")
+
+        if inspect.iscoroutinefunction(cls._processor):
+            return await cls._processor(event, payload)
+        return await run_in_threadpool(cls._processor, event, payload)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        lanes = cls.lanes.stats()
+        return {
+            "mode": settings.EVOLUTION_INGEST_MODE,
+            "running": cls.is_running(),
+            "queue_depth": lanes["queued_total"],
+            "lanes": lanes,
+            "inline": cls.inline.stats(),
+            "instances": cls.metrics.snapshot(),
+        }
@@ -0,0 +1,86 @@
+# app/api/services/evolution_prefilter.py
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Optional
+
+from app.core import fastjson
+from app.core.config import settings
+
+# só o messages-upsert é processado; o resto das assinaturas é ruído
+PROCESSED_EVENTS: FrozenSet[str] = frozenset({"messages-upsert"})
+
+# primeira ocorrência no corpo = data.key (a Evolution serializa `key` antes de `message`,
+# onde ficam contextInfo/quoted). Se não casar, o filtro estrutural pós-parse decide.
+_FROM_ME_RE = re.compile(rb'"fromMe"\s*:\s*(true|false)')
+_REMOTE_JID_RE = re.compile(rb'"remoteJid"\s*:\s*"([^"]*)"')
+
+
+class EvolutionPrefilter:
+    """
+    Filtro barato antes do parse completo do webhook da Evolution:
+      1) pelo path (/webhooks/evolution/{event}) — nem lê o corpo;
+      2) nos bytes crus (fromMe / @g.us) — nem decodifica o JSON.
+    Ignorados são contados (stats em /ops/metrics) em vez de logados,
+    a menos que EVOLUTION_LOG_IGNORED_EVENTS esteja ligado.
+    """
+
+    _lock = threading.Lock()
+    _ignored: Counter = Counter()
+    _accepted = 0
+
+    @staticmethod
+    def normalize_event(event: str) -> str:
+        # "MESSAGES_UPSERT" / "messages.upsert" / "messages-upsert"
+        return (event or "").strip().lower().replace("_", "-").replace(".", "-")
+
+    @classmethod
+    def check_event(cls, event: str) -> Optional[str]:
+        if cls.normalize_event(event) not in PROCESSED_EVENTS:
+            return "non_message_event"
+        return None
+
+    @classmethod
+    def check_raw(cls, body: bytes) -> Optional[str]:
+        m = _FROM_ME_RE.search(body)
+        if m and m.group(1) == b"true":
+            return "from_me"
+
+        m = _REMOTE_JID_RE.search(body)
+        if m and m.group(1).endswith(b"@g.us"):
+            return "group_message"
+
+        return None
+
+    @staticmethod
+    def parse(body: bytes) -> Dict[str, Any]:
+        payload = fastjson.loads(body)
+        if not isinstance(payload, dict):
+            raise ValueError("payload não é um objeto JSON")
+        return payload
+
+    @classmethod
+    def count_ignored(cls, reason: str) -> None:
+        with cls._lock:
+            cls._ignored[reason] += 1
+
+    @classmethod
+    def count_accepted(cls) -> None:
+        with cls._lock:
+            cls._accepted += 1
+
+    @staticmethod
+    def log_enabled() -> bool:
+        return bool(settings.EVOLUTION_LOG_IGNORED_EVENTS)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {
+                "json_backend": fastjson.backend(),
+                "accepted": cls._accepted,
+                "ignored_total": sum(cls._ignored.values()),
+                "ignored": dict(cls._ignored),
+            }
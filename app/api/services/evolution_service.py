@@ -1,14 +1,37 @@
 from __future__ import annotations
 
+import threading
+
+import httpx
 import requests
 from typing import Any, Dict, List, Optional
 from app.core.config import settings
+from app.core.http import ResponseTooLarge, get_session, upstream_request, upstream_request_limited
+from app.core.logs import get_logger
+from app.core.media import MediaTooLarge, base64_response_limit
+
+_log = get_logger("evolution.http")
+
+
+class EvolutionHTTPError(RuntimeError):
+    """Erro HTTP (status_code) ou de conexão (status_code=None) da Evolution."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class EvolutionService:
-    def __init__(self, base_url: str = None, api_key: str = None):
+    # rota que funcionou por (base_url, operação) -> índice na lista de variantes.
+    # Só é descartada quando a rota lembrada volta a dar 404/405.
+    _route_cache: Dict[tuple, int] = {}
+    _route_lock = threading.Lock()
+
+    def __init__(self, base_url: str = None, api_key: str = None, session: Optional[requests.Session] = None):
         self.base_url = (base_url or settings.EVOLUTION_BASE_URL).rstrip("/")
         self.api_key = api_key or settings.EVOLUTION_API_KEY
+        # keep-alive: session pooled compartilhada por upstream (injetável)
+        self.http = session or get_session("evolution")
 
     def _headers(self) -> Dict[str, str]:
         return {
@@ -16,49 +39,185 @@ class EvolutionService:
             "Content-Type": "application/json"
         }
 
-    def _post(self, path: str, payload: Dict[str, Any], timeout: int = 30) -> Dict[str, Any]:
+    @staticmethod
+    def _check_post_response(r: Any, url: str, path: str) -> Dict[str, Any]:
+        """Tratamento de resposta compartilhado entre o client sync (requests) e o async (httpx)."""
+        if r.status_code in (404, 405):
+            try:
+                resp_json = r.json()
+                err_response = resp_json.get("response", {})
+                msg_list = err_response.get("message", []) if isinstance(err_response, dict) else []
+                error_msg = str(resp_json)
+
+                is_instance_error = "Instance not found" in error_msg or "instance not found" in error_msg.lower()
+                if is_instance_error:
+                    raise RuntimeError(f"INSTANCE_NOT_FOUND: A instância '{url.split('/')[-1]}' não existe ou está offline.")
+
+            except RuntimeError:
+                raise
+            except Exception:
+                pass
+
+            _log.warning("DEBUG_EVO_FAIL", status=r.status_code, path=path, body=r.text[:200])
+            raise FileNotFoundError(f"{r.status_code} Not Found: {url}")
+
+        if r.status_code >= 400:
+            try:
+                error_data = r.json()
+            except Exception:
+                error_data = r.text
+            raise EvolutionHTTPError(f"Evolution API Error {r.status_code}: {error_data}", r.status_code)
+
+        return r.json()
+
+    def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
         try:
-            r = requests.post(url, json=payload, headers=self._headers(), timeout=timeout)
-
-            if r.status_code in (404, 405):
-                try:
-                    resp_json = r.json()
-                    err_response = resp_json.get("response", {})
-                    msg_list = err_response.get("message", []) if isinstance(err_response, dict) else []
-                    error_msg = str(resp_json)
-
-                    is_instance_error = "Instance not found" in error_msg or "instance not found" in error_msg.lower()
-                    if is_instance_error:
-                        raise RuntimeError(f"INSTANCE_NOT_FOUND: A instância '{url.split('/')[-1]}' não existe ou está offline.")
-
-                except RuntimeError:
-                    raise
-                except Exception:
-                    pass
-
-                print(f"DEBUG_EVO_FAIL: {r.status_code} em {path} -> {r.text[:200]}")
-                raise FileNotFoundError(f"{r.status_code} Not Found: {url}")
-
-            if r.status_code >= 400:
-                try:
-                    error_data = r.json()
-                except Exception:
-                    error_data = r.text
-                raise RuntimeError(f"Evolution API Error {r.status_code}: {error_data}")
-
-            return r.json()
+            r = self.http.post(url, json=payload, headers=self._headers(), timeout=timeout)
+            return self._check_post_response(r, url, path)
         except requests.RequestException as e:
-            raise RuntimeError(f"Evolution Connection Error: {str(e)}")
+            raise EvolutionHTTPError(f"Evolution Connection Error: {str(e)}")
 
-    def _get(self, path: str, params: Dict[str, Any] = None, timeout: int = 20) -> Dict[str, Any]:
+    def _get(self, path: str, params: Dict[str, Any] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
         try:
-            r = requests.get(url, params=params, headers=self._headers(), timeout=timeout)
+            r = self.http.get(url, params=params, headers=self._headers(), timeout=timeout)
             r.raise_for_status()
             return r.json()
         except requests.RequestException as e:
-            raise RuntimeError(f"Evolution Connection Error: {str(e)}")
+            raise EvolutionHTTPError(f"Evolution Connection Error: {str(e)}")
+
+    # ======================
+    # Rotas (variam entre versões da Evolution)
+    # ======================
+
+    @staticmethod
+    def _send_text_routes(instance_name: str) -> List[str]:
+        return [
+            f"/message/send/text/{instance_name}",
+            f"/api/message/send/text/{instance_name}",
+            f"/message/sendText/{instance_name}",
+            f"/api/message/sendText/{instance_name}",
+            f"/message/sendText?instanceName={instance_name}",
+        ]
+
+    @staticmethod
+    def _send_audio_routes(instance_name: str) -> List[str]:
+        return [
+            f"/message/send/audio/{instance_name}",
+            f"/api/message/send/audio/{instance_name}",
+            f"/message/sendWhatsAppAudio/{instance_name}",
+            f"/message/sendAudio/{instance_name}",
+            f"/message/sendWhatsAppAudio?instanceName={instance_name}",
+        ]
+
+    @staticmethod
+    def _download_media_routes(instance_name: str) -> List[str]:
+        return [
+            f"/chat/getBase64FromMediaMessage/{instance_name}",
+            f"/api/chat/getBase64FromMediaMessage/{instance_name}",
+            f"/message/downloadMedia/{instance_name}",
+            f"/api/message/downloadMedia/{instance_name}",
+        ]
+
+    @staticmethod
+    def _text_payload(to_number: str, text: str) -> Dict[str, Any]:
+        return {
+            "number": to_number,
+            "text": text,
+            "delay": settings.OUTBOUND_TYPING_DELAY_MS,
+            "linkPreview": True
+        }
+
+    @staticmethod
+    def _audio_payload(to_number: str, audio_url: str) -> Dict[str, Any]:
+        return {
+            "number": to_number,
+            "audio": audio_url,
+            "delay": settings.OUTBOUND_TYPING_DELAY_MS,
+            "recordinAudio": True
+        }
+
+    _ROUTE_BUILDERS = {
+        "send_text": "_send_text_routes",
+        "send_audio": "_send_audio_routes",
+        "download_media": "_download_media_routes",
+    }
+
+    @classmethod
+    def _routes(cls, operation: str, instance_name: str) -> List[str]:
+        return getattr(cls, cls._ROUTE_BUILDERS[operation])(instance_name)
+
+    def _route_order(self, operation: str, count: int) -> List[int]:
+        """Rota já descoberta primeiro; as demais só entram se ela falhar."""
+        cached = self._route_cache.get((self.base_url, operation))
+        order = list(range(count))
+        if cached is not None and cached < count:
+            order.remove(cached)
+            order.insert(0, cached)
+        return order
+
+    def _remember_route(self, operation: str, index: int) -> None:
+        key = (self.base_url, operation)
+        if self._route_cache.get(key) != index:
+            with self._route_lock:
+                self._route_cache[key] = index
+            _log.info("EVOLUTION_ROUTE_DISCOVERED", base_url=self.base_url, op=operation, index=index)
+
+    def _forget_route(self, operation: str, index: int) -> None:
+        key = (self.base_url, operation)
+        with self._route_lock:
+            if self._route_cache.get(key) == index:
+                del self._route_cache[key]
+                _log.info("EVOLUTION_ROUTE_STALE", base_url=self.base_url, op=operation, index=index)
+
+    def _post_first_route(self, operation: str, instance_name: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        routes = self._routes(operation, instance_name)
+        last_error = None
+        for index in self._route_order(operation, len(routes)):
+            try:
+                result = self._post(routes[index], payload, timeout=timeout)
+            except FileNotFoundError as e:
+                self._forget_route(operation, index)
+                last_error = e
+                continue
+            self._remember_route(operation, index)
+            return result
+
+        if last_error:
+            raise last_error
+
+        raise RuntimeError("Nenhuma rota da Evolution respondeu")
+
+    @classmethod
+    def discovered_routes(cls) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for (base_url, operation), index in list(cls._route_cache.items()):
+            out.setdefault(base_url, {})[operation] = {
+                "index": index,
+                "route": cls._routes(operation, "{instance}")[index],
+            }
+        return out
+
+    # ======================
+    # Info
+    # ======================
+
+    @staticmethod
+    def get_info():
+        svc = EvolutionService()
+        try:
+            evolution_raw = svc._get("/")
+        except RuntimeError as e:
+            evolution_raw = {"error": str(e)}
+
+        return {
+            "ok": True,
+            "base_url": svc.base_url,
+            "evolution_raw": evolution_raw,
+            # rotas descobertas neste processo (vazio até o primeiro envio)
+            "routes": EvolutionService.discovered_routes().get(svc.base_url, {}),
+        }
 
     # ======================
     # Instance Management
@@ -116,6 +275,33 @@ class EvolutionService:
         svc = EvolutionService()
         return svc._get(f"/webhook/find/{instance_name}")
 
+    @staticmethod
+    def webhook_events() -> List[str]:
+        """Eventos que o backend realmente consome (EVOLUTION_WEBHOOK_EVENTS)."""
+        return [e.strip() for e in settings.EVOLUTION_WEBHOOK_EVENTS.split(",") if e.strip()]
+
+    @classmethod
+    def trim_webhook_events(cls, instance_name: str, events: Optional[List[str]] = None):
+        """
+        Reaplica o webhook atual da instância (mesma url/flags) assinando só `events`
+        (default: webhook_events()) — tira presence/chats/contacts-update da instância.
+        """
+        current = cls.find_webhook(instance_name) or {}
+        hook = current.get("webhook") if isinstance(current.get("webhook"), dict) else current
+
+        url = hook.get("url")
+        if not url:
+            raise ValueError(f"instância {instance_name} sem webhook configurado")
+
+        return cls.set_webhook(
+            instance_name=instance_name,
+            url=url,
+            events=events or cls.webhook_events(),
+            enabled=bool(hook.get("enabled", True)),
+            webhook_by_events=bool(hook.get("webhookByEvents", hook.get("webhook_by_events", True))),
+            webhook_base64=bool(hook.get("webhookBase64", hook.get("webhook_base64", False))),
+        )
+
     # ======================
     # Messaging
     # ======================
@@ -125,64 +311,22 @@ class EvolutionService:
         svc = cls()
         instance_name = instance_name.strip()
 
-        payload = {
-            "number": to_number,
-            "text": text,
-            "delay": 1200,
-            "linkPreview": True
-        }
-
-        try:
-            return svc._post(f"/message/send/text/{instance_name}", payload)
-        except FileNotFoundError:
-            pass
-
-        try:
-            return svc._post(f"/api/message/send/text/{instance_name}", payload)
-        except FileNotFoundError:
-            pass
-
-        try:
-            return svc._post(f"/message/sendText/{instance_name}", payload)
-        except FileNotFoundError:
-            pass
-
-        try:
-            return svc._post(f"/api/message/sendText/{instance_name}", payload)
-        except FileNotFoundError:
-            pass
-
-        return svc._post(f"/message/sendText?instanceName={instance_name}", payload)
+        return svc._post_first_route(
+            "send_text",
+            instance_name,
+            cls._text_payload(to_number, text),
+        )
 
     @classmethod
     def send_audio(cls, instance_name: str, to_number: str, audio_url: str):
         svc = cls()
         instance_name = instance_name.strip()
 
-        payload = {
-            "number": to_number,
-            "audio": audio_url,
-            "delay": 1200,
-            "recordinAudio": True
-        }
-
-        routes = [
-            f"/message/send/audio/{instance_name}",
-            f"/api/message/send/audio/{instance_name}",
-            f"/message/sendWhatsAppAudio/{instance_name}",
-            f"/message/sendAudio/{instance_name}",
-            f"/message/sendWhatsAppAudio?instanceName={instance_name}"
-        ]
-
-        last_error = None
-        for route in routes:
-            try:
-                return svc._post(route, payload)
-            except FileNotFoundError as e:
-                last_error = e
-                continue
-
-        raise last_error
+        return svc._post_first_route(
+            "send_audio",
+            instance_name,
+            cls._audio_payload(to_number, audio_url),
+        )
 
     @classmethod
     def send_audio_url(cls, instance_name: str, to: str, audio_url: str, ptt: bool = True):
@@ -197,29 +341,12 @@ class EvolutionService:
         svc = cls()
         instance_name = instance_name.strip()
 
-        payload = {
-            "message": message
-        }
-
-        routes = [
-            f"/chat/getBase64FromMediaMessage/{instance_name}",
-            f"/api/chat/getBase64FromMediaMessage/{instance_name}",
-            f"/message/downloadMedia/{instance_name}",
-            f"/api/message/downloadMedia/{instance_name}",
-        ]
-
-        last_error = None
-        for route in routes:
-            try:
-                return svc._post(route, payload, timeout=60)
-            except FileNotFoundError as e:
-                last_error = e
-                continue
-
-        if last_error:
-            raise last_error
-
-        raise RuntimeError("Nenhuma rota de download de mídia da Evolution respondeu")
+        return svc._post_first_route(
+            "download_media",
+            instance_name,
+            {"message": message},
+            timeout=60,
+        )
 
     @staticmethod
     def get_instance_qrcode(instance_name: str):
@@ -245,3 +372,100 @@ class EvolutionService:
             "qrcode_base64": qrcode.get("base64"),
             "raw": qrcode
         }
+
+
+class AsyncEvolutionService(EvolutionService):
+    """
+    Variante não-bloqueante para os handlers async (webhooks).
+    Usa o httpx.AsyncClient compartilhado; mesma lógica de rotas/erros do client sync.
+    """
+
+    async def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        kwargs = {"json": payload, "headers": self._headers(), "timeout": timeout or settings.HTTP_TIMEOUT_EVOLUTION}
+        try:
+            if max_bytes:
+                # corpo lido em streaming: resposta acima do teto é abortada antes do json
+                r = await upstream_request_limited("evolution", "POST", url, max_bytes, **kwargs)
+            else:
+                r = await upstream_request("evolution", "POST", url, **kwargs)
+            return self._check_post_response(r, url, path)
+        except httpx.HTTPError as e:
+            raise EvolutionHTTPError(f"Evolution Connection Error: {str(e)}")
+
+    async def _get(self, path: str, params: Dict[str, Any] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        try:
+            r = await upstream_request("evolution", "GET", url, params=params, headers=self._headers(), timeout=timeout or settings.HTTP_TIMEOUT_EVOLUTION)
+            r.raise_for_status()
+            return r.json()
+        except httpx.HTTPError as e:
+            raise EvolutionHTTPError(f"Evolution Connection Error: {str(e)}")
+
+    async def _post_first_route(
+        self,
+        operation: str,
+        instance_name: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        routes = self._routes(operation, instance_name)
+        last_error = None
+        for index in self._route_order(operation, len(routes)):
+            try:
+                result = await self._post(routes[index], payload, timeout=timeout, max_bytes=max_bytes)
+            except FileNotFoundError as e:
+                self._forget_route(operation, index)
+                last_error = e
+                continue
+            self._remember_route(operation, index)
+            return result
+
+        if last_error:
+            raise last_error
+
+        raise RuntimeError("Nenhuma rota da Evolution respondeu")
+
+    @classmethod
+    async def send_text(cls, instance_name: str, to_number: str, text: str):
+        svc = cls()
+        instance_name = instance_name.strip()
+
+        return await svc._post_first_route(
+            "send_text",
+            instance_name,
+            cls._text_payload(to_number, text),
+        )
+
+    @classmethod
+    async def send_audio(cls, instance_name: str, to_number: str, audio_url: str):
+        svc = cls()
+        instance_name = instance_name.strip()
+
+        return await svc._post_first_route(
+            "send_audio",
+            instance_name,
+            cls._audio_payload(to_number, audio_url),
+        )
+
+    @classmethod
+    async def send_audio_url(cls, instance_name: str, to: str, audio_url: str, ptt: bool = True):
+        return await cls.send_audio(instance_name, to, audio_url)
+
+    @classmethod
+    async def download_media_base64(cls, instance_name: str, message: Dict[str, Any]):
+        """Levanta MediaTooLarge sem baixar o resto quando a resposta passa do teto da mídia."""
+        svc = cls()
+        instance_name = instance_name.strip()
+
+        try:
+            return await svc._post_first_route(
+                "download_media",
+                instance_name,
+                {"message": message},
+                timeout=60,
+                max_bytes=base64_response_limit(),
+            )
+        except ResponseTooLarge as e:
+            raise MediaTooLarge(str(e)) from e
@@ -0,0 +1,278 @@
+# app/api/services/google_calendar_batch_service.py
+from __future__ import annotations
+
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.http import get_session
+from app.core.logs import get_logger
+from app.db.session import SessionLocal
+from app.api.services.google_calendar_events_crud import normalize_google_event
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_event_pages import EVENT_FIELDS
+from app.api.services.google_token_service import GoogleTokenManager, GoogleTokenService
+
+GOOGLE_BATCH_URL = "https://www.googleapis.com/batch/calendar/v3"
+
+_log = get_logger("google.batch")
+
+# parte com esses status volta no próximo lote (uma vez)
+_RETRYABLE = {429, 500, 502, 503, 504}
+
+# falha de transporte (timeout/reset depois do envio): o Google pode ter aplicado o lote
+_UNKNOWN = 0
+
+
+def _event_path(calendar_id: str, event_id: Optional[str] = None) -> str:
+    path = f"/calendar/v3/calendars/{quote(calendar_id, safe='')}/events"
+    if event_id:
+        path += f"/{quote(event_id, safe='')}"
+    return path
+
+
+def _event_body(op: Dict[str, Any]) -> Dict[str, Any]:
+    """Corpo do evento: create manda tudo; update (PATCH) só o que veio preenchido."""
+    tz = op.get("timezone") or "America/Sao_Paulo"
+    body: Dict[str, Any] = {}
+    if op["op"] == "create":
+        # id escolhido aqui: create reenviado que já tinha sido aplicado volta 409, não duplica
+        body["id"] = op["new_event_id"]
+    if op.get("title") is not None or op["op"] == "create":
+        body["summary"] = op.get("title") or "(Sem título)"
+    if op.get("start"):
+        body["start"] = {"dateTime": op["start"], "timeZone": tz}
+    if op.get("end"):
+        body["end"] = {"dateTime": op["end"], "timeZone": tz}
+    if op.get("description") is not None:
+        body["description"] = op["description"]
+    if op.get("location") is not None:
+        body["location"] = op["location"]
+    return body
+
+
+def _validate(op: Dict[str, Any]) -> Optional[str]:
+    kind = op.get("op")
+    if kind not in ("create", "update", "delete"):
+        return f"op inválida: {kind}"
+    if kind == "create" and not (op.get("start") and op.get("end")):
+        return "create exige start e end"
+    if kind in ("update", "delete") and not op.get("event_id"):
+        return f"{kind} exige event_id"
+    if kind == "update" and not _event_body(op):
+        return "update sem campos"
+    return None
+
+
+class GoogleCalendarBatchService:
+    """
+    Operações em massa de eventos (create/update/delete) pelo endpoint batch do
+    Google: até GOOGLE_BATCH_MAX_PARTS (50) operações por request multipart/mixed,
+    com resultado por item. Partes 429/5xx são reenviadas uma vez no lote seguinte.
+    O que deu certo vai pro espelho local num commit só.
+
+    Reenvio nunca duplica: todo create leva um id gerado aqui, então o reenvio de um
+    create que o Google já tinha aplicado (lote com timeout/reset depois do envio,
+    resultado desconhecido) volta 409 e conta como criado. Update (PATCH com o mesmo
+    corpo) e delete (410 = já apagado) já são idempotentes.
+    """
+
+    _stats: Dict[str, int] = {"bulks": 0, "batches": 0, "operations": 0, "failed": 0, "retried": 0}
+
+    # ======================
+    # multipart/mixed
+    # ======================
+
+    @staticmethod
+    def _encode(ops: List[Tuple[int, Dict[str, Any]]], boundary: str) -> bytes:
+        parts: List[str] = []
+        for index, op in ops:
+            kind = op["op"]
+            if kind == "create":
+                method, path = "POST", _event_path(op.get("calendar_id") or "primary")
+            elif kind == "update":
+                method, path = "PATCH", _event_path(op.get("calendar_id") or "primary", op["event_id"])
+            else:
+                method, path = "DELETE", _event_path(op.get("calendar_id") or "primary", op["event_id"])
+
+            if kind != "delete":
+                # resposta só com os campos usados (espelho + normalização)
+                path += f"?fields={quote(EVENT_FIELDS, safe=',()')}"
+
+            lines = [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <item-{index}>",
+                "",
+                f"{method} {path} HTTP/1.1",
+            ]
+            if kind == "delete":
+                lines += ["", ""]
+            else:
+                lines += ["Content-Type: application/json; charset=UTF-8", "", json.dumps(_event_body(op), ensure_ascii=False)]
+            parts.append("\r\n".join(lines))
+
+        return ("\r\n".join(parts) + f"\r\n--{boundary}--\r\n").encode("utf-8")
+
+    @staticmethod
+    def _decode(content_type: str, payload: bytes) -> Dict[int, Tuple[int, Any]]:
+        """Resposta do batch -> {índice: (status, corpo json|texto)} pelo Content-ID."""
+        boundary = None
+        for piece in content_type.split(";"):
+            piece = piece.strip()
+            if piece.lower().startswith("boundary="):
+                boundary = piece.split("=", 1)[1].strip('"')
+        if not boundary:
+            raise RuntimeError(f"Google batch: resposta sem boundary ({content_type})")
+
+        text = payload.decode("utf-8", errors="replace").replace("\r\n", "\n")
+        results: Dict[int, Tuple[int, Any]] = {}
+        for part in text.split(f"--{boundary}"):
+            part = part.strip("\n")
+            if not part or part.startswith("--"):
+                continue
+
+            outer, _, inner = part.partition("\n\n")
+            content_id = None
+            for line in outer.split("\n"):
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-id":
+                    content_id = value.strip().strip("<>")
+            if not content_id or "item-" not in content_id:
+                continue
+            index = int(content_id.rsplit("item-", 1)[1])
+
+            head, _, body = inner.partition("\n\n")
+            status_line = head.split("\n", 1)[0]  # HTTP/1.1 200 OK
+            status = int(status_line.split(" ")[1])
+            body = body.strip()
+            try:
+                parsed: Any = json.loads(body) if body else None
+            except ValueError:
+                parsed = body
+            results[index] = (status, parsed)
+        return results
+
+    # ======================
+    # envio
+    # ======================
+
+    @classmethod
+    def _send(cls, user_id: int, access_token: str, ops: List[Tuple[int, Dict[str, Any]]]) -> Tuple[str, Dict[int, Tuple[int, Any]]]:
+        boundary = f"batch_{uuid.uuid4().hex}"
+        body = cls._encode(ops, boundary)
+        http = get_session("google_api")
+
+        def post(token: str):
+            return http.post(
+                GOOGLE_BATCH_URL,
+                data=body,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": f"multipart/mixed; boundary={boundary}",
+                },
+            )
+
+        res = post(access_token)
+        if res.status_code == 401:
+            access_token = GoogleTokenManager.force_refresh(user_id, access_token)
+            res = post(access_token)
+        if res.status_code >= 400:
+            raise RuntimeError(f"Google batch error {res.status_code}: {res.text}")
+
+        cls._stats["batches"] += 1
+        return access_token, cls._decode(res.headers.get("Content-Type", ""), res.content)
+
+    @classmethod
+    def execute(cls, db: Session, user_id: int, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        operations = [{op, calendar_id, event_id, title, start, end, timezone, description, location}]
+        -> {"results": [{index, op, event_id, ok, status, event, error}], "batches": n}
+        """
+        user_id = int(user_id)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for index, op in enumerate(operations):
+            error = _validate(op)
+            if error:
+                results[index] = {"index": index, "op": op.get("op"), "event_id": op.get("event_id"), "ok": False, "status": 400, "event": None, "error": error}
+            elif op["op"] == "create":
+                # base32hex (0-9a-v), 5-1024 chars: hex do uuid serve
+                pending.append((index, {**op, "new_event_id": uuid.uuid4().hex}))
+            else:
+                pending.append((index, op))
+
+        token_db = SessionLocal()
+        try:
+            access_token = GoogleTokenService.get_valid_access_token(token_db, user_id)
+        finally:
+            token_db.close()
+
+        max_parts = max(min(int(settings.GOOGLE_BATCH_MAX_PARTS), 50), 1)
+        batches = 0
+        changes: List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]] = []
+        retried: set = set()
+
+        while pending:
+            chunk, pending = pending[:max_parts], pending[max_parts:]
+            batches += 1
+            try:
+                access_token, answers = cls._send(user_id, access_token, chunk)
+            except Exception as e:
+                _log.warning("GOOGLE_BATCH_FAILED", user_id=user_id, parts=len(chunk), error=repr(e))
+                answers = {index: (_UNKNOWN, f"resultado desconhecido: {e!r}") for index, _ in chunk}
+
+            for index, op in chunk:
+                status, body = answers.get(index, (_UNKNOWN, "resultado desconhecido: parte sem resposta no batch"))
+                if (status in _RETRYABLE or status == _UNKNOWN) and index not in retried:
+                    retried.add(index)
+                    cls._stats["retried"] += 1
+                    pending.append((index, op))
+                    continue
+
+                calendar_id = op.get("calendar_id") or "primary"
+                ok = 200 <= status < 300 or (op["op"] == "delete" and status == 410)  # 410 = já apagado
+                if op["op"] == "create" and status == 409 and index in retried:
+                    # o envio anterior já tinha criado (mesmo id): o próximo sync traz o evento
+                    ok = True
+                event = None
+                if ok and op["op"] == "delete":
+                    changes.append((calendar_id, None, op["event_id"]))
+                elif ok and isinstance(body, dict):
+                    changes.append((calendar_id, body, None))
+                    event = normalize_google_event(body)
+
+                error = None
+                if not ok:
+                    error = (body.get("error") or {}).get("message") if isinstance(body, dict) else body
+                    cls._stats["failed"] += 1
+                results[index] = {
+                    "index": index,
+                    "op": op["op"],
+                    "event_id": op.get("new_event_id") or op.get("event_id"),
+                    "ok": ok,
+                    "status": status,
+                    "event": event,
+                    "error": error,
+                }
+
+        if changes:
+            GoogleCalendarSyncService.write_through_many(db, user_id, changes)
+
+        cls._stats["bulks"] += 1
+        cls._stats["operations"] += len(operations)
+        return {
+            "total": len(operations),
+            "ok": sum(1 for r in results if r and r["ok"]),
+            "failed": sum(1 for r in results if r and not r["ok"]),
+            "batches": batches,
+            "results": results,
+        }
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return dict(cls._stats)
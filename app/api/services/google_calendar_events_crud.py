@@ -3,21 +3,17 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional, List
 import requests
-from datetime import datetime, timezone
+from datetime import datetime
 
 from sqlalchemy.orm import Session
 from app.api.services.google_token_service import GoogleTokenService
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_event_pages import EVENT_FIELDS
+from app.core.http import get_session
 
 GOOGLE_CAL_BASE = "https://www.googleapis.com/calendar/v3"
 
 
-def _iso(dt: datetime) -> str:
-    # garante tz
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt.isoformat()
-
-
 def normalize_google_event(item: Dict[str, Any]) -> Dict[str, Any]:
     start_obj = item.get("start", {}) or {}
     end_obj = item.get("end", {}) or {}
@@ -50,9 +46,13 @@ class GoogleCalendarEventsCRUD:
 
     Observação:
     - Não faz refresh manual aqui: assume que get_valid_access_token já entrega token válido.
-    - Se você quiser mirror local, chame seu mirror service no router, após cada operação.
+    - Escritas atualizam o espelho local (google_calendar_events) na hora; o próximo
+      sync incremental confirma. Leituras vêm do espelho (GoogleCalendarSyncService).
     """
 
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.http = session or get_session("google_api")
+
     def create(
         self,
         db: Session,
@@ -80,7 +80,7 @@ class GoogleCalendarEventsCRUD:
         if location is not None:
             body["location"] = location
 
-        res = requests.post(url, json=body, headers=headers, timeout=30)
+        res = self.http.post(url, json=body, headers=headers, params={"fields": EVENT_FIELDS})
         if res.status_code not in (200, 201):
             try:
                 payload = res.json()
@@ -88,7 +88,9 @@ class GoogleCalendarEventsCRUD:
                 payload = {"raw": res.text}
             raise RuntimeError(f"Google create error {res.status_code}: {payload}")
 
-        return normalize_google_event(res.json())
+        item = res.json()
+        GoogleCalendarSyncService.write_through(db, user_id, calendar_id, item=item)
+        return normalize_google_event(item)
 
     def update(
         self,
@@ -120,7 +122,7 @@ class GoogleCalendarEventsCRUD:
         if location is not None:
             body["location"] = location
 
-        res = requests.patch(url, json=body, headers=headers, timeout=30)
+        res = self.http.patch(url, json=body, headers=headers, params={"fields": EVENT_FIELDS})
         if res.status_code not in (200, 201):
             try:
                 payload = res.json()
@@ -128,7 +130,9 @@ class GoogleCalendarEventsCRUD:
                 payload = {"raw": res.text}
             raise RuntimeError(f"Google update error {res.status_code}: {payload}")
 
-        return normalize_google_event(res.json())
+        item = res.json()
+        GoogleCalendarSyncService.write_through(db, user_id, calendar_id, item=item)
+        return normalize_google_event(item)
 
     def delete(
         self,
@@ -142,7 +146,7 @@ class GoogleCalendarEventsCRUD:
         url = f"{GOOGLE_CAL_BASE}/calendars/{calendar_id}/events/{event_id}"
         headers = {"Authorization": f"Bearer {token}"}
 
-        res = requests.delete(url, headers=headers, timeout=30)
+        res = self.http.delete(url, headers=headers)
         if res.status_code not in (200, 204):
             try:
                 payload = res.json()
@@ -150,6 +154,7 @@ class GoogleCalendarEventsCRUD:
                 payload = {"raw": res.text}
             raise RuntimeError(f"Google delete error {res.status_code}: {payload}")
 
+        GoogleCalendarSyncService.write_through(db, user_id, calendar_id, deleted_id=event_id)
         return True
 
     def list_range(
@@ -162,34 +167,15 @@ class GoogleCalendarEventsCRUD:
         telefone: Optional[str] = None,
         max_results: int = 250,
     ) -> List[Dict[str, Any]]:
-        token = GoogleTokenService.get_valid_access_token_agenda(db=db, user_id=user_id)
-
-        params: Dict[str, Any] = {
-            "singleEvents": "true",
-            "orderBy": "startTime",
-            "maxResults": max_results,
-        }
-        if time_min:
-            params["timeMin"] = _iso(time_min)
-        if time_max:
-            params["timeMax"] = _iso(time_max)
-        if telefone:
-            params["q"] = telefone
-
-        url = f"{GOOGLE_CAL_BASE}/calendars/{calendar_id}/events"
-        headers = {"Authorization": f"Bearer {token}"}
-
-        res = requests.get(url, headers=headers, params=params, timeout=30)
-        if res.status_code >= 400:
-            try:
-                payload = res.json()
-            except Exception:
-                payload = {"raw": res.text}
-            raise RuntimeError(f"Google list error {res.status_code}: {payload}")
-
-        data = res.json()
-        items = data.get("items") or []
-        return [normalize_google_event(it) for it in items]
-
+        rows = GoogleCalendarSyncService.read_range(
+            db,
+            user_id,
+            calendar_id=calendar_id,
+            time_min=time_min,
+            time_max=time_max,
+            text=telefone,
+            limit=max_results,
+        )
+        return [normalize_google_event(r.raw or {}) for r in rows]
 
 google_calendar_events_crud = GoogleCalendarEventsCRUD()
\ No newline at end of file
@@ -1,4 +1,5 @@
-import requests
+from app.core.http import get_session
+from app.api.services.google_event_pages import EVENT_FIELDS
 
 class GoogleCalendarEventsService:
     GOOGLE_EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events"
@@ -27,7 +28,7 @@ class GoogleCalendarEventsService:
             "end": {"dateTime": end_datetime, "timeZone": timezone},
         }
 
-        r = requests.post(url, json=body, headers=headers)
+        r = get_session("google_api").post(url, json=body, headers=headers, params={"fields": EVENT_FIELDS})
         if r.status_code not in (200, 201):
             raise Exception(f"Erro ao criar evento: {r.text}")
 
@@ -1,21 +1,11 @@
 from __future__ import annotations
 
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
-import requests
+from datetime import datetime
 
 from sqlalchemy.orm import Session
 
-from app.api.services.google_token_service import GoogleTokenService  # ✅ usa o seu service existente
-
-GOOGLE_CAL_BASE = "https://www.googleapis.com/calendar/v3"
-
-
-def _iso(dt: datetime) -> str:
-    # garante timezone
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt.isoformat()
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
 
 
 def _normalize_google_event(item: Dict[str, Any]) -> Dict[str, Any]:
@@ -51,38 +41,19 @@ def list_events_range(
     time_min: Optional[datetime] = None,
     time_max: Optional[datetime] = None,
     telefone: Optional[str] = None,
-    max_results: int = 250,
+    max_results: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
-    # ✅ aqui é o ponto principal: usa o token service que já funciona
-    token = GoogleTokenService.get_valid_access_token(db=db, user_id=user_id)
-
-    params: Dict[str, Any] = {
-        "singleEvents": "true",
-        "orderBy": "startTime",
-        "maxResults": max_results,
-    }
-    if time_min:
-        params["timeMin"] = _iso(time_min)
-    if time_max:
-        params["timeMax"] = _iso(time_max)
-
-    # filtro de texto do Google Calendar (summary/description etc)
-    if telefone:
-        params["q"] = telefone
-
-    url = f"{GOOGLE_CAL_BASE}/calendars/{calendar_id}/events"
-    headers = {"Authorization": f"Bearer {token}"}
-
-    res = requests.get(url, headers=headers, params=params, timeout=30)
-
-    # ✅ erro amigável
-    if res.status_code >= 400:
-        try:
-            payload = res.json()
-        except Exception:
-            payload = {"raw": res.text}
-        raise RuntimeError(f"Google API error {res.status_code}: {payload}")
-
-    data = res.json()
-    items = data.get("items") or []
-    return [_normalize_google_event(it) for it in items]
+    # sync incremental (syncToken) + leitura do espelho local: sem chamada ao Google
+    # dentro do intervalo mínimo, e só o delta fora dele.
+    # max_results=None = intervalo inteiro (uso interno, ex.: analytics); o teto fica no endpoint HTTP
+    # 1º sync ainda pendente: lê a janela direto no Google (espelho vazio não é "sem eventos")
+    rows = GoogleCalendarSyncService.read_range(
+        db,
+        user_id,
+        calendar_id=calendar_id,
+        time_min=time_min,
+        time_max=time_max,
+        text=telefone,  # equivalente ao `q` do Google (summary/description/location)
+        limit=max_results,
+    )
+    return [_normalize_google_event(r.raw or {}) for r in rows]
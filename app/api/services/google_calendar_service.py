@@ -1,41 +1,28 @@
 import requests
 from datetime import datetime
+from typing import Optional
+
+from app.core.http import get_session
 from app.api.services.google_token_service import GoogleTokenService
+from app.api.services.google_event_pages import EVENT_FIELDS, iter_events
+from app.api.services.google_freebusy_service import GoogleFreeBusyService
 
 GOOGLE_FREEBUSY_URL = "https://www.googleapis.com/calendar/v3/freeBusy"
 GOOGLE_DELETE_EVENT_URL = "https://www.googleapis.com/calendar/v3/calendars/{calendarId}/events/{eventId}"
 
 class GoogleCalendarService:
 
-    def get_availability(self, token, start_date, end_date, timezone):
-        headers = {
-            "Authorization": f"Bearer {token.google_access_token}",
-            "Content-Type": "application/json"
-        }
-
-        body = {
-            "timeMin": start_date,
-            "timeMax": end_date,
-            "timeZone": timezone,
-            "items": [{"id": "primary"}]
-        }
-
-        response = requests.post(GOOGLE_FREEBUSY_URL, json=body, headers=headers)
-
-        # token expirado → tenta refresh
-        if response.status_code == 401:
-            from app.api.services.google_token_service import GoogleTokenService
-            token = GoogleTokenService.refresh_access_token(token.db, token)
-            headers["Authorization"] = f"Bearer {token.google_access_token}"
-            response = requests.post(GOOGLE_FREEBUSY_URL, json=body, headers=headers)
-
-        if response.status_code != 200:
-            raise Exception(response.text)
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.http = session or get_session("google_api")
 
-        data = response.json()
-        busy = data["calendars"]["primary"]["busy"]
+    def get_availability(self, token, start_date, end_date, timezone, calendar_id: str = "primary"):
+        # FreeBusy via serviço em lote (token válido + refresh no 401)
+        result = GoogleFreeBusyService.query([(token.user_id, calendar_id)], start_date, end_date, tz=timezone)
+        entry = result[int(token.user_id)]
+        if entry["errors"]:
+            raise Exception(str(entry["errors"]))
 
-        return self._busy_to_free(start_date, end_date, busy)
+        return self._busy_to_free(start_date, end_date, entry["busy"])
 
     def _busy_to_free(self, start_date, end_date, busy_intervals):
         free = []
@@ -87,7 +74,7 @@ class GoogleCalendarService:
             "end": {"dateTime": end, "timeZone": timezone},
         }
 
-        response = requests.patch(url, json=body, headers=headers)
+        response = self.http.patch(url, json=body, headers=headers, params={"fields": EVENT_FIELDS})
         
         # 🔥 TOKEN EXPIRADO → REFRESH AUTOMÁTICO
         # if response.status_code == 401:
@@ -102,37 +89,20 @@ class GoogleCalendarService:
 
 
     
-    def list_events(self, token, calendar_id: str):
-
-        url = f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events"
-
-        headers = {
-            "Authorization": f"Bearer {token.google_access_token}",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            raise Exception(f"Erro ao listar eventos: {response.text}")
-
-        data = response.json()
-        return data.get("items", [])
-
-
-
-
+    def list_events(self, token, calendar_id: str, limit: Optional[int] = None):
+        # segue nextPageToken (antes só vinha a 1ª página)
+        return list(iter_events(token.google_access_token, calendar_id, {"maxResults": 250}, limit=limit, http=self.http))
 
     def delete_event(self, db, token, calendar_id: str, event_id: str):
         url = GOOGLE_DELETE_EVENT_URL.format(calendarId=calendar_id, eventId=event_id)
 
         headers = {"Authorization": f"Bearer {token.google_access_token}"}
-        response = requests.delete(url, headers=headers)
+        response = self.http.delete(url, headers=headers)
 
         if response.status_code == 401:
             token = GoogleTokenService.refresh_access_token(db, token)
             headers["Authorization"] = f"Bearer {token.google_access_token}"
-            response = requests.delete(url, headers=headers)
+            response = self.http.delete(url, headers=headers)
 
         if response.status_code not in (200, 204):
             raise Exception(f"Erro ao deletar evento: {response.text}")
@@ -0,0 +1,647 @@
+# app/api/services/google_calendar_sync_service.py
+from __future__ import annotations
+
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logs import get_logger
+from app.db.session import SessionLocal
+from app.db.upsert import insert_for
+from app.api.models.google_calendar_channel import GoogleCalendarChannel
+from app.api.models.google_calendar_event import GoogleCalendarEvent
+from app.api.models.google_calendar_sync_state import GoogleCalendarSyncState
+from app.api.services.google_event_pages import SyncTokenExpired, iter_event_pages, iter_events
+from app.api.services.google_token_service import GoogleTokenManager, GoogleTokenNotFound, GoogleTokenService
+
+_log = get_logger("google.sync")
+
+
+def _parse_google_dt(obj: Optional[Dict[str, Any]]) -> Tuple[Optional[datetime], bool]:
+    """start/end do Google -> (datetime tz-aware, all_day). Dia inteiro vira meia-noite UTC."""
+    if not obj:
+        return None, False
+    if obj.get("dateTime"):
+        dt = datetime.fromisoformat(obj["dateTime"].replace("Z", "+00:00"))
+        # sempre em UTC: o offset original continua em raw
+        return (dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)), False
+    if obj.get("date"):
+        d = date.fromisoformat(obj["date"])
+        return datetime(d.year, d.month, d.day, tzinfo=timezone.utc), True
+    return None, False
+
+
+def _parse_rfc3339(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class GoogleCalendarSyncService:
+    """
+    Sync incremental Google Calendar -> google_calendar_events (espelho local).
+
+    1º sync de um calendário = completo (singleEvents, todas as páginas) e guarda o
+    nextSyncToken; os seguintes mandam o syncToken e só recebem o que mudou
+    (inclusive apagados, como status=cancelled). 410 Gone -> resync completo, e o que
+    não veio no resync fica 'cancelled'.
+
+    Sync completo (1º ou depois de 410) nunca roda no request: `ensure_synced` só
+    marca o calendário (sync_token vazio) e a tarefa periódica `full_sync_due` faz o
+    trabalho. Enquanto isso `ensure_synced` devolve "pending" (1º sync: `read_range`
+    lê a janela direto no Google) ou "stale" (410: o espelho antigo segue servindo).
+
+    Leituras (agenda, lembretes, analytics) chamam `ensure_synced` e consultam o
+    espelho: dentro de GOOGLE_CALENDAR_SYNC_MIN_INTERVAL_SECONDS não há chamada ao
+    Google; fora dele, uma chamada incremental com custo proporcional às mudanças.
+    Entre workers, um lease na linha de estado (locked_at, UPDATE condicional) garante
+    um sync por vez; cada página vira um commit curto (nenhuma transação fica aberta
+    durante a paginação no Google).
+    Com canal de push ativo (GoogleCalendarWatchService), o espelho vale até chegar
+    uma notificação daquele calendário (limitado por GOOGLE_CALENDAR_WATCH_MAX_STALENESS_SECONDS).
+    """
+
+    _stats: Dict[str, int] = {
+        "full": 0, "incremental": 0, "fresh": 0, "busy": 0, "stale": 0, "pending": 0, "live": 0, "errors": 0, "items": 0,
+    }
+
+    # ======================
+    # Google
+    # ======================
+
+    @classmethod
+    def _pull(
+        cls,
+        db: Session,
+        state_id: int,
+        user_id: int,
+        calendar_id: str,
+        sync_token: Optional[str],
+        synced_at: datetime,
+    ) -> Tuple[int, Optional[str]]:
+        """
+        events.list (todas as páginas) aplicado no espelho página a página, um commit por
+        página (que também renova o lease): memória e transação limitadas a uma página.
+        Página aplicada e sync interrompido depois não estraga nada: o syncToken só avança
+        no fim, então o próximo sync reaplica o mesmo delta (upsert idempotente).
+        Retorna (eventos aplicados, nextSyncToken).
+        """
+        token_db = SessionLocal()
+        try:
+            access_token = GoogleTokenService.get_valid_access_token(token_db, user_id)
+        finally:
+            token_db.close()
+
+        params: Dict[str, Any] = {
+            "singleEvents": "true",
+            "maxResults": int(settings.GOOGLE_CALENDAR_SYNC_PAGE_SIZE),
+        }
+        if sync_token:
+            params["syncToken"] = sync_token
+
+        changed, next_token = 0, None
+        pages = iter_event_pages(
+            access_token,
+            calendar_id,
+            params,
+            # token revogado antes de vencer: renova uma vez (coordenado) e repete a página
+            on_unauthorized=lambda stale: GoogleTokenManager.force_refresh(user_id, stale),
+        )
+        for page in pages:
+            changed += cls.apply_items(db, user_id, calendar_id, page.get("items") or [], synced_at=synced_at)
+            db.execute(
+                update(GoogleCalendarSyncState)
+                .where(GoogleCalendarSyncState.id == state_id)
+                .values(locked_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+            next_token = page.get("nextSyncToken") or next_token
+        return changed, next_token
+
+    # ======================
+    # Espelho
+    # ======================
+
+    @staticmethod
+    def _fill(row: GoogleCalendarEvent, item: Dict[str, Any], synced_at: datetime) -> None:
+        start_dt, all_day = _parse_google_dt(item.get("start"))
+        end_dt, _ = _parse_google_dt(item.get("end"))
+
+        row.status = item.get("status")
+        row.synced_at = synced_at
+        if item.get("status") == "cancelled" and not item.get("start"):
+            # apagado: o delta só traz id/status, mantém o resto pra detecção de mudança
+            if row.raw:
+                row.raw = {**row.raw, "status": "cancelled"}
+            else:
+                row.raw = item
+            return
+
+        row.raw = item
+        row.summary = item.get("summary")
+        row.description = item.get("description")
+        row.location = item.get("location")
+        row.start_datetime = start_dt
+        row.end_datetime = end_dt
+        row.all_day = all_day
+        row.html_link = item.get("htmlLink")
+        row.last_google_updated = _parse_rfc3339(item.get("updated"))
+
+    @classmethod
+    def apply_items(
+        cls,
+        db: Session,
+        user_id: int,
+        calendar_id: str,
+        items: Iterable[Dict[str, Any]],
+        synced_at: Optional[datetime] = None,
+    ) -> int:
+        """Upsert dos eventos no espelho (1 SELECT por lote de 500 ids). Não faz commit."""
+        synced_at = synced_at or datetime.now(timezone.utc)
+        by_id = {it["id"]: it for it in items if it.get("id")}
+        ids = list(by_id)
+
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            existing = {
+                r.google_event_id: r
+                for r in db.execute(
+                    select(GoogleCalendarEvent)
+                    .where(GoogleCalendarEvent.user_id == user_id)
+                    .where(GoogleCalendarEvent.calendar_id == calendar_id)
+                    .where(GoogleCalendarEvent.google_event_id.in_(chunk))
+                ).scalars()
+            }
+            for event_id in chunk:
+                row = existing.get(event_id)
+                if row is None:
+                    row = GoogleCalendarEvent(user_id=user_id, calendar_id=calendar_id, google_event_id=event_id)
+                    db.add(row)
+                cls._fill(row, by_id[event_id], synced_at)
+
+        return len(ids)
+
+    @staticmethod
+    def mark_deleted(db: Session, user_id: int, calendar_id: str, google_event_ids: Union[str, List[str]]) -> None:
+        """Write-through do DELETE feito pela própria API (o próximo delta confirma)."""
+        ids = [google_event_ids] if isinstance(google_event_ids, str) else list(google_event_ids)
+        for i in range(0, len(ids), 500):
+            db.execute(
+                update(GoogleCalendarEvent)
+                .where(GoogleCalendarEvent.user_id == user_id)
+                .where(GoogleCalendarEvent.calendar_id == calendar_id)
+                .where(GoogleCalendarEvent.google_event_id.in_(ids[i:i + 500]))
+                .values(status="cancelled", synced_at=datetime.now(timezone.utc))
+            )
+
+    @classmethod
+    def write_through(
+        cls,
+        db: Session,
+        user_id: int,
+        calendar_id: str,
+        item: Optional[Dict[str, Any]] = None,
+        deleted_id: Optional[str] = None,
+    ) -> None:
+        """Depois de criar/alterar/apagar no Google: reflete no espelho e faz commit."""
+        cls.write_through_many(db, user_id, [(calendar_id, item, deleted_id)])
+
+    @classmethod
+    def write_through_many(
+        cls,
+        db: Session,
+        user_id: int,
+        changes: Iterable[Tuple[str, Optional[Dict[str, Any]], Optional[str]]],
+    ) -> None:
+        """Lote de (calendar_id, evento devolvido pelo Google | None, id apagado | None), um commit."""
+        upserts: Dict[str, List[Dict[str, Any]]] = {}
+        deletes: Dict[str, List[str]] = {}
+        for calendar_id, item, deleted_id in changes:
+            if deleted_id:
+                deletes.setdefault(calendar_id, []).append(deleted_id)
+            elif item:
+                upserts.setdefault(calendar_id, []).append(item)
+
+        # falha no espelho não desfaz a operação no Google: o próximo sync corrige
+        try:
+            for calendar_id, items in upserts.items():
+                cls.apply_items(db, user_id, calendar_id, items)
+            for calendar_id, ids in deletes.items():
+                cls.mark_deleted(db, user_id, calendar_id, ids)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            _log.warning("GOOGLE_MIRROR_WRITE_FAILED", user_id=user_id, calendars=sorted(set(upserts) | set(deletes)), error=repr(e))
+
+    # ======================
+    # Sync
+    # ======================
+
+    @staticmethod
+    def _lock_key(user_id: int, calendar_id: str) -> int:
+        return zlib.crc32(f"{user_id}:{calendar_id}".encode("utf-8")) & 0x7FFFFFFF
+
+    @staticmethod
+    def _state(db: Session, user_id: int, calendar_id: str) -> GoogleCalendarSyncState:
+        """Linha de estado do calendário (criada sem syncToken = precisa de sync completo)."""
+        db.execute(
+            insert_for(db, GoogleCalendarSyncState)
+            .values(user_id=user_id, calendar_id=calendar_id, full_syncs=0)
+            .on_conflict_do_nothing(index_elements=["user_id", "calendar_id"])
+        )
+        db.commit()
+        return db.execute(
+            select(GoogleCalendarSyncState)
+            .where(GoogleCalendarSyncState.user_id == user_id)
+            .where(GoogleCalendarSyncState.calendar_id == calendar_id)
+        ).scalar_one()
+
+    @staticmethod
+    def _claim(db: Session, state_id: int) -> bool:
+        """Lease do calendário (UPDATE condicional): livre ou com lease vencido (worker morreu)."""
+        now = datetime.now(timezone.utc)
+        lease_cutoff = now - timedelta(seconds=int(settings.GOOGLE_CALENDAR_SYNC_LEASE_SECONDS))
+        res = db.execute(
+            update(GoogleCalendarSyncState)
+            .where(GoogleCalendarSyncState.id == state_id)
+            .where(or_(GoogleCalendarSyncState.locked_at.is_(None), GoogleCalendarSyncState.locked_at < lease_cutoff))
+            .values(locked_at=now)
+        )
+        db.commit()
+        return res.rowcount == 1
+
+    @staticmethod
+    def _is_fresh(db: Session, state: GoogleCalendarSyncState) -> bool:
+        last = _aware(state.last_synced_at)
+        if not state.sync_token or last is None:
+            return False
+        age = datetime.now(timezone.utc) - last
+        if age < timedelta(seconds=int(settings.GOOGLE_CALENDAR_SYNC_MIN_INTERVAL_SECONDS)):
+            return True
+
+        if not settings.GOOGLE_CALENDAR_WATCH_ENABLED:
+            return False
+        if age >= timedelta(seconds=int(settings.GOOGLE_CALENDAR_WATCH_MAX_STALENESS_SECONDS)):
+            return False
+        # canal de push ativo e nenhuma notificação depois do último sync: nada mudou no Google
+        channel = db.execute(
+            select(GoogleCalendarChannel)
+            .where(GoogleCalendarChannel.user_id == state.user_id)
+            .where(GoogleCalendarChannel.calendar_id == state.calendar_id)
+            .where(GoogleCalendarChannel.status == "active")
+            .where(or_(GoogleCalendarChannel.expiration.is_(None), GoogleCalendarChannel.expiration > datetime.now(timezone.utc)))
+            .order_by(GoogleCalendarChannel.last_notified_at.desc().nulls_last())
+            .limit(1)
+        ).scalar_one_or_none()
+        if channel is None:
+            return False
+        notified = _aware(channel.last_notified_at)
+        return notified is None or notified <= last
+
+    @classmethod
+    def sync(
+        cls,
+        user_id: int,
+        calendar_id: str = "primary",
+        force: bool = False,
+        full: bool = False,
+        allow_full: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Sync de um calendário (sessão própria).
+        force = ignora o intervalo mínimo; full = descarta o syncToken e refaz tudo.
+        allow_full=False (caminho de request): se o calendário precisa de sync completo,
+        não faz — devolve "pending"/"stale" e deixa pra `full_sync_due`.
+        """
+        user_id = int(user_id)
+        db = SessionLocal()
+        try:
+            state = cls._state(db, user_id, calendar_id)
+            deadline = time.monotonic() + max(float(settings.GOOGLE_CALENDAR_SYNC_LOCK_WAIT_SECONDS), 0.0)
+            while True:
+                if not force and not full and cls._is_fresh(db, state):
+                    db.commit()
+                    cls._stats["fresh"] += 1
+                    return {"mode": "fresh", "changed": 0}
+                if not allow_full and (full or not state.sync_token):
+                    db.commit()
+                    return cls._deferred_full(state)
+                if cls._claim(db, state.id):
+                    break
+                if time.monotonic() >= deadline:
+                    # outro worker ainda sincronizando: quem chamou lê o espelho como está
+                    cls._stats["busy"] += 1
+                    return {"mode": "busy", "changed": 0}
+                time.sleep(0.1)
+                # relido: quem esperou vê o sync que acabou de terminar
+                db.refresh(state)
+
+            state_id = state.id
+            started = datetime.now(timezone.utc)
+            sync_token = None if full else state.sync_token
+            mode = "incremental" if sync_token else "full"
+            db.commit()
+
+            try:
+                try:
+                    changed, next_token = cls._pull(db, state_id, user_id, calendar_id, sync_token, started)
+                except SyncTokenExpired:
+                    _log.info("GOOGLE_SYNC_TOKEN_EXPIRED", user_id=user_id, calendar_id=calendar_id)
+                    if not allow_full:
+                        # resync completo fica pro background; o espelho segue servindo (stale)
+                        db.rollback()
+                        cls._release(db, state_id, sync_token=None, error="410 syncToken expirado")
+                        return cls._deferred_full(state)
+                    # o resync completo regrava tudo que existe e cancela o resto: o que
+                    # o delta já tinha aplicado nesta rodada não precisa ser desfeito
+                    db.rollback()
+                    mode = "full"
+                    changed, next_token = cls._pull(db, state_id, user_id, calendar_id, None, started)
+            except Exception as e:
+                # páginas já aplicadas ficam (idempotentes); o syncToken não avança
+                db.rollback()
+                cls._release(db, state_id, error=repr(e))
+                cls._stats["errors"] += 1
+                raise
+
+            values: Dict[str, Any] = {
+                "sync_token": next_token,
+                "last_synced_at": started,
+                "last_error": None,
+                "next_attempt_at": None,
+                "locked_at": None,
+            }
+            if mode == "full":
+                # full sync não traz apagados: o que não veio nesta rodada sumiu do Google
+                db.execute(
+                    update(GoogleCalendarEvent)
+                    .where(GoogleCalendarEvent.user_id == user_id)
+                    .where(GoogleCalendarEvent.calendar_id == calendar_id)
+                    .where(GoogleCalendarEvent.synced_at < started)
+                    .where(or_(GoogleCalendarEvent.status.is_(None), GoogleCalendarEvent.status != "cancelled"))
+                    .values(status="cancelled", synced_at=started)
+                )
+                values["last_full_sync_at"] = started
+                values["full_syncs"] = GoogleCalendarSyncState.full_syncs + 1
+            db.execute(update(GoogleCalendarSyncState).where(GoogleCalendarSyncState.id == state_id).values(**values))
+            db.commit()
+            cls._stats[mode] += 1
+            cls._stats["items"] += changed
+
+            _log.info("GOOGLE_SYNC_DONE", user_id=user_id, calendar_id=calendar_id, mode=mode, changed=changed)
+            return {"mode": mode, "changed": changed}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _release(db: Session, state_id: int, error: Optional[str] = None, **values: Any) -> None:
+        """Solta o lease sem avançar o sync (erro fica registrado no estado)."""
+        if error is not None:
+            values["last_error"] = error[:2000]
+        db.execute(
+            update(GoogleCalendarSyncState)
+            .where(GoogleCalendarSyncState.id == state_id)
+            .values(locked_at=None, **values)
+        )
+        db.commit()
+
+    @classmethod
+    def _deferred_full(cls, state: GoogleCalendarSyncState) -> Dict[str, Any]:
+        """Sync completo pendente (fica pro `full_sync_due`): 'pending' se nunca sincronizou, senão 'stale'."""
+        if state.last_synced_at is None:
+            cls._stats["pending"] += 1
+            return {"mode": "pending", "changed": 0}
+        cls._stats["stale"] += 1
+        return {"mode": "stale", "changed": 0}
+
+    @classmethod
+    def full_sync_due(cls) -> int:
+        """
+        Tarefa periódica: syncs completos pendentes (1º sync, 410), em série e em lote
+        pequeno. Roda em todo worker; o lease de cada calendário evita trabalho dobrado.
+        Falha (token revogado, Google fora) espera GOOGLE_CALENDAR_FULL_SYNC_RETRY_SECONDS.
+        """
+        now = datetime.now(timezone.utc)
+        lease_cutoff = now - timedelta(seconds=int(settings.GOOGLE_CALENDAR_SYNC_LEASE_SECONDS))
+        db = SessionLocal()
+        try:
+            due = db.execute(
+                select(GoogleCalendarSyncState.user_id, GoogleCalendarSyncState.calendar_id)
+                .where(GoogleCalendarSyncState.sync_token.is_(None))
+                .where(or_(GoogleCalendarSyncState.next_attempt_at.is_(None), GoogleCalendarSyncState.next_attempt_at <= now))
+                .where(or_(GoogleCalendarSyncState.locked_at.is_(None), GoogleCalendarSyncState.locked_at < lease_cutoff))
+                .order_by(GoogleCalendarSyncState.id.asc())
+                .limit(int(settings.GOOGLE_CALENDAR_FULL_SYNC_BATCH_SIZE))
+            ).all()
+        finally:
+            db.close()
+
+        done = 0
+        for user_id, calendar_id in due:
+            try:
+                result = cls.sync(user_id, calendar_id)
+            except Exception as e:
+                retry_at = datetime.now(timezone.utc) + timedelta(seconds=int(settings.GOOGLE_CALENDAR_FULL_SYNC_RETRY_SECONDS))
+                db = SessionLocal()
+                try:
+                    db.execute(
+                        update(GoogleCalendarSyncState)
+                        .where(GoogleCalendarSyncState.user_id == user_id)
+                        .where(GoogleCalendarSyncState.calendar_id == calendar_id)
+                        .values(next_attempt_at=retry_at)
+                    )
+                    db.commit()
+                finally:
+                    db.close()
+                _log.warning("GOOGLE_FULL_SYNC_FAILED", user_id=user_id, calendar_id=calendar_id, error=repr(e))
+                continue
+            if result["mode"] == "full":
+                done += 1
+        return done
+
+    @classmethod
+    def ensure_synced(cls, user_id: int, calendar_id: str = "primary") -> Dict[str, Any]:
+        """
+        Antes de ler o espelho (caminho de request: nunca faz sync completo).
+        - "fresh"/"incremental": espelho em dia
+        - "pending": 1º sync agendado pro background; o espelho ainda está vazio
+        - "stale"/"busy": espelho do último sync (410 em resync, Google fora, outro worker sincronizando)
+        Usuário sem Google conectado -> GoogleTokenNotFound.
+        """
+        try:
+            result = cls.sync(user_id, calendar_id, allow_full=False)
+        except Exception as e:
+            db = SessionLocal()
+            try:
+                state = db.execute(
+                    select(GoogleCalendarSyncState.last_synced_at)
+                    .where(GoogleCalendarSyncState.user_id == int(user_id))
+                    .where(GoogleCalendarSyncState.calendar_id == calendar_id)
+                ).scalar_one_or_none()
+            finally:
+                db.close()
+            if state is None:
+                raise
+            cls._stats["stale"] += 1
+            _log.warning("GOOGLE_SYNC_STALE_READ", user_id=user_id, calendar_id=calendar_id, error=repr(e))
+            return {"mode": "stale", "changed": 0, "error": repr(e)}
+
+        if result["mode"] == "pending":
+            db = SessionLocal()
+            try:
+                connected = GoogleTokenService.get_by_user(db, int(user_id)) is not None
+            finally:
+                db.close()
+            if not connected:
+                raise GoogleTokenNotFound("Usuário não conectado ao Google")
+            _log.info("GOOGLE_SYNC_PENDING", user_id=user_id, calendar_id=calendar_id)
+        return result
+
+    # ======================
+    # Leitura do espelho
+    # ======================
+
+    @staticmethod
+    def list_range(
+        db: Session,
+        user_id: int,
+        calendar_id: str = "primary",
+        time_min: Optional[datetime] = None,
+        time_max: Optional[datetime] = None,
+        text: Optional[str] = None,
+        include_cancelled: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[GoogleCalendarEvent]:
+        """Mesma semântica do events.list do Google: termina depois de time_min e começa antes de time_max."""
+        q = (
+            select(GoogleCalendarEvent)
+            .where(GoogleCalendarEvent.user_id == int(user_id))
+            .where(GoogleCalendarEvent.calendar_id == calendar_id)
+            .where(GoogleCalendarEvent.start_datetime.is_not(None))
+        )
+        if not include_cancelled:
+            q = q.where(or_(GoogleCalendarEvent.status.is_(None), GoogleCalendarEvent.status != "cancelled"))
+        if time_min is not None:
+            q = q.where(GoogleCalendarEvent.end_datetime > _aware(time_min))
+        if time_max is not None:
+            q = q.where(GoogleCalendarEvent.start_datetime < _aware(time_max))
+        if text:
+            like = f"%{text.strip()}%"
+            q = q.where(
+                or_(
+                    GoogleCalendarEvent.summary.ilike(like),
+                    GoogleCalendarEvent.description.ilike(like),
+                    GoogleCalendarEvent.location.ilike(like),
+                )
+            )
+
+        q = q.order_by(GoogleCalendarEvent.start_datetime.asc(), GoogleCalendarEvent.id.asc())
+        if limit:
+            q = q.limit(limit)
+        return list(db.execute(q).scalars().all())
+
+    @classmethod
+    def read_range(
+        cls,
+        db: Session,
+        user_id: int,
+        calendar_id: str = "primary",
+        time_min: Optional[datetime] = None,
+        time_max: Optional[datetime] = None,
+        text: Optional[str] = None,
+        include_cancelled: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[GoogleCalendarEvent]:
+        """
+        `ensure_synced` + `list_range`. Com o 1º sync ainda pendente o espelho está vazio
+        ("sem eventos" e "não sincronizado" seriam iguais): lê a janela direto no Google.
+        """
+        result = cls.ensure_synced(user_id, calendar_id)
+        if result["mode"] != "pending":
+            return cls.list_range(db, user_id, calendar_id, time_min, time_max, text, include_cancelled, limit)
+        return cls._list_live(int(user_id), calendar_id, time_min, time_max, text, include_cancelled, limit)
+
+    @classmethod
+    def _list_live(
+        cls,
+        user_id: int,
+        calendar_id: str,
+        time_min: Optional[datetime],
+        time_max: Optional[datetime],
+        text: Optional[str],
+        include_cancelled: bool,
+        limit: Optional[int],
+    ) -> List[GoogleCalendarEvent]:
+        """events.list da janela, como linhas do espelho fora da sessão (nada é gravado)."""
+        token_db = SessionLocal()
+        try:
+            access_token = GoogleTokenService.get_valid_access_token(token_db, user_id)
+        finally:
+            token_db.close()
+
+        params: Dict[str, Any] = {
+            "singleEvents": "true",
+            "orderBy": "startTime",
+            "maxResults": min(int(limit or settings.GOOGLE_CALENDAR_SYNC_PAGE_SIZE), int(settings.GOOGLE_CALENDAR_SYNC_PAGE_SIZE)),
+        }
+        if time_min is not None:
+            params["timeMin"] = _aware(time_min).isoformat()
+        if time_max is not None:
+            params["timeMax"] = _aware(time_max).isoformat()
+        if text:
+            params["q"] = text.strip()
+        if include_cancelled:
+            params["showDeleted"] = "true"
+
+        now = datetime.now(timezone.utc)
+        rows: List[GoogleCalendarEvent] = []
+        items = iter_events(
+            access_token,
+            calendar_id,
+            params,
+            limit=limit,
+            on_unauthorized=lambda stale: GoogleTokenManager.force_refresh(user_id, stale),
+        )
+        for item in items:
+            if not item.get("id"):
+                continue
+            row = GoogleCalendarEvent(user_id=user_id, calendar_id=calendar_id, google_event_id=item["id"])
+            cls._fill(row, item, now)
+            if row.start_datetime is not None:
+                rows.append(row)
+        cls._stats["live"] += 1
+        return rows
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            calendars, without_token, with_error = db.execute(
+                select(
+                    func.count(GoogleCalendarSyncState.id),
+                    func.count(GoogleCalendarSyncState.id).filter(GoogleCalendarSyncState.sync_token.is_(None)),
+                    func.count(GoogleCalendarSyncState.id).filter(GoogleCalendarSyncState.last_error.is_not(None)),
+                )
+            ).one()
+        finally:
+            db.close()
+        return {
+            **cls._stats,
+            "calendars": calendars,
+            "without_token": without_token,
+            "with_error": with_error,
+        }
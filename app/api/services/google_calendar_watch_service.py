@@ -0,0 +1,356 @@
+# app/api/services/google_calendar_watch_service.py
+from __future__ import annotations
+
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.http import get_session
+from app.core.lanes import LaneExecutor
+from app.core.logs import get_logger
+from app.db.advisory_lock import LOCK_GOOGLE_CALENDAR_WATCH, advisory_xact_lock
+from app.db.session import SessionLocal
+from app.api.models.google_calendar_channel import GoogleCalendarChannel
+from app.api.models.google_calendar_sync_state import GoogleCalendarSyncState
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_event_pages import GOOGLE_CAL_BASE
+from app.api.services.google_token_service import GoogleTokenManager, GoogleTokenService
+
+_log = get_logger("google.watch")
+
+
+class GoogleCalendarWatchService:
+    """
+    Push do Google Calendar (events.watch) no lugar de polling.
+
+    - renew_due (periódica): todo calendário com estado de sync ganha um canal; canais
+      perto de vencer são trocados (abre o novo, depois para os anteriores a ele).
+      Roda em todo worker: um advisory lock por calendário faz só um deles renovar.
+    - handle_notification (webhook): confere canal + token, marca o calendário como
+      alterado e agenda um sync incremental só dele.
+    - Leituras do espelho não chamam o Google enquanto o canal estiver ativo e sem
+      notificação pendente (ver GoogleCalendarSyncService._is_fresh).
+
+    Rajadas de notificação do mesmo calendário viram um sync só: enquanto houver um
+    sync pendente na fila, as próximas notificações não enfileiram outro.
+    """
+
+    lanes = LaneExecutor(
+        "google_calendar_push",
+        lanes=settings.GOOGLE_CALENDAR_WATCH_LANES,
+        lane_queue_size=settings.GOOGLE_CALENDAR_WATCH_LANE_QUEUE_SIZE,
+    )
+    _pending: set = set()
+    _stats: Dict[str, int] = {
+        "notifications": 0,
+        "ignored": 0,
+        "syncs_scheduled": 0,
+        "syncs_coalesced": 0,
+        "channels_opened": 0,
+        "channels_stopped": 0,
+        "watch_errors": 0,
+    }
+
+    # ======================
+    # Google
+    # ======================
+
+    @staticmethod
+    def _post(user_id: int, url: str, body: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            access_token = GoogleTokenService.get_valid_access_token(db, user_id)
+        finally:
+            db.close()
+
+        http = get_session("google_api")
+        res = http.post(url, json=body, headers={"Authorization": f"Bearer {access_token}"})
+        if res.status_code == 401:
+            access_token = GoogleTokenManager.force_refresh(user_id, access_token)
+            res = http.post(url, json=body, headers={"Authorization": f"Bearer {access_token}"})
+        return res
+
+    @classmethod
+    def watch(cls, user_id: int, calendar_id: str = "primary") -> GoogleCalendarChannel:
+        """Abre um canal events.watch pro calendário e grava no banco."""
+        if not settings.GOOGLE_CALENDAR_WATCH_ADDRESS:
+            raise RuntimeError("GOOGLE_CALENDAR_WATCH_ADDRESS não configurado")
+
+        channel_id = str(uuid.uuid4())
+        token = secrets.token_urlsafe(24)
+        res = cls._post(
+            user_id,
+            f"{GOOGLE_CAL_BASE}/calendars/{calendar_id}/events/watch",
+            {
+                "id": channel_id,
+                "type": "web_hook",
+                "address": settings.GOOGLE_CALENDAR_WATCH_ADDRESS,
+                "token": token,
+                "params": {"ttl": str(int(settings.GOOGLE_CALENDAR_WATCH_TTL_SECONDS))},
+            },
+        )
+        if res.status_code >= 400:
+            try:
+                payload = res.json()
+            except Exception:
+                payload = {"raw": res.text}
+            raise RuntimeError(f"Google watch error {res.status_code}: {payload}")
+
+        data = res.json()
+        expiration = None
+        if data.get("expiration"):
+            expiration = datetime.fromtimestamp(int(data["expiration"]) / 1000, tz=timezone.utc)
+
+        db = SessionLocal()
+        try:
+            channel = GoogleCalendarChannel(
+                user_id=user_id,
+                calendar_id=calendar_id,
+                channel_id=channel_id,
+                resource_id=data.get("resourceId"),
+                token=token,
+                status="active",
+                expiration=expiration,
+                notifications=0,
+            )
+            db.add(channel)
+            db.commit()
+            db.refresh(channel)
+        finally:
+            db.close()
+
+        cls._stats["channels_opened"] += 1
+        _log.info("GOOGLE_WATCH_OPENED", user_id=user_id, calendar_id=calendar_id, channel_id=channel_id, expiration=str(expiration))
+        return channel
+
+    @classmethod
+    def stop_channel(cls, db: Session, channel: GoogleCalendarChannel) -> None:
+        """channels.stop + marca 'stopped' (404 = já não existe no Google). Não faz commit."""
+        if channel.resource_id:
+            res = cls._post(
+                channel.user_id,
+                f"{GOOGLE_CAL_BASE}/channels/stop",
+                {"id": channel.channel_id, "resourceId": channel.resource_id},
+            )
+            if res.status_code >= 400 and res.status_code != 404:
+                raise RuntimeError(f"Google channels.stop error {res.status_code}: {res.text}")
+        channel.status = "stopped"
+        cls._stats["channels_stopped"] += 1
+
+    # ======================
+    # Renovação (periódica)
+    # ======================
+
+    @classmethod
+    def renew_due(cls) -> int:
+        """Abre canal pros calendários sem canal válido e troca os que vencem dentro da janela."""
+        if not settings.GOOGLE_CALENDAR_WATCH_ENABLED:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        horizon = now + timedelta(seconds=int(settings.GOOGLE_CALENDAR_WATCH_RENEW_BEFORE_SECONDS))
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(GoogleCalendarChannel)
+                .where(GoogleCalendarChannel.status == "active")
+                .where(GoogleCalendarChannel.expiration <= now)
+                .values(status="expired")
+            )
+            db.commit()
+
+            # calendários já sincronizados sem canal ativo que dure além do horizonte
+            due = db.execute(
+                select(GoogleCalendarSyncState.user_id, GoogleCalendarSyncState.calendar_id)
+                .where(GoogleCalendarSyncState.sync_token.is_not(None))
+                .where(~cls._covered(horizon, GoogleCalendarSyncState.user_id, GoogleCalendarSyncState.calendar_id))
+                .limit(int(settings.GOOGLE_CALENDAR_WATCH_RENEW_BATCH_SIZE))
+            ).all()
+        finally:
+            db.close()
+
+        renewed = 0
+        for user_id, calendar_id in due:
+            if cls._renew_one(user_id, calendar_id, horizon):
+                renewed += 1
+        return renewed
+
+    @staticmethod
+    def _covered(horizon: datetime, user_id, calendar_id):
+        """Existe canal ativo do calendário que dura além do horizonte?"""
+        return (
+            select(GoogleCalendarChannel.id)
+            .where(GoogleCalendarChannel.user_id == user_id)
+            .where(GoogleCalendarChannel.calendar_id == calendar_id)
+            .where(GoogleCalendarChannel.status == "active")
+            .where(or_(GoogleCalendarChannel.expiration.is_(None), GoogleCalendarChannel.expiration > horizon))
+            .exists()
+        )
+
+    @classmethod
+    def _renew_one(cls, user_id: int, calendar_id: str, horizon: datetime) -> bool:
+        """
+        Troca o canal de um calendário sob advisory lock (sessão própria, sai no commit):
+        outro worker renovando o mesmo calendário -> pula; quem pega o lock confere de
+        novo a cobertura, então dois workers nunca abrem canal pro mesmo calendário.
+        """
+        lock_db = SessionLocal()
+        try:
+            if not advisory_xact_lock(
+                lock_db, LOCK_GOOGLE_CALENDAR_WATCH, GoogleCalendarSyncService._lock_key(user_id, calendar_id), 0
+            ):
+                return False
+            if lock_db.execute(select(cls._covered(horizon, user_id, calendar_id))).scalar():
+                return False
+
+            try:
+                new_channel = cls.watch(user_id, calendar_id)
+            except Exception as e:
+                cls._stats["watch_errors"] += 1
+                _log.warning("GOOGLE_WATCH_FAILED", user_id=user_id, calendar_id=calendar_id, error=repr(e))
+                return False
+            cls._stop_others(user_id, calendar_id, keep_id=new_channel.id)
+            return True
+        finally:
+            lock_db.commit()
+            lock_db.close()
+
+    @classmethod
+    def _stop_others(cls, user_id: int, calendar_id: str, keep_id: int) -> None:
+        # o canal novo já recebe as notificações: os anteriores a ele podem parar
+        # (nunca um mais novo: esse seria de outra renovação e ficaria sem canal)
+        db = SessionLocal()
+        try:
+            old = db.execute(
+                select(GoogleCalendarChannel)
+                .where(GoogleCalendarChannel.user_id == user_id)
+                .where(GoogleCalendarChannel.calendar_id == calendar_id)
+                .where(GoogleCalendarChannel.status == "active")
+                .where(GoogleCalendarChannel.id < keep_id)
+            ).scalars().all()
+            for channel in old:
+                try:
+                    cls.stop_channel(db, channel)
+                except Exception as e:
+                    _log.warning("GOOGLE_WATCH_STOP_FAILED", channel_id=channel.channel_id, error=repr(e))
+            db.commit()
+        finally:
+            db.close()
+
+    # ======================
+    # Notificações (webhook)
+    # ======================
+
+    @classmethod
+    def handle_notification(cls, headers: Mapping[str, str]) -> Optional[Tuple[int, str]]:
+        """
+        Confere X-Goog-Channel-ID/Token/Resource-ID e registra a notificação.
+        Retorna (user_id, calendar_id) quando há mudança a sincronizar; None no
+        'sync' inicial do canal e em canais desconhecidos/parados.
+        """
+        channel_id = headers.get("x-goog-channel-id")
+        token = headers.get("x-goog-channel-token")
+        resource_id = headers.get("x-goog-resource-id")
+        state = (headers.get("x-goog-resource-state") or "").lower()
+        try:
+            message_number = int(headers.get("x-goog-message-number") or 0) or None
+        except ValueError:
+            message_number = None
+
+        if not channel_id or not token:
+            cls._stats["ignored"] += 1
+            return None
+
+        db = SessionLocal()
+        try:
+            channel = db.execute(
+                select(GoogleCalendarChannel).where(GoogleCalendarChannel.channel_id == channel_id)
+            ).scalar_one_or_none()
+            if (
+                channel is None
+                or channel.status != "active"
+                or not secrets.compare_digest(channel.token, token)
+                or (resource_id and channel.resource_id and resource_id != channel.resource_id)
+            ):
+                cls._stats["ignored"] += 1
+                _log.info("GOOGLE_WATCH_IGNORED", channel_id=channel_id, state=state)
+                return None
+
+            if state == "sync":
+                # handshake de abertura do canal: nada mudou ainda
+                return None
+
+            values: Dict[str, Any] = {
+                "last_notified_at": datetime.now(timezone.utc),
+                "notifications": GoogleCalendarChannel.notifications + 1,
+            }
+            if message_number is not None:
+                values["last_message_number"] = message_number
+            db.execute(update(GoogleCalendarChannel).where(GoogleCalendarChannel.id == channel.id).values(**values))
+            db.commit()
+            cls._stats["notifications"] += 1
+            return channel.user_id, channel.calendar_id
+        finally:
+            db.close()
+
+    # ======================
+    # Sync direcionado
+    # ======================
+
+    @classmethod
+    def start(cls) -> None:
+        cls.lanes.start()
+
+    @classmethod
+    async def stop_workers(cls) -> None:
+        await cls.lanes.stop()
+
+    @classmethod
+    def schedule_sync(cls, user_id: int, calendar_id: str) -> bool:
+        """Enfileira um sync incremental do calendário; coalesce com um já pendente."""
+        key = (int(user_id), calendar_id)
+        if key in cls._pending:
+            cls._stats["syncs_coalesced"] += 1
+            return True
+
+        async def job():
+            # sai do pendente antes de rodar: notificação que chegar durante o sync agenda outro
+            cls._pending.discard(key)
+            try:
+                await run_in_threadpool(GoogleCalendarSyncService.sync, key[0], key[1], True)
+            except Exception as e:
+                _log.warning("GOOGLE_PUSH_SYNC_FAILED", user_id=key[0], calendar_id=key[1], error=repr(e))
+
+        cls._pending.add(key)
+        if not cls.lanes.submit_nowait(key, job):
+            # fila cheia: a leitura seguinte sincroniza (canal fica marcado como alterado)
+            cls._pending.discard(key)
+            return False
+        cls._stats["syncs_scheduled"] += 1
+        return True
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            active = db.execute(
+                select(func.count(GoogleCalendarChannel.id)).where(
+                    and_(GoogleCalendarChannel.status == "active", GoogleCalendarChannel.expiration > datetime.now(timezone.utc))
+                )
+            ).scalar_one()
+        finally:
+            db.close()
+        return {
+            **cls._stats,
+            "enabled": bool(settings.GOOGLE_CALENDAR_WATCH_ENABLED),
+            "active_channels": active,
+            "pending_syncs": len(cls._pending),
+            "lanes": cls.lanes.stats(),
+        }
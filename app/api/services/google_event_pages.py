@@ -0,0 +1,99 @@
+# app/api/services/google_event_pages.py
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import requests
+
+from app.core.http import get_session
+
+GOOGLE_CAL_BASE = "https://www.googleapis.com/calendar/v3"
+
+# campos de evento que o app usa (espelho, agenda, lembretes, disponibilidade)
+EVENT_FIELDS = (
+    "id,status,summary,description,location,start,end,htmlLink,updated,"
+    "recurringEventId,originalStartTime,transparency"
+)
+
+# partial response do events.list: só os campos acima + tokens de paginação/sync
+LIST_FIELDS = f"nextPageToken,nextSyncToken,items({EVENT_FIELDS})"
+
+
+class SyncTokenExpired(Exception):
+    """410 Gone: o Google invalidou o syncToken -> resync completo."""
+
+
+def iter_event_pages(
+    access_token: str,
+    calendar_id: str = "primary",
+    params: Optional[Dict[str, Any]] = None,
+    fields: Optional[str] = LIST_FIELDS,
+    on_unauthorized: Optional[Callable[[str], str]] = None,
+    http: Optional[requests.Session] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    events.list página a página (gerador): cada página só é pedida quando a anterior
+    foi consumida, então quem para de iterar (break / limite) não paga as seguintes.
+
+    - params: timeMin/timeMax/q/syncToken/maxResults (tamanho da página)...
+    - fields: partial response (None = evento completo)
+    - on_unauthorized(token_antigo) -> token_novo: chamado uma vez no 401;
+      sem ele, 401 vira PermissionError.
+    """
+    http = http or get_session("google_api")
+    url = f"{GOOGLE_CAL_BASE}/calendars/{calendar_id}/events"
+
+    query: Dict[str, Any] = dict(params or {})
+    if fields:
+        query["fields"] = fields
+
+    retried_auth = False
+    while True:
+        res = http.get(url, headers={"Authorization": f"Bearer {access_token}"}, params=query)
+
+        if res.status_code == 401:
+            if on_unauthorized is None or retried_auth:
+                raise PermissionError(f"Google token inválido/expirado: {res.text}")
+            # token revogado antes de vencer: renova uma vez e repete a mesma página
+            retried_auth = True
+            access_token = on_unauthorized(access_token)
+            continue
+
+        if res.status_code == 410:
+            raise SyncTokenExpired(f"syncToken expirado (calendar_id={calendar_id})")
+
+        if res.status_code >= 400:
+            try:
+                payload = res.json()
+            except Exception:
+                payload = {"raw": res.text}
+            raise RuntimeError(f"Google API error {res.status_code}: {payload}")
+
+        page = res.json()
+        yield page
+
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+        query["pageToken"] = page_token
+
+
+def iter_events(
+    access_token: str,
+    calendar_id: str = "primary",
+    params: Optional[Dict[str, Any]] = None,
+    fields: Optional[str] = LIST_FIELDS,
+    limit: Optional[int] = None,
+    on_unauthorized: Optional[Callable[[str], str]] = None,
+    http: Optional[requests.Session] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Eventos um a um, atravessando as páginas; `limit` encerra sem buscar o resto."""
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    for page in iter_event_pages(access_token, calendar_id, params, fields, on_unauthorized, http):
+        for item in page.get("items") or []:
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                return
@@ -0,0 +1,165 @@
+# app/api/services/google_freebusy_service.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.http import get_session
+from app.core.logs import get_logger
+from app.db.session import SessionLocal
+from app.api.services.google_event_pages import GOOGLE_CAL_BASE
+from app.api.services.google_token_service import GoogleTokenManager, GoogleTokenService
+
+GOOGLE_FREEBUSY_URL = f"{GOOGLE_CAL_BASE}/freeBusy"
+
+_log = get_logger("google.freebusy")
+
+DateLike = Union[datetime, str]
+
+
+def _rfc3339(value: DateLike) -> str:
+    if isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def merge_intervals(intervals: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Une intervalos {start, end} sobrepostos/encostados (de várias agendas) em ordem."""
+    parsed = sorted(((_parse(i["start"]), _parse(i["end"])) for i in intervals), key=lambda p: p[0])
+    merged: List[List[datetime]] = []
+    for start, end in parsed:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [{"start": s.isoformat(), "end": e.isoformat()} for s, e in merged]
+
+
+class GoogleFreeBusyService:
+    """
+    FreeBusy em lote para vários (user_id, calendar_id).
+
+    O FreeBusy é autorizado pelo token OAuth de quem consulta, então o agrupamento é
+    por user_id (dono do token): as agendas do mesmo usuário vão juntas, até
+    GOOGLE_FREEBUSY_MAX_ITEMS (limite do Google) por request. Usuários diferentes
+    são consultados em paralelo (GOOGLE_FREEBUSY_MAX_WORKERS).
+    """
+
+    _stats: Dict[str, int] = {"queries": 0, "requests": 0, "calendars": 0, "errors": 0}
+
+    @staticmethod
+    def _post(user_id: int, body: Dict[str, Any]) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            access_token = GoogleTokenService.get_valid_access_token(db, user_id)
+        finally:
+            db.close()
+
+        http = get_session("google_api")
+        res = http.post(GOOGLE_FREEBUSY_URL, json=body, headers={"Authorization": f"Bearer {access_token}"})
+        if res.status_code == 401:
+            # token revogado antes de vencer: renova uma vez (coordenado) e repete
+            access_token = GoogleTokenManager.force_refresh(user_id, access_token)
+            res = http.post(GOOGLE_FREEBUSY_URL, json=body, headers={"Authorization": f"Bearer {access_token}"})
+
+        if res.status_code != 200:
+            raise RuntimeError(f"Google freeBusy error {res.status_code}: {res.text}")
+        return res.json()
+
+    @classmethod
+    def _query_user(
+        cls,
+        user_id: int,
+        calendar_ids: List[str],
+        time_min: str,
+        time_max: str,
+        tz: Optional[str],
+    ) -> Dict[str, Any]:
+        calendars: Dict[str, List[Dict[str, str]]] = {}
+        errors: Dict[str, Any] = {}
+        max_items = max(int(settings.GOOGLE_FREEBUSY_MAX_ITEMS), 1)
+
+        for i in range(0, len(calendar_ids), max_items):
+            chunk = calendar_ids[i:i + max_items]
+            body: Dict[str, Any] = {
+                "timeMin": time_min,
+                "timeMax": time_max,
+                "items": [{"id": cal} for cal in chunk],
+            }
+            if tz:
+                body["timeZone"] = tz
+
+            cls._stats["requests"] += 1
+            try:
+                data = cls._post(user_id, body)
+            except Exception as e:
+                cls._stats["errors"] += 1
+                _log.warning("GOOGLE_FREEBUSY_FAILED", user_id=user_id, calendars=len(chunk), error=repr(e))
+                for cal in chunk:
+                    errors[cal] = str(e)
+                continue
+
+            for cal in chunk:
+                entry = (data.get("calendars") or {}).get(cal) or {}
+                if entry.get("errors"):
+                    # ex.: notFound / internalError por agenda: as outras do lote seguem válidas
+                    errors[cal] = entry["errors"]
+                calendars[cal] = entry.get("busy") or []
+
+        return {
+            "user_id": user_id,
+            "busy": merge_intervals(b for busy in calendars.values() for b in busy),
+            "calendars": calendars,
+            "errors": errors,
+        }
+
+    @classmethod
+    def query(
+        cls,
+        pairs: Iterable[Tuple[int, str]],
+        time_min: DateLike,
+        time_max: DateLike,
+        tz: Optional[str] = None,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        pairs = [(user_id, calendar_id), ...] -> {user_id: {busy (mesclado entre as agendas
+        do profissional), calendars: {calendar_id: busy}, errors: {calendar_id: erro}}}.
+        """
+        by_user: "OrderedDict[int, List[str]]" = OrderedDict()
+        for user_id, calendar_id in pairs:
+            cals = by_user.setdefault(int(user_id), [])
+            cal = calendar_id or "primary"
+            if cal not in cals:
+                cals.append(cal)
+
+        if not by_user:
+            return {}
+
+        cls._stats["queries"] += 1
+        cls._stats["calendars"] += sum(len(c) for c in by_user.values())
+        t_min, t_max = _rfc3339(time_min), _rfc3339(time_max)
+
+        if len(by_user) == 1:
+            user_id, cals = next(iter(by_user.items()))
+            return {user_id: cls._query_user(user_id, cals, t_min, t_max, tz)}
+
+        workers = min(len(by_user), max(int(settings.GOOGLE_FREEBUSY_MAX_WORKERS), 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="freebusy") as pool:
+            futures = {
+                user_id: pool.submit(cls._query_user, user_id, cals, t_min, t_max, tz)
+                for user_id, cals in by_user.items()
+            }
+            return {user_id: f.result() for user_id, f in futures.items()}
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return dict(cls._stats)
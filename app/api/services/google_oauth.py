@@ -1,4 +1,4 @@
-import requests
+from app.core.http import get_session
 from app.core.config import settings
 
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
@@ -15,7 +15,7 @@ def refresh_google_access_token(refresh_token: str):
         "Content-Type": "application/x-www-form-urlencoded"
     }
 
-    response = requests.post(GOOGLE_TOKEN_URL, data=data, headers=headers)
+    response = get_session("google_oauth").post(GOOGLE_TOKEN_URL, data=data, headers=headers)
 
     if response.status_code != 200:
         raise Exception(response.text)
@@ -69,7 +69,7 @@
 
 #         if not creds.valid:
 #             if creds.expired and creds.refresh_token:
-#                 creds.refresh(Request())
+#                 creds.refresh(Request(session=self.http_oauth))
 
 #         return {
 #             "access": creds.token,
@@ -177,7 +177,7 @@
 
 #         if not creds.valid:
 #             if creds.expired and creds.refresh_token:
-#                 creds.refresh(Request())
+#                 creds.refresh(Request(session=self.http_oauth))
 
 #         return {
 #             "access": creds.token,
@@ -294,6 +294,7 @@
 #         }
 
 from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
 from urllib.parse import urlencode
 
 import requests
@@ -301,13 +302,18 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 
 from app.core.config import settings
+from app.core.http import get_session
+from app.api.services.google_event_pages import iter_events
 
 
 class GoogleAuthService:
-    def __init__(self):
+    def __init__(self, oauth_session: Optional[requests.Session] = None, api_session: Optional[requests.Session] = None):
         self.client_id = settings.GOOGLE_CLIENT_ID
         self.client_secret = settings.GOOGLE_CLIENT_SECRET
         self.scopes = settings.GOOGLE_SCOPES.split(",")
+        # keep-alive: sessions pooled por upstream (oauth2.googleapis.com / www.googleapis.com)
+        self.http_oauth = oauth_session or get_session("google_oauth")
+        self.http_api = api_session or get_session("google_api")
 
     # =========================
     # LEGADO / COMPARTILHADO
@@ -326,7 +332,7 @@ class GoogleAuthService:
         return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
 
     def exchange_code(self, code: str):
-        response = requests.post(
+        response = self.http_oauth.post(
             "https://oauth2.googleapis.com/token",
             data={
                 "code": code,
@@ -335,7 +341,6 @@ class GoogleAuthService:
                 "redirect_uri": settings.GOOGLE_REDIRECT_URI,
                 "grant_type": "authorization_code",
             },
-            timeout=30,
         )
 
         if response.status_code != 200:
@@ -365,7 +370,7 @@ class GoogleAuthService:
         )
 
         # força refresh sempre para evitar usar token inválido
-        creds.refresh(Request())
+        creds.refresh(Request(session=self.http_oauth))
 
         return {
             "access": creds.token,
@@ -389,7 +394,7 @@ class GoogleAuthService:
         return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
 
     def exchange_code_agenda(self, code: str):
-        response = requests.post(
+        response = self.http_oauth.post(
             "https://oauth2.googleapis.com/token",
             data={
                 "code": code,
@@ -398,7 +403,6 @@ class GoogleAuthService:
                 "redirect_uri": settings.GOOGLE_REDIRECT_URI_AGENDA,
                 "grant_type": "authorization_code",
             },
-            timeout=30,
         )
 
         if response.status_code != 200:
@@ -418,6 +422,26 @@ class GoogleAuthService:
     # =========================
     # CALENDAR
     # =========================
+    def iter_calendar_events(
+        self,
+        *,
+        access_token: str,
+        calendar_id: str,
+        time_min: str,
+        time_max: str,
+        limit: Optional[int] = None,
+        page_size: int = 250,
+    ) -> Iterator[Dict[str, Any]]:
+        """Eventos do intervalo seguindo nextPageToken sob demanda (para de buscar no break/limit)."""
+        params = {
+            "timeMin": time_min,
+            "timeMax": time_max,
+            "singleEvents": "true",
+            "orderBy": "startTime",
+            "maxResults": min(page_size, limit) if limit else page_size,
+        }
+        return iter_events(access_token, calendar_id, params, limit=limit, http=self.http_api)
+
     def list_calendar_events(
         self,
         *,
@@ -425,31 +449,19 @@ class GoogleAuthService:
         calendar_id: str,
         time_min: str,
         time_max: str,
-        max_results: int = 100,
+        max_results: Optional[int] = None,
     ):
-        response = requests.get(
-            f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json",
-            },
-            params={
-                "timeMin": time_min,
-                "timeMax": time_max,
-                "singleEvents": "true",
-                "orderBy": "startTime",
-                "maxResults": max_results,
-            },
-            timeout=30,
+        # todas as páginas (ou até max_results); 401 -> PermissionError
+        items = list(
+            self.iter_calendar_events(
+                access_token=access_token,
+                calendar_id=calendar_id,
+                time_min=time_min,
+                time_max=time_max,
+                limit=max_results,
+            )
         )
-
-        if response.status_code == 401:
-            raise PermissionError(f"Google token inválido/expirado: {response.text}")
-
-        if response.status_code != 200:
-            raise Exception(f"Falha ao listar eventos do Google Calendar: {response.text}")
-
-        return response.json()
+        return {"items": items}
 
     def refresh_access_token_if_needed(
         self,
@@ -1,9 +1,19 @@
+import threading
 from datetime import datetime, timezone, timedelta
-import requests
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.http import get_session
+from app.core.logs import get_logger
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.models.google_token import GoogleToken
 from app.core.config import settings
+from app.db.advisory_lock import LOCK_GOOGLE_TOKEN_REFRESH, advisory_xact_lock
+from app.db.session import SessionLocal
+
+_log = get_logger("google.token")
 
 
 class GoogleTokenNotFound(Exception):
@@ -68,6 +78,7 @@ class GoogleTokenService:
 
         db.commit()
         db.refresh(token)
+        GoogleTokenManager.remember(token)
         return token
 
     # =========================
@@ -83,7 +94,7 @@ class GoogleTokenService:
         if not token.google_refresh_token:
             raise GoogleTokenRefreshFailed("Refresh token não existe para este usuário.")
 
-        response = requests.post(
+        response = get_session("google_oauth").post(
             "https://oauth2.googleapis.com/token",
             data={
                 "client_id": settings.GOOGLE_CLIENT_ID,
@@ -91,7 +102,6 @@ class GoogleTokenService:
                 "refresh_token": token.google_refresh_token,
                 "grant_type": "refresh_token",
             },
-            timeout=30,
         )
 
         if response.status_code != 200:
@@ -108,24 +118,16 @@ class GoogleTokenService:
 
         db.commit()
         db.refresh(token)
+        GoogleTokenManager.remember(token)
         return token
 
     @staticmethod
     def get_valid_access_token(db: Session, user_id: int) -> str:
         """
         Retorna access token válido.
-        Método legado/compartilhado.
+        Método legado/compartilhado (cache + refresh único por usuário: GoogleTokenManager).
         """
-        token = GoogleTokenService.get_by_user(db, user_id)
-        if not token:
-            raise GoogleTokenNotFound("Usuário não conectado ao Google")
-
-        now = datetime.now(timezone.utc)
-
-        if (not token.google_token_expiry) or (token.google_token_expiry <= now):
-            token = GoogleTokenService.refresh_access_token(db, token)
-
-        return token.google_access_token
+        return GoogleTokenManager.get_access_token(user_id, GoogleTokenService.refresh_access_token)
 
     # =========================
     # NOVO / ISOLADO PARA AGENDA
@@ -142,7 +144,7 @@ class GoogleTokenService:
                 "google_reauth_required: Refresh token não existe para este usuário."
             )
 
-        response = requests.post(
+        response = get_session("google_oauth").post(
             "https://oauth2.googleapis.com/token",
             data={
                 "client_id": settings.GOOGLE_CLIENT_ID,
@@ -150,7 +152,6 @@ class GoogleTokenService:
                 "refresh_token": token.google_refresh_token,
                 "grant_type": "refresh_token",
             },
-            timeout=30,
         )
 
         if response.status_code != 200:
@@ -183,18 +184,180 @@ class GoogleTokenService:
 
         db.commit()
         db.refresh(token)
+        GoogleTokenManager.remember(token)
         return token
 
     @staticmethod
     def get_valid_access_token_agenda(db: Session, user_id: int) -> str:
-        token = GoogleTokenService.get_by_user(db, user_id)
-        if not token:
-            raise GoogleTokenNotFound("Usuário não conectado ao Google")
+        return GoogleTokenManager.get_access_token(user_id, GoogleTokenService.refresh_access_token_agenda)
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class GoogleTokenManager:
+    """
+    Access tokens do Google em memória, por user_id, até (expiry - margem):
+      - hit: nenhuma query, nenhum refresh
+      - miss: relê a linha; só chama o OAuth se o token salvo vence dentro da margem
+      - refresh concorrente do mesmo usuário vira uma chamada só:
+          * no processo: lock por usuário (quem esperou encontra o token novo no cache)
+          * entre workers: advisory lock do Postgres por usuário; quem esperou relê a linha
+            depois do commit de quem renovou e reaproveita o token
+      - `prerefresh_due` (tarefa periódica) renova antes do vencimento, fora do request
+
+    Todo refresh/save do GoogleTokenService passa por `remember`, então o cache
+    acompanha inclusive os refresh forçados (401, /google/refresh).
+    """
+
+    _tokens = TTLCache(
+        maxsize=settings.GOOGLE_TOKEN_CACHE_SIZE,
+        ttl_seconds=3600,
+        name="google_access_token",
+    )
+    _locks: Dict[int, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+    _stats = {"refreshes": 0, "collapsed": 0, "db_reads": 0, "lock_timeouts": 0, "prerefreshed": 0}
+
+    @classmethod
+    def _lock_for(cls, user_id: int) -> threading.Lock:
+        with cls._locks_guard:
+            lock = cls._locks.get(user_id)
+            if lock is None:
+                lock = cls._locks[user_id] = threading.Lock()
+            return lock
 
-        now = datetime.now(timezone.utc)
-        refresh_threshold = now + timedelta(minutes=2)
+    @staticmethod
+    def _margin() -> timedelta:
+        return timedelta(seconds=int(settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS))
+
+    @classmethod
+    def remember(cls, token: GoogleToken) -> None:
+        """Guarda o token até (expiry - margem); token sem expiry / já na margem sai do cache."""
+        expiry = _aware(token.google_token_expiry)
+        ttl = (expiry - cls._margin() - datetime.now(timezone.utc)).total_seconds() if expiry else 0
+        if ttl > 0 and token.google_access_token:
+            cls._tokens.set(int(token.user_id), token.google_access_token, ttl_seconds=ttl)
+        else:
+            cls._tokens.delete(int(token.user_id))
 
-        if (not token.google_token_expiry) or (token.google_token_expiry <= refresh_threshold):
-            token = GoogleTokenService.refresh_access_token_agenda(db, token)
+    @classmethod
+    def _refresh_coordinated(
+        cls,
+        user_id: int,
+        refresh: Callable[[Session, GoogleToken], GoogleToken],
+        margin: timedelta,
+        stale_access_token: Optional[str] = None,
+    ) -> Tuple[str, bool]:
+        """
+        Sessão própria (o lock é da transação e sai no commit do refresh ou no close).
+        Retorna (access_token, renovou?).
+        """
+        db = SessionLocal()
+        try:
+            if not advisory_xact_lock(db, LOCK_GOOGLE_TOKEN_REFRESH, user_id, settings.GOOGLE_TOKEN_REFRESH_LOCK_WAIT_SECONDS):
+                # segue sem o lock: no pior caso são dois refresh do mesmo token
+                cls._stats["lock_timeouts"] += 1
+                _log.warning("GOOGLE_TOKEN_LOCK_TIMEOUT", user_id=user_id)
+
+            cls._stats["db_reads"] += 1
+            token = GoogleTokenService.get_by_user(db, user_id)
+            if not token:
+                raise GoogleTokenNotFound("Usuário não conectado ao Google")
+
+            expiry = _aware(token.google_token_expiry)
+            expiring = expiry is None or expiry <= datetime.now(timezone.utc) + margin
+            # 401 com o token que ainda está no banco = revogado de fato; se mudou, outro worker já renovou
+            revoked = stale_access_token is not None and token.google_access_token == stale_access_token
+
+            if not expiring and not revoked:
+                cls.remember(token)
+                return token.google_access_token, False
+
+            cls._stats["refreshes"] += 1
+            token = refresh(db, token)  # commit (libera o lock) + remember()
+            return token.google_access_token, True
+        finally:
+            db.close()
+
+    @classmethod
+    def get_access_token(cls, user_id: int, refresh: Callable[[Session, GoogleToken], GoogleToken]) -> str:
+        user_id = int(user_id)
+        cached = cls._tokens.get(user_id)
+        if cached:
+            return cached
+
+        with cls._lock_for(user_id):
+            # outro thread pode ter acabado de renovar enquanto este esperava
+            cached = cls._tokens.get(user_id)
+            if cached:
+                cls._stats["collapsed"] += 1
+                return cached
+
+            access_token, _ = cls._refresh_coordinated(user_id, refresh, cls._margin())
+            return access_token
+
+    @classmethod
+    def force_refresh(
+        cls,
+        user_id: int,
+        stale_access_token: str,
+        refresh: Optional[Callable[[Session, GoogleToken], GoogleToken]] = None,
+    ) -> str:
+        """Depois de um 401: renova, a menos que outro thread/worker já tenha trocado o token."""
+        user_id = int(user_id)
+        with cls._lock_for(user_id):
+            cached = cls._tokens.get(user_id)
+            if cached and cached != stale_access_token:
+                cls._stats["collapsed"] += 1
+                return cached
+
+            access_token, _ = cls._refresh_coordinated(
+                user_id,
+                refresh or GoogleTokenService.refresh_access_token,
+                cls._margin(),
+                stale_access_token=stale_access_token,
+            )
+            return access_token
 
-        return token.google_access_token
\ No newline at end of file
+    @classmethod
+    def prerefresh_due(cls) -> int:
+        """Tarefa periódica (sync, roda no threadpool): renova os tokens que vencem dentro da janela."""
+        now = datetime.now(timezone.utc)
+        window = timedelta(seconds=int(settings.GOOGLE_TOKEN_PREREFRESH_WINDOW_SECONDS))
+
+        db = SessionLocal()
+        try:
+            # só tokens ainda válidos: conta revogada/abandonada sai da lista sozinha quando vence
+            user_ids = db.execute(
+                select(GoogleToken.user_id)
+                .where(GoogleToken.google_token_expiry > now)
+                .where(GoogleToken.google_token_expiry <= now + window)
+                .where(GoogleToken.google_refresh_token != "")
+                .order_by(GoogleToken.google_token_expiry.asc())
+                .limit(int(settings.GOOGLE_TOKEN_PREREFRESH_BATCH_SIZE))
+            ).scalars().all()
+        finally:
+            db.close()
+
+        refreshed = 0
+        for user_id in user_ids:
+            try:
+                with cls._lock_for(int(user_id)):
+                    # janela como margem: outro worker que já renovou nesta rodada não renova de novo
+                    _, did_refresh = cls._refresh_coordinated(int(user_id), GoogleTokenService.refresh_access_token, window)
+            except Exception as e:
+                _log.warning("GOOGLE_TOKEN_PREREFRESH_FAILED", user_id=user_id, error=repr(e))
+                continue
+            if did_refresh:
+                refreshed += 1
+
+        cls._stats["prerefreshed"] += refreshed
+        return refreshed
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {**cls._tokens.stats(), **cls._stats}
@@ -0,0 +1,174 @@
+# app/api/services/message_dedup_service.py
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from sqlalchemy import select, update, delete
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.upsert import insert_for
+from app.api.models.processed_message import ProcessedMessage
+
+
+class MessageDedupService:
+    """
+    De-duplicação de mensagens da Evolution por (instance_name, key.id).
+
+    Protocolo claim/complete:
+      - claim(): INSERT ... ON CONFLICT DO NOTHING. Só quem inseriu processa.
+        Um claim parado há mais de MESSAGE_DEDUP_CLAIM_LEASE_SECONDS (worker morreu)
+        pode ser retomado por outro.
+      - complete(): marca 'done' -> redeliveries passam a ser duplicadas.
+      - release(): desfaz o claim quando o processamento falha (permite retry).
+
+    Na frente do banco fica um LRU/TTL em memória só com os 'done',
+    então redelivery comum nem chega a tocar no banco.
+    """
+
+    _done = TTLCache(
+        maxsize=settings.MESSAGE_DEDUP_CACHE_SIZE,
+        ttl_seconds=settings.MESSAGE_DEDUP_CACHE_TTL_SECONDS,
+        name="message_dedup",
+    )
+
+    @staticmethod
+    def _key(instance_name: str, message_id: str) -> tuple:
+        return (instance_name.strip(), message_id.strip())
+
+    @staticmethod
+    def _lease_cutoff() -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=int(settings.MESSAGE_DEDUP_CLAIM_LEASE_SECONDS))
+
+    @classmethod
+    def is_duplicate(cls, instance_name: str, message_id: str) -> bool:
+        """Leitura apenas: já concluída, ou com claim ativo de outro worker."""
+        key = cls._key(instance_name, message_id)
+        if key in cls._done:
+            return True
+
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(ProcessedMessage.status, ProcessedMessage.claimed_at)
+                .where(ProcessedMessage.instance_name == key[0])
+                .where(ProcessedMessage.message_id == key[1])
+            ).first()
+        finally:
+            db.close()
+
+        if row is None:
+            return False
+
+        status, claimed_at = row
+        if status == "done":
+            cls._done.set(key, True)
+            return True
+
+        if claimed_at is not None and claimed_at.tzinfo is None:
+            claimed_at = claimed_at.replace(tzinfo=timezone.utc)
+        return claimed_at is not None and claimed_at >= cls._lease_cutoff()
+
+    @classmethod
+    def claim(cls, instance_name: str, message_id: str) -> bool:
+        key = cls._key(instance_name, message_id)
+        if key in cls._done:
+            return False
+
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            stmt = (
+                insert_for(db, ProcessedMessage)
+                .values(
+                    instance_name=key[0],
+                    message_id=key[1],
+                    status="claimed",
+                    claimed_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["instance_name", "message_id"])
+            )
+            inserted = db.execute(stmt).rowcount == 1
+
+            if not inserted:
+                # retoma claim abandonado (lease vencido)
+                res = db.execute(
+                    update(ProcessedMessage)
+                    .where(ProcessedMessage.instance_name == key[0])
+                    .where(ProcessedMessage.message_id == key[1])
+                    .where(ProcessedMessage.status == "claimed")
+                    .where(ProcessedMessage.claimed_at < cls._lease_cutoff())
+                    .values(claimed_at=now)
+                )
+                inserted = res.rowcount == 1
+
+            db.commit()
+            return inserted
+        finally:
+            db.close()
+
+    @classmethod
+    def complete(cls, instance_name: str, message_id: str) -> None:
+        key = cls._key(instance_name, message_id)
+        now = datetime.now(timezone.utc)
+
+        db = SessionLocal()
+        try:
+            res = db.execute(
+                update(ProcessedMessage)
+                .where(ProcessedMessage.instance_name == key[0])
+                .where(ProcessedMessage.message_id == key[1])
+                .values(status="done", completed_at=now)
+            )
+            if res.rowcount == 0:
+                db.execute(
+                    insert_for(db, ProcessedMessage)
+                    .values(
+                        instance_name=key[0],
+                        message_id=key[1],
+                        status="done",
+                        claimed_at=now,
+                        completed_at=now,
+                    )
+                    .on_conflict_do_nothing(index_elements=["instance_name", "message_id"])
+                )
+            db.commit()
+        finally:
+            db.close()
+
+        cls._done.set(key, True)
+
+    @classmethod
+    def release(cls, instance_name: str, message_id: str) -> None:
+        key = cls._key(instance_name, message_id)
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                delete(ProcessedMessage)
+                .where(ProcessedMessage.instance_name == key[0])
+                .where(ProcessedMessage.message_id == key[1])
+                .where(ProcessedMessage.status == "claimed")
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def purge_expired() -> int:
+        """Remove registros antigos (a Evolution não reentrega depois de tanto tempo)."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=int(settings.MESSAGE_DEDUP_RETENTION_DAYS))
+
+        db = SessionLocal()
+        try:
+            res = db.execute(delete(ProcessedMessage).where(ProcessedMessage.created_at < cutoff))
+            db.commit()
+            return int(res.rowcount or 0)
+        finally:
+            db.close()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return cls._done.stats()
@@ -0,0 +1,543 @@
+# app/api/services/outbound_dispatcher.py
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, select, update, func
+from sqlalchemy.orm import aliased
+
+from app.core.circuit import find_circuit_open, is_failure_status
+from app.core.config import settings
+from app.core.lanes import LaneExecutor
+from app.core.logs import bind_log_context, get_logger, trace_id_var
+from app.db.session import SessionLocal
+from app.db.upsert import insert_for
+from app.api.models.outbound_message import OutboundMessage
+from app.api.services.evolution_service import AsyncEvolutionService, EvolutionHTTPError
+
+_log = get_logger("outbound")
+
+
+class _InstancePacer:
+    """Intervalo mínimo entre dois envios da mesma instância (o próximo espera a vez)."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = max(float(interval_seconds), 0.0)
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = time.monotonic() + self.interval_seconds
+
+
+class _OutboundMetrics:
+    """Contadores por instância (em memória, por worker do uvicorn)."""
+
+    FIELDS = ("enqueued", "deferred", "sent", "retried", "failed", "circuit_deferred")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {f: 0 for f in self.FIELDS})
+
+    def incr(self, instance_name: str, field: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[instance_name][field] += n
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {inst: dict(c) for inst, c in self._counters.items()}
+
+
+class OutboundDispatcher:
+    """
+    Fila de saída do WhatsApp (Evolution), uma por instância:
+      1) `enqueue` persiste o envio (outbound_messages) e entrega pro executor da instância
+      2) quem chamou (webhook do Chatwoot, API) responde na hora
+      3) cada instância envia com no máximo OUTBOUND_INSTANCE_CONCURRENCY envios simultâneos,
+         espaçados por OUTBOUND_MIN_INTERVAL_MS; mesmo destinatário sempre em ordem
+
+    Erro de conexão / 5xx / 429 volta pra 'pending' com backoff exponencial (poller
+    `requeue_due`, durável entre restarts); 4xx, instância inexistente ou tentativas
+    esgotadas -> 'failed'. O status fica na linha (sent + provider_message_id | failed + last_error).
+
+    Ordem por destinatário inclusive no retry: enquanto um envio pro número está
+    pending/sending (em backoff ou circuito aberto), os seguintes pro mesmo número
+    ficam estacionados (`_claim` recusa) e saem quando ele termina (sent ou failed).
+    """
+
+    _executors: Dict[str, LaneExecutor] = {}
+    _pacers: Dict[str, _InstancePacer] = {}
+    # ids já nas filas deste processo: o poller não enfileira de novo quem só está esperando a vez
+    _queued_ids: Set[int] = set()
+    _running = False
+    metrics = _OutboundMetrics()
+
+    # ======================
+    # Persistência
+    # ======================
+
+    @staticmethod
+    def persist(
+        instance_name: str,
+        to_number: str,
+        text: Optional[str] = None,
+        media_url: Optional[str] = None,
+        source: str = "api",
+        reference: Optional[str] = None,
+    ) -> Tuple[int, bool]:
+        """
+        Grava o envio como 'pending'. Retorna (id, created).
+        Mesmo (source, reference) já enfileirado -> devolve o existente (retry do webhook / replay
+        não duplicam). INSERT ... ON CONFLICT DO NOTHING na unique (source, reference): dois
+        workers com o mesmo envio ao mesmo tempo não inserem os dois.
+        """
+        instance_name = instance_name.strip()
+        reference = str(reference) if reference else None
+        db = SessionLocal()
+        try:
+            stmt = (
+                insert_for(db, OutboundMessage)
+                .values(
+                    instance_name=instance_name,
+                    to_number=to_number,
+                    kind="audio" if media_url else "text",
+                    text=text,
+                    media_url=media_url,
+                    source=source,
+                    reference=reference,
+                    status="pending",
+                    attempts=0,
+                    next_attempt_at=datetime.now(timezone.utc),
+                )
+                .on_conflict_do_nothing(index_elements=["source", "reference"])
+                .returning(OutboundMessage.id)
+            )
+            inserted = db.execute(stmt).scalar_one_or_none()
+            db.commit()
+            if inserted is not None:
+                return int(inserted), True
+
+            existing = db.execute(
+                select(OutboundMessage.id)
+                .where(OutboundMessage.source == source)
+                .where(OutboundMessage.reference == reference)
+            ).scalar_one()
+            return int(existing), False
+        finally:
+            db.close()
+
+    @staticmethod
+    def _has_earlier_open():
+        """Envio anterior pro mesmo número (mesma instância) ainda em aberto? Correlacionado."""
+        prior = aliased(OutboundMessage)
+        return exists().where(
+            prior.instance_name == OutboundMessage.instance_name,
+            prior.to_number == OutboundMessage.to_number,
+            prior.id < OutboundMessage.id,
+            prior.status.in_(("pending", "sending")),
+        )
+
+    @staticmethod
+    def _claim(message_id: int) -> Optional[OutboundMessage]:
+        """
+        UPDATE condicional -> 'sending': dois workers/processos nunca enviam a mesma mensagem.
+        Recusa também se há envio anterior em aberto pro mesmo número (fica estacionado).
+        """
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            res = db.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.id == message_id)
+                .where(OutboundMessage.status == "pending")
+                .where(~OutboundDispatcher._has_earlier_open())
+                .values(status="sending", attempts=OutboundMessage.attempts + 1, locked_at=now)
+            )
+            db.commit()
+            if res.rowcount != 1:
+                return None
+
+            row = db.get(OutboundMessage, message_id)
+            if row is not None:
+                db.expunge(row)
+            return row
+        finally:
+            db.close()
+
+    @staticmethod
+    def _retry_delay_seconds(attempts: int) -> int:
+        base = max(int(settings.OUTBOUND_RETRY_BASE_SECONDS), 1)
+        delay = base * (2 ** max(attempts - 1, 0))
+        return min(delay, int(settings.OUTBOUND_RETRY_MAX_SECONDS))
+
+    @staticmethod
+    def _mark_sent(message_id: int, provider_message_id: Optional[str]) -> None:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.id == message_id)
+                .values(
+                    status="sent",
+                    sent_at=now,
+                    locked_at=None,
+                    last_error=None,
+                    provider_message_id=provider_message_id,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_failed(message_id: int, attempts: int, error: str, retryable: bool) -> str:
+        """Agenda retry com backoff ou marca 'failed' (erro definitivo / tentativas esgotadas)."""
+        now = datetime.now(timezone.utc)
+        exhausted = attempts >= int(settings.OUTBOUND_MAX_ATTEMPTS)
+        status = "pending" if retryable and not exhausted else "failed"
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.id == message_id)
+                .values(
+                    status=status,
+                    last_error=(error or "")[:2000],
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=OutboundDispatcher._retry_delay_seconds(attempts)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        return status
+
+    @staticmethod
+    def _defer(message_id: int, delay_seconds: float) -> None:
+        """Circuito da instância aberto: volta pra 'pending' sem gastar tentativa."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.id == message_id)
+                .values(
+                    status="pending",
+                    attempts=OutboundMessage.attempts - 1,
+                    locked_at=None,
+                    next_attempt_at=now + timedelta(seconds=max(delay_seconds, 1.0)),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def due_messages(limit: int = 200) -> List[Tuple[int, str, str]]:
+        """
+        pending vencidos + 'sending' com lease expirado (worker morreu no meio);
+        só o primeiro em aberto de cada destinatário.
+        """
+        now = datetime.now(timezone.utc)
+        lease_cutoff = now - timedelta(seconds=int(settings.OUTBOUND_LEASE_SECONDS))
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.status == "sending")
+                .where(OutboundMessage.locked_at < lease_cutoff)
+                .values(status="pending", locked_at=None)
+            )
+            db.commit()
+
+            rows = db.execute(
+                select(OutboundMessage.id, OutboundMessage.instance_name, OutboundMessage.to_number)
+                .where(OutboundMessage.status == "pending")
+                .where(OutboundMessage.next_attempt_at <= now)
+                .where(~OutboundDispatcher._has_earlier_open())
+                .order_by(OutboundMessage.next_attempt_at.asc(), OutboundMessage.id.asc())
+                .limit(limit)
+            ).all()
+            return [(int(r[0]), r[1], r[2]) for r in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def next_parked(instance_name: str, to_number: str) -> Optional[int]:
+        """Próximo envio estacionado do destinatário, se já pode sair."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(OutboundMessage.id, OutboundMessage.status, OutboundMessage.next_attempt_at)
+                .where(OutboundMessage.instance_name == instance_name)
+                .where(OutboundMessage.to_number == to_number)
+                .where(OutboundMessage.status.in_(("pending", "sending")))
+                .order_by(OutboundMessage.id.asc())
+                .limit(1)
+            ).first()
+        finally:
+            db.close()
+
+        if row is None or row[1] != "pending":
+            return None
+        due_at = row[2]
+        if due_at is not None and due_at.tzinfo is None:
+            due_at = due_at.replace(tzinfo=timezone.utc)
+        if due_at is not None and due_at > now:
+            return None
+        return int(row[0])
+
+    # ======================
+    # Executores por instância
+    # ======================
+
+    @classmethod
+    def _executor(cls, instance_name: str) -> LaneExecutor:
+        executor = cls._executors.get(instance_name)
+        if executor is None:
+            executor = LaneExecutor(
+                f"outbound:{instance_name}",
+                lanes=settings.OUTBOUND_INSTANCE_CONCURRENCY,
+                lane_queue_size=settings.OUTBOUND_INSTANCE_QUEUE_SIZE,
+            )
+            cls._executors[instance_name] = executor
+            cls._pacers[instance_name] = _InstancePacer(settings.OUTBOUND_MIN_INTERVAL_MS / 1000.0)
+        if cls._running and not executor.is_running():
+            executor.start()
+        return executor
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls._running
+
+    @classmethod
+    async def start(cls) -> None:
+        cls._running = True
+
+    @classmethod
+    async def stop(cls) -> None:
+        cls._running = False
+        for executor in list(cls._executors.values()):
+            await executor.stop()
+        cls._queued_ids.clear()
+
+    @classmethod
+    def submit(cls, message_id: int, instance_name: str, to_number: str) -> bool:
+        """
+        Entrega pro executor da instância. Fila cheia (ou dispatcher parado) -> continua
+        'pending' no banco e o poller pega depois; nunca bloqueia quem chamou.
+        """
+        if not cls._running:
+            cls.metrics.incr(instance_name, "deferred")
+            return False
+        if message_id in cls._queued_ids:
+            return False
+
+        # lane por destinatário: mensagens pro mesmo número saem na ordem em que entraram
+        queued = cls._executor(instance_name).submit_nowait(to_number, partial(cls._handle, message_id))
+        if queued:
+            cls._queued_ids.add(message_id)
+        cls.metrics.incr(instance_name, "enqueued" if queued else "deferred")
+        return queued
+
+    @classmethod
+    async def enqueue(
+        cls,
+        instance_name: str,
+        to_number: str,
+        text: Optional[str] = None,
+        media_url: Optional[str] = None,
+        source: str = "api",
+        reference: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        message_id, created = await run_in_threadpool(
+            cls.persist, instance_name, to_number, text, media_url, source, reference,
+        )
+        queued = cls.submit(message_id, instance_name.strip(), to_number) if created else False
+        _log.info(
+            "OUTBOUND_ENQUEUED",
+            message_id=message_id, instance=instance_name, source=source, reference=reference,
+            created=created, queued=queued,
+        )
+        return {"id": message_id, "status": "pending" if created else "duplicate", "queued": queued}
+
+    @classmethod
+    async def requeue_due(cls) -> int:
+        if not cls._running:
+            return 0
+
+        due = await run_in_threadpool(cls.due_messages, 200)
+        requeued = 0
+        for message_id, instance_name, to_number in due:
+            if cls.submit(message_id, instance_name, to_number):
+                requeued += 1
+        return requeued
+
+    # ======================
+    # Envio
+    # ======================
+
+    @staticmethod
+    def _is_retryable(exc: BaseException) -> bool:
+        # conexão/timeout (sem status), 5xx e 429; 4xx e instância inexistente não adianta repetir
+        if isinstance(exc, EvolutionHTTPError):
+            return exc.status_code is None or is_failure_status(exc.status_code)
+        return False
+
+    @staticmethod
+    def _provider_message_id(result: Any) -> Optional[str]:
+        key = result.get("key") if isinstance(result, dict) else None
+        return str(key["id"]) if isinstance(key, dict) and key.get("id") else None
+
+    @classmethod
+    async def _send(cls, row: OutboundMessage) -> Any:
+        if row.kind == "audio":
+            return await AsyncEvolutionService.send_audio(
+                instance_name=row.instance_name, to_number=row.to_number, audio_url=row.media_url,
+            )
+        return await AsyncEvolutionService.send_text(
+            instance_name=row.instance_name, to_number=row.to_number, text=row.text or "",
+        )
+
+    @classmethod
+    async def _handle(cls, message_id: int) -> None:
+        cls._queued_ids.discard(message_id)
+
+        # reenvio pelo poller não tem request de origem: o trace é a mensagem
+        if trace_id_var.get() is None:
+            bind_log_context(trace_id=f"outbound-{message_id}")
+
+        row = await run_in_threadpool(cls._claim, message_id)
+        if row is None:
+            # outro worker/processo já pegou, já foi enviado, ou está estacionado
+            # atrás de um envio anterior pro mesmo número (sai quando ele terminar)
+            return
+
+        instance_name = row.instance_name
+        if row.attempts > 1:
+            cls.metrics.incr(instance_name, "retried")
+
+        await cls._pacers[instance_name].wait()
+        try:
+            result = await cls._send(row)
+        except Exception as e:
+            circuit = find_circuit_open(e)
+            if circuit is not None:
+                cls.metrics.incr(instance_name, "circuit_deferred")
+                await run_in_threadpool(cls._defer, message_id, circuit.retry_after)
+                _log.info("OUTBOUND_DEFERRED", message_id=message_id, instance=instance_name, circuit=circuit.name)
+                return
+
+            status = await run_in_threadpool(cls._mark_failed, message_id, row.attempts, repr(e), cls._is_retryable(e))
+            if status == "failed":
+                cls.metrics.incr(instance_name, "failed")
+            _log.warning(
+                "OUTBOUND_SEND_FAILED",
+                message_id=message_id, instance=instance_name, attempts=row.attempts, status=status, error=repr(e),
+            )
+            if status == "failed":
+                await cls._release_next(instance_name, row.to_number)
+            return
+
+        provider_message_id = cls._provider_message_id(result)
+        await run_in_threadpool(cls._mark_sent, message_id, provider_message_id)
+        cls.metrics.incr(instance_name, "sent")
+        _log.info("OUTBOUND_SENT", message_id=message_id, instance=instance_name, provider_message_id=provider_message_id)
+        await cls._release_next(instance_name, row.to_number)
+
+    @classmethod
+    async def _release_next(cls, instance_name: str, to_number: str) -> None:
+        """Envio pro número fechado: manda o próximo estacionado sem esperar o poller."""
+        next_id = await run_in_threadpool(cls.next_parked, instance_name, to_number)
+        if next_id is not None:
+            cls.submit(next_id, instance_name, to_number)
+
+    # ======================
+    # Consulta
+    # ======================
+
+    @staticmethod
+    def _item(r: OutboundMessage) -> Dict[str, Any]:
+        return {
+            "id": r.id,
+            "instance_name": r.instance_name,
+            "to_number": r.to_number,
+            "kind": r.kind,
+            "source": r.source,
+            "reference": r.reference,
+            "status": r.status,
+            "attempts": r.attempts,
+            "last_error": r.last_error,
+            "provider_message_id": r.provider_message_id,
+            "next_attempt_at": r.next_attempt_at,
+            "sent_at": r.sent_at,
+            "created_at": r.created_at,
+        }
+
+    @classmethod
+    def get_item(cls, message_id: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            row = db.get(OutboundMessage, message_id)
+            return cls._item(row) if row is not None else None
+        finally:
+            db.close()
+
+    @classmethod
+    def list_items(
+        cls,
+        status: Optional[str] = None,
+        instance_name: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            q = select(OutboundMessage)
+            if status:
+                q = q.where(OutboundMessage.status == status)
+            if instance_name:
+                q = q.where(OutboundMessage.instance_name == instance_name)
+            rows = db.execute(q.order_by(OutboundMessage.id.desc()).limit(limit)).scalars().all()
+            return [cls._item(r) for r in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def status_counts() -> Dict[str, Dict[str, int]]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(OutboundMessage.instance_name, OutboundMessage.status, func.count())
+                .group_by(OutboundMessage.instance_name, OutboundMessage.status)
+            ).all()
+        finally:
+            db.close()
+
+        out: Dict[str, Dict[str, int]] = {}
+        for instance_name, status, n in rows:
+            out.setdefault(instance_name, {})[status] = int(n)
+        return out
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "mode": settings.OUTBOUND_MODE,
+            "running": cls._running,
+            "instances": cls.metrics.snapshot(),
+            "queues": {name: ex.stats()["queued_total"] for name, ex in sorted(cls._executors.items())},
+        }
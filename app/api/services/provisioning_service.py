@@ -55,13 +55,7 @@ class ProvisioningService:
         evo.set_webhook(
             instance_name=instance_name,
             url=f"{webhook_url_base}/webhooks/evolution",  # seu handler usa /{event}
-            events=[
-                "messages-upsert",
-                "messages-update",
-                "contacts-update",
-                "presence-update",
-                "chats-update",
-            ],
+            events=EvolutionService.webhook_events(),  # só o que o handler consome
             enabled=True,
             webhook_by_events=True,  # se seu Evolution separar por evento
             webhook_base64=False,
@@ -10,7 +10,8 @@ from app.api.models.appointment import Appointment
 from app.api.models.google_token import GoogleToken
 from app.api.models.user import User
 from app.api.models.reminder_log import ReminderLog
-from app.api.services.google_service import GoogleAuthService
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_token_service import GoogleTokenNotFound
 from app.api.models.calendar_event_snapshot import CalendarEventSnapshot
 
 class ReminderService:
@@ -25,6 +26,7 @@ class ReminderService:
         user_id: int,
         after: datetime,
         before: datetime,
+        include_cancelled: bool = False,
     ) -> List[Dict[str, Any]]:
         after = ReminderService._normalize_dt(after)
         before = ReminderService._normalize_dt(before)
@@ -47,73 +49,42 @@ class ReminderService:
         if not user:
             raise ValueError(f"User não encontrado para user_id={user_id}")
 
-        google_token = (
-            db.query(GoogleToken)
-            .filter(GoogleToken.user_id == user_id)
-            .first()
-        )
-
-        if not google_token:
-            raise ValueError(f"GoogleToken não encontrado para user_id={user_id}")
-
-        access_token = google_token.google_access_token
-        refresh_token = google_token.google_refresh_token
         calendar_id = getattr(user, "calendar_id", None) or ReminderService.DEFAULT_CALENDAR_ID
 
-        if not access_token:
-            raise ValueError(f"user_id={user_id} sem access token Google")
-
-        if not refresh_token:
-            raise ValueError(f"user_id={user_id} sem refresh token Google")
-
-        google_service = GoogleAuthService()
-
-        # força refresh sempre
-        refreshed = google_service.refresh_access_token(
-            access_token=access_token,
-            refresh_token=refresh_token,
-        )
-
-        access_token = refreshed["access"]
-        new_expires_at = refreshed["expiry"]
-
-        google_token.google_access_token = access_token
-        google_token.google_token_expiry = new_expires_at
-        db.add(google_token)
-        db.commit()
-        db.refresh(google_token)
-
-        payload = google_service.list_calendar_events(
-            access_token=access_token,
-            calendar_id=calendar_id,
-            time_min=after.isoformat(),
-            time_max=before.isoformat(),
-            max_results=100,
-        )
-
-        items = payload.get("items", [])
+        # sync incremental (syncToken) e leitura do espelho local: o poll de lembretes
+        # só custa uma chamada ao Google quando passou o intervalo mínimo, e só traz o delta
+        # (1º sync ainda pendente: lê a janela direto no Google)
+        try:
+            rows = GoogleCalendarSyncService.read_range(
+                db,
+                user_id,
+                calendar_id=calendar_id,
+                time_min=after,
+                time_max=before,
+                include_cancelled=include_cancelled,
+            )
+        except GoogleTokenNotFound:
+            raise ValueError(f"GoogleToken não encontrado para user_id={user_id}")
         results: List[Dict[str, Any]] = []
 
-        for item in items:
-            status = item.get("status")
-            if status == "cancelled":
-                continue
-
-            start_raw = item.get("start", {})
-            end_raw = item.get("end", {})
+        for row in rows:
+            raw = row.raw or {}
+            start_raw = raw.get("start") or {}
+            end_raw = raw.get("end") or {}
 
-            start_dt = start_raw.get("dateTime") or start_raw.get("date")
-            end_dt = end_raw.get("dateTime") or end_raw.get("date")
+            # apagados chegam no delta sem start/end: usa o que o espelho já tinha
+            start_dt = start_raw.get("dateTime") or start_raw.get("date") or row.start_datetime.isoformat()
+            end_dt = end_raw.get("dateTime") or end_raw.get("date") or (row.end_datetime.isoformat() if row.end_datetime else None)
 
             results.append(
                 {
-                    "google_event_id": item.get("id"),
-                    "status": status,
-                    "summary": item.get("summary"),
-                    "description": item.get("description"),
+                    "google_event_id": row.google_event_id,
+                    "status": row.status,
+                    "summary": row.summary,
+                    "description": row.description,
                     "start_datetime": start_dt,
                     "end_datetime": end_dt,
-                    "html_link": item.get("htmlLink"),
+                    "html_link": row.html_link,
                 }
             )
 
@@ -407,6 +378,7 @@ class ReminderService:
             user_id=user_id,
             after=after,
             before=before,
+            include_cancelled=True,  # cancelamentos vêm do delta do sync
         )
 
         now_utc = datetime.now(timezone.utc)
@@ -0,0 +1,307 @@
+# app/api/services/slot_service.py
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.api.models.disponibilidade import ProfissionalDisponibilidade
+from app.api.models.google_calendar_event import GoogleCalendarEvent
+from app.api.models.user import User
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_freebusy_service import GoogleFreeBusyService
+from app.api.services.google_token_service import GoogleTokenService
+
+Interval = Tuple[datetime, datetime]
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    merged: List[List[datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _subtract(windows: List[Interval], busy: List[Interval]) -> List[Tuple[datetime, datetime, datetime]]:
+    """
+    Varredura única sobre janelas e ocupados (ambos ordenados e sem sobreposição):
+    O(janelas + ocupados). Retorna (início livre, fim livre, início da janela).
+    """
+    free: List[Tuple[datetime, datetime, datetime]] = []
+    j = 0
+    for w_start, w_end in windows:
+        # ocupados que terminam antes desta janela não afetam as próximas
+        while j < len(busy) and busy[j][1] <= w_start:
+            j += 1
+
+        cursor = w_start
+        k = j
+        while k < len(busy) and busy[k][0] < w_end:
+            b_start, b_end = busy[k]
+            if b_start > cursor:
+                free.append((cursor, b_start, w_start))
+            cursor = max(cursor, b_end)
+            if cursor >= w_end:
+                break
+            k += 1
+
+        if cursor < w_end:
+            free.append((cursor, w_end, w_start))
+    return free
+
+
+def _split(free: List[Tuple[datetime, datetime, datetime]], duration: timedelta) -> List[Interval]:
+    """Fatia os livres em slots de `duration`, alinhados à grade da janela (08:00, 08:30...)."""
+    slots: List[Interval] = []
+    for f_start, f_end, anchor in free:
+        steps = -((anchor - f_start) // duration)  # ceil((f_start - anchor) / duration)
+        start = anchor + steps * duration
+        while start + duration <= f_end:
+            slots.append((start, start + duration))
+            start += duration
+    return slots
+
+
+class SlotService:
+    """
+    Horários livres de um profissional: grade semanal (profissional_disponibilidade)
+    menos ocupados do Google (espelho local sincronizado), fatiada em slots de
+    User.duracao_consulta. Profissional sem Google conectado: só a grade (sem ocupados).
+
+    Cache por (usuário, período) validado por uma "impressão digital" barata no banco
+    (último sync do espelho + versão da grade + duração/fuso do usuário): muda o
+    calendário ou a grade em qualquer worker, o próximo pedido recalcula.
+    """
+
+    _cache = TTLCache(
+        maxsize=settings.SLOT_CACHE_SIZE,
+        ttl_seconds=settings.SLOT_CACHE_TTL_SECONDS,
+        name="slots",
+    )
+    _stats: Dict[str, int] = {"computed": 0}
+
+    # ======================
+    # Entradas
+    # ======================
+
+    @staticmethod
+    def _fingerprint(db: Session, user: User, calendar_id: str) -> Tuple[Any, ...]:
+        calendar_version, template_version, template_rows = db.execute(
+            select(
+                select(func.max(GoogleCalendarEvent.synced_at))
+                .where(GoogleCalendarEvent.user_id == user.id)
+                .where(GoogleCalendarEvent.calendar_id == calendar_id)
+                .scalar_subquery(),
+                select(func.max(ProfissionalDisponibilidade.id))
+                .where(ProfissionalDisponibilidade.user_id == user.id)
+                .scalar_subquery(),
+                select(func.count(ProfissionalDisponibilidade.id))
+                .where(ProfissionalDisponibilidade.user_id == user.id)
+                .where(ProfissionalDisponibilidade.ativo == True)  # noqa: E712
+                .scalar_subquery(),
+            )
+        ).one()
+        return (calendar_version, template_version, template_rows, user.duracao_consulta, user.timezone)
+
+    @staticmethod
+    def _windows(db: Session, user_id: int, tz: ZoneInfo, first_day: date, days: int) -> List[Interval]:
+        rows = db.execute(
+            select(
+                ProfissionalDisponibilidade.dia_semana,
+                ProfissionalDisponibilidade.hora_inicio,
+                ProfissionalDisponibilidade.hora_fim,
+            )
+            .where(ProfissionalDisponibilidade.user_id == user_id)
+            .where(ProfissionalDisponibilidade.ativo == True)  # noqa: E712
+        ).all()
+
+        # dia_semana: 1 = segunda ... 7 = domingo (isoweekday)
+        by_weekday: Dict[int, List[Tuple[time, time]]] = {}
+        for dia, inicio, fim in rows:
+            if inicio is not None and fim is not None and fim > inicio:
+                by_weekday.setdefault(int(dia), []).append((inicio, fim))
+
+        windows: List[Interval] = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            for inicio, fim in by_weekday.get(day.isoweekday(), []):
+                # hora local -> UTC dia a dia (horário de verão fica certo)
+                start = datetime.combine(day, inicio, tzinfo=tz).astimezone(timezone.utc)
+                end = datetime.combine(day, fim, tzinfo=tz).astimezone(timezone.utc)
+                windows.append((start, end))
+        return _merge(windows)
+
+    @staticmethod
+    def _busy(db: Session, user_id: int, calendar_id: str, tz: ZoneInfo, time_min: datetime, time_max: datetime) -> List[Interval]:
+        rows = GoogleCalendarSyncService.list_range(db, user_id, calendar_id=calendar_id, time_min=time_min, time_max=time_max)
+        busy: List[Interval] = []
+        for row in rows:
+            raw = row.raw or {}
+            if raw.get("transparency") == "transparent":
+                # marcado como "disponível" no Google
+                continue
+            if row.all_day:
+                # dia inteiro: meia-noite local (o espelho guarda a data em UTC)
+                start_day = date.fromisoformat((raw.get("start") or {}).get("date") or row.start_datetime.date().isoformat())
+                end_day = date.fromisoformat((raw.get("end") or {}).get("date") or (start_day + timedelta(days=1)).isoformat())
+                start = datetime.combine(start_day, time.min, tzinfo=tz).astimezone(timezone.utc)
+                end = datetime.combine(end_day, time.min, tzinfo=tz).astimezone(timezone.utc)
+            else:
+                start, end = row.start_datetime, row.end_datetime
+                if start is None or end is None:
+                    continue
+                if start.tzinfo is None:
+                    start = start.replace(tzinfo=timezone.utc)
+                if end.tzinfo is None:
+                    end = end.replace(tzinfo=timezone.utc)
+            busy.append((start, end))
+        return _merge(busy)
+
+    @staticmethod
+    def _busy_freebusy(user_id: int, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Interval]:
+        result = GoogleFreeBusyService.query([(user_id, calendar_id)], time_min, time_max).get(int(user_id)) or {}
+        if result.get("errors"):
+            raise RuntimeError(f"freeBusy falhou para user_id={user_id}: {result['errors']}")
+        busy = [
+            (datetime.fromisoformat(b["start"].replace("Z", "+00:00")), datetime.fromisoformat(b["end"].replace("Z", "+00:00")))
+            for b in result.get("busy") or []
+        ]
+        return _merge(busy)
+
+    # ======================
+    # Cálculo
+    # ======================
+
+    @classmethod
+    def _slots(cls, db: Session, user: User, first_day: date, days: int) -> Tuple[ZoneInfo, List[Interval]]:
+        tz = ZoneInfo(user.timezone or DEFAULT_TIMEZONE)
+        calendar_id = user.calendar_id or "primary"
+
+        google_connected = GoogleTokenService.get_by_user(db, user.id) is not None
+        mirror_ready = True
+        if google_connected:
+            # sync incremental / push: normalmente não chama o Google
+            mode = GoogleCalendarSyncService.ensure_synced(user.id, calendar_id)["mode"]
+            # 1º sync ainda em background: espelho vazio, ocupados vêm do freeBusy
+            mirror_ready = mode != "pending"
+
+        key = (user.id, calendar_id, first_day, days)
+        fingerprint = (google_connected,) + cls._fingerprint(db, user, calendar_id)
+        cached = cls._cache.get(key) if mirror_ready else None
+        if cached is not None and cached[0] == fingerprint:
+            return tz, cached[1]
+
+        time_min = datetime.combine(first_day, time.min, tzinfo=tz).astimezone(timezone.utc)
+        time_max = datetime.combine(first_day + timedelta(days=days), time.min, tzinfo=tz).astimezone(timezone.utc)
+
+        windows = cls._windows(db, user.id, tz, first_day, days)
+        # sem Google conectado não há ocupados a descontar (nem espelho a ler)
+        if not windows or not google_connected:
+            busy = []
+        elif mirror_ready:
+            busy = cls._busy(db, user.id, calendar_id, tz, time_min, time_max)
+        else:
+            busy = cls._busy_freebusy(user.id, calendar_id, time_min, time_max)
+        slots = _split(_subtract(windows, busy), timedelta(minutes=int(user.duracao_consulta)))
+
+        if mirror_ready:
+            # sem espelho o fingerprint não vê o 1º sync terminar: não guarda
+            cls._cache.set(key, (fingerprint, slots))
+        cls._stats["computed"] += 1
+        return tz, slots
+
+    @staticmethod
+    def _load_user(db: Session, user_id: int) -> User:
+        user = db.get(User, int(user_id))
+        if user is None:
+            raise ValueError(f"User não encontrado para user_id={user_id}")
+        if not user.duracao_consulta or int(user.duracao_consulta) <= 0:
+            raise ValueError(f"duracao_consulta inválida para user_id={user_id}")
+        return user
+
+    @staticmethod
+    def _format(tz: ZoneInfo, slots: List[Interval]) -> List[Dict[str, str]]:
+        return [{"inicio": s.astimezone(tz).isoformat(), "fim": e.astimezone(tz).isoformat()} for s, e in slots]
+
+    @staticmethod
+    def _not_before(now: Optional[datetime]) -> datetime:
+        now = now or datetime.now(timezone.utc)
+        return now + timedelta(minutes=int(settings.SLOT_MIN_LEAD_MINUTES))
+
+    # ======================
+    # API
+    # ======================
+
+    @classmethod
+    def free_slots(
+        cls,
+        db: Session,
+        user_id: int,
+        first_day: Optional[date] = None,
+        days: int = 7,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Slots livres de `first_day` (hoje, no fuso do profissional) por `days` dias."""
+        user = cls._load_user(db, user_id)
+        tz = ZoneInfo(user.timezone or DEFAULT_TIMEZONE)
+        days = min(max(int(days), 1), int(settings.SLOT_MAX_DAYS))
+        first_day = first_day or (now or datetime.now(timezone.utc)).astimezone(tz).date()
+
+        tz, slots = cls._slots(db, user, first_day, days)
+        not_before = cls._not_before(now)
+        slots = [s for s in slots if s[0] >= not_before]
+
+        return {
+            "user_id": user.id,
+            "timezone": str(tz),
+            "duracao_consulta": user.duracao_consulta,
+            "inicio": first_day.isoformat(),
+            "dias": days,
+            "total": len(slots),
+            "slots": cls._format(tz, slots),
+        }
+
+    @classmethod
+    def next_slots(
+        cls,
+        db: Session,
+        user_id: int,
+        n: int = 3,
+        days: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Os próximos `n` slots livres a partir de agora (horizonte de `days` dias)."""
+        user = cls._load_user(db, user_id)
+        tz = ZoneInfo(user.timezone or DEFAULT_TIMEZONE)
+        days = min(max(int(days or settings.SLOT_NEXT_HORIZON_DAYS), 1), int(settings.SLOT_MAX_DAYS))
+        first_day = (now or datetime.now(timezone.utc)).astimezone(tz).date()
+
+        tz, slots = cls._slots(db, user, first_day, days)
+        not_before = cls._not_before(now)
+        picked: List[Interval] = []
+        for slot in slots:
+            if slot[0] >= not_before:
+                picked.append(slot)
+                if len(picked) >= n:
+                    break
+
+        return {
+            "user_id": user.id,
+            "timezone": str(tz),
+            "duracao_consulta": user.duracao_consulta,
+            "slots": cls._format(tz, picked),
+        }
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {**cls._stats, "cache": cls._cache.stats()}
@@ -3,6 +3,7 @@ from __future__ import annotations
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.api.models.tenant_integration import TenantIntegration
+from app.api.services.tenant_service import TenantService
 
 
 class TenantIntegrationService:
@@ -64,6 +65,9 @@ class TenantIntegrationService:
                     detail="evolution_instance_id already bound to another tenant",
                 )
 
+        previous_instance = integration.evolution_instance_id
+        previous_inbox_id = integration.chatwoot_inbox_id
+
         # aplica valores
         integration.chatwoot_account_id = chatwoot_account_id
         integration.chatwoot_inbox_id = chatwoot_inbox_id
@@ -76,6 +80,11 @@ class TenantIntegrationService:
 
         db.commit()
         db.refresh(integration)
+
+        TenantService.invalidate_routing_cache(
+            instance_names=(previous_instance, integration.evolution_instance_id),
+            inbox_ids=(previous_inbox_id, integration.chatwoot_inbox_id),
+        )
         return integration
 
     @staticmethod
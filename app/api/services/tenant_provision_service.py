@@ -6,6 +6,7 @@ from app.api.models.user import User
 from app.api.models.tenant_integration import TenantIntegration
 from app.api.services.chatwoot_service import ChatwootService
 from app.api.models.tenant import Tenant
+from app.api.services.tenant_service import TenantService
 
 class TenantProvisionService:
     @staticmethod
@@ -21,12 +22,18 @@ class TenantProvisionService:
             db.add(integration)
             db.flush()
 
+        previous_instance = integration.evolution_instance_id
+
         if inbox_name:
             integration.evolution_instance_id = inbox_name
 
         if integration.chatwoot_inbox_id:
             db.commit()
             db.refresh(integration)
+            TenantService.invalidate_routing_cache(
+                instance_names=(previous_instance, integration.evolution_instance_id),
+                inbox_ids=(integration.chatwoot_inbox_id,),
+            )
             return integration
 
         base_url = os.getenv("CHATWOOT_BASE_URL")
@@ -72,6 +79,10 @@ class TenantProvisionService:
 
             db.commit()
             db.refresh(integration)
+            TenantService.invalidate_routing_cache(
+                instance_names=(previous_instance, integration.evolution_instance_id),
+                inbox_ids=(integration.chatwoot_inbox_id,),
+            )
             return integration
 
         except Exception as e:
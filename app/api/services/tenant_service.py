@@ -10,19 +10,104 @@ from app.api.models.user import User
 
 from app.db.session import SessionLocal
 from app.api.models.tenant_integration import TenantIntegration
+from app.api.services.message_dedup_service import MessageDedupService
+from app.api.services.chatwoot_routing_service import ChatwootRoutingService
+from app.api.services.cache_version_service import TENANT_ROUTING, CacheVersionService
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logs import get_logger
+
+_MISS = object()
+_log = get_logger("tenant")
 
 
 class TenantService:
-    @staticmethod
-    def get_by_evolution_instance(instance_name: str):
+    # =========================
+    # CACHE DE ROTEAMENTO (por processo)
+    # valor None = negativo (instância/inbox desconhecida), TTL mais curto
+    # alteração em outro worker chega via CacheVersionService (atraso <= CACHE_VERSION_CHECK_SECONDS)
+    # =========================
+    _by_instance = TTLCache(
+        maxsize=settings.TENANT_CACHE_SIZE,
+        ttl_seconds=settings.TENANT_CACHE_TTL_SECONDS,
+        name="tenant_by_instance",
+    )
+    _by_inbox = TTLCache(
+        maxsize=settings.TENANT_CACHE_SIZE,
+        ttl_seconds=settings.TENANT_CACHE_TTL_SECONDS,
+        name="tenant_by_inbox",
+    )
+
+    _routing_version: Optional[int] = None
+
+    @classmethod
+    def _sync_routing_version(cls) -> None:
+        """Outro worker invalidou (bind/config): limpa os caches locais de roteamento."""
+        version = CacheVersionService.current(TENANT_ROUTING)
+        if version == cls._routing_version:
+            return
+        if cls._routing_version is not None:
+            cls._by_instance.clear()
+            cls._by_inbox.clear()
+            _log.info("TENANT_CACHE_REMOTE_INVALIDATION", version=version)
+        cls._routing_version = version
+
+    @classmethod
+    def _cache_put(cls, cache: TTLCache, key: Any, value: Optional[Dict[str, Any]]) -> None:
+        if value is None:
+            cache.set(key, None, ttl_seconds=settings.TENANT_CACHE_NEGATIVE_TTL_SECONDS)
+        else:
+            cache.set(key, dict(value))
+
+    @classmethod
+    def invalidate_routing_cache(cls, instance_names=(), inbox_ids=(), clear_all: bool = False) -> None:
+        """
+        Chamado pelos fluxos que alteram instância/inbox/token do tenant (depois do commit).
+        Limpa este processo na hora e incrementa a versão compartilhada pros outros workers.
+        """
+        ChatwootRoutingService.invalidate(inbox_ids=inbox_ids, clear_all=clear_all)
+        if clear_all:
+            cls._by_instance.clear()
+            cls._by_inbox.clear()
+        else:
+            for name in instance_names:
+                if name and str(name).strip():
+                    cls._by_instance.delete(str(name).strip())
+            for inbox_id in inbox_ids:
+                if inbox_id:
+                    cls._by_inbox.delete(int(inbox_id))
+
+        CacheVersionService.bump(TENANT_ROUTING)
+
+    @classmethod
+    def routing_cache_stats(cls) -> Dict[str, Any]:
+        return {
+            "by_instance": cls._by_instance.stats(),
+            "by_inbox": cls._by_inbox.stats(),
+            "version": cls._routing_version,
+        }
+
+    @classmethod
+    def get_by_evolution_instance(cls, instance_name: str):
 
         if not instance_name or not instance_name.strip():
-            print("TENANT_LOOKUP_IGNORED: empty instance_name")
+            _log.info("TENANT_LOOKUP_IGNORED", detail="empty instance_name")
             return None
 
+        instance_name = instance_name.strip()
+        cls._sync_routing_version()
+        cached = cls._by_instance.get(instance_name, _MISS)
+        if cached is not _MISS:
+            return dict(cached) if cached is not None else None
+
+        result = cls._load_by_evolution_instance(instance_name)
+        cls._cache_put(cls._by_instance, instance_name, result)
+        return result
+
+    @staticmethod
+    def _load_by_evolution_instance(instance_name: str) -> Optional[Dict[str, Any]]:
         db: Session = SessionLocal()
         try:
-            instance_name = instance_name.strip()
 
             # 1️⃣ Buscar integração
             integration = db.execute(
@@ -31,7 +116,7 @@ class TenantService:
             ).scalar_one_or_none()
 
             if not integration:
-                print(f"TENANT_LOOKUP_NOT_FOUND: instance_name={instance_name}")
+                _log.info("TENANT_LOOKUP_NOT_FOUND", instance_name=instance_name)
                 return None
 
             # 2️⃣ Buscar tenant real
@@ -41,7 +126,7 @@ class TenantService:
 
 
             if not tenant:
-                print(f"TENANT_AUTO_CREATE: user_id={integration.user_id}")
+                _log.info("TENANT_AUTO_CREATE", user_id=integration.user_id)
 
                 tenant = Tenant(
                     user_id=integration.user_id,
@@ -52,7 +137,7 @@ class TenantService:
                 db.refresh(tenant)
 
 
-            print(f"TENANT_LOOKUP_OK: instance_name={instance_name} tenant_id={tenant.id}")
+            _log.info("TENANT_LOOKUP_OK", instance_name=instance_name, tenant_id=tenant.id)
 
             return {
                 "tenant_id": tenant.id,
@@ -68,12 +153,24 @@ class TenantService:
 
 
     # ✅ NOVO: usado no fluxo de saída (Chatwoot -> Evolution)
-    @staticmethod
-    def get_by_chatwoot_inbox_id(inbox_id: int) -> Optional[Dict[str, Any]]:
+    @classmethod
+    def get_by_chatwoot_inbox_id(cls, inbox_id: int) -> Optional[Dict[str, Any]]:
         if not inbox_id:
-            print("TENANT_LOOKUP_IGNORED: empty inbox_id")
+            _log.info("TENANT_LOOKUP_IGNORED", detail="empty inbox_id")
             return None
 
+        key = int(inbox_id)
+        cls._sync_routing_version()
+        cached = cls._by_inbox.get(key, _MISS)
+        if cached is not _MISS:
+            return dict(cached) if cached is not None else None
+
+        result = cls._load_by_chatwoot_inbox_id(key)
+        cls._cache_put(cls._by_inbox, key, result)
+        return result
+
+    @staticmethod
+    def _load_by_chatwoot_inbox_id(inbox_id: int) -> Optional[Dict[str, Any]]:
         db: Session = SessionLocal()
         try:
             tenant = db.execute(
@@ -81,10 +178,10 @@ class TenantService:
             ).scalar_one_or_none()
 
             if not tenant:
-                print(f"TENANT_LOOKUP_NOT_FOUND_BY_INBOX: inbox_id={inbox_id}")
+                _log.info("TENANT_LOOKUP_NOT_FOUND_BY_INBOX", inbox_id=inbox_id)
                 return None
 
-            print(f"TENANT_LOOKUP_OK_BY_INBOX: inbox_id={inbox_id} tenant_id={tenant.id}")
+            _log.info("TENANT_LOOKUP_OK_BY_INBOX", inbox_id=inbox_id, tenant_id=tenant.id)
             return {
                 "id": tenant.id,
                 "name": tenant.name,
@@ -125,6 +222,8 @@ class TenantService:
                 .where(TenantIntegration.user_id == tenant_id)
             ).scalar_one_or_none()
 
+            previous_instance = integration.evolution_instance_id if integration else None
+
             if integration:
                 # Atualiza
                 integration.evolution_instance_id = instance_name
@@ -138,7 +237,12 @@ class TenantService:
 
             db.commit()
 
-            print(f"TENANT_BIND_OK: tenant_id={tenant_id} instance_name={instance_name}")
+            TenantService.invalidate_routing_cache(
+                instance_names=(previous_instance, instance_name, tenant.evolution_instance_name),
+                inbox_ids=(tenant.chatwoot_inbox_id,),
+            )
+
+            _log.info("TENANT_BIND_OK", tenant_id=tenant_id, instance_name=instance_name)
 
             return {
                 "tenant_id": tenant_id,
@@ -167,6 +271,8 @@ class TenantService:
                 db.refresh(tenant)
 
 
+            previous_inbox_id = tenant.chatwoot_inbox_id
+
             tenant.chatwoot_account_id = account_id
             tenant.chatwoot_inbox_id = inbox_id
             tenant.chatwoot_api_token = api_token
@@ -182,8 +288,16 @@ class TenantService:
             db.commit()
             db.refresh(tenant)
 
+            integration_instance = db.execute(
+                select(TenantIntegration.evolution_instance_id)
+                .where(TenantIntegration.user_id == tenant.user_id)
+            ).scalar_one_or_none()
+            TenantService.invalidate_routing_cache(
+                instance_names=(integration_instance, tenant.evolution_instance_name),
+                inbox_ids=(previous_inbox_id, inbox_id),
+            )
 
-            print(f"TENANT_CHATWOOT_OK: tenant_id={tenant.id} account_id={account_id} inbox_id={inbox_id}")
+            _log.info("TENANT_CHATWOOT_OK", tenant_id=tenant.id, account_id=account_id, inbox_id=inbox_id)
             return {
                 "id": tenant.id,
                 "chatwoot_account_id": tenant.chatwoot_account_id,
@@ -192,10 +306,21 @@ class TenantService:
         finally:
             db.close()
 
+    # =========================
+    # DEDUP (Evolution key.id) -> MessageDedupService
+    # =========================
     @staticmethod
     def is_duplicate_message(instance_name: str, message_id: str) -> bool:
-        return False
+        return MessageDedupService.is_duplicate(instance_name=instance_name, message_id=message_id)
+
+    @staticmethod
+    def claim_message(instance_name: str, message_id: str) -> bool:
+        return MessageDedupService.claim(instance_name=instance_name, message_id=message_id)
+
+    @staticmethod
+    def release_message(instance_name: str, message_id: str) -> None:
+        MessageDedupService.release(instance_name=instance_name, message_id=message_id)
 
     @staticmethod
     def mark_message_processed(instance_name: str, message_id: str) -> None:
-        return None
+        MessageDedupService.complete(instance_name=instance_name, message_id=message_id)
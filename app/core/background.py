@@ -0,0 +1,92 @@
+## tarefas periódicas em background (rodam no event loop do uvicorn)
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger("background")
+
+JobFn = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class PeriodicTask:
+    """
+    Executa `fn` a cada `interval_seconds`.
+    Funções síncronas (DB, requests) rodam no threadpool pra não travar o loop.
+    """
+
+    def __init__(self, name: str, interval_seconds: float, fn: JobFn):
+        self.name = name
+        self.interval_seconds = max(float(interval_seconds), 0.1)
+        self.fn = fn
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+
+    async def _run_once(self) -> None:
+        if inspect.iscoroutinefunction(self.fn):
+            await self.fn()
+        else:
+            await run_in_threadpool(self.fn)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self._run_once()
+                self.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("BACKGROUND_TASK_ERROR: task=%s error=%r", self.name, e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name=f"periodic:{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval_seconds,
+            "running": bool(self._task and not self._task.done()),
+            "runs": self.runs,
+            "errors": self.errors,
+        }
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register_periodic(name: str, interval_seconds: float, fn: JobFn) -> PeriodicTask:
+    task = PeriodicTask(name=name, interval_seconds=interval_seconds, fn=fn)
+    _tasks.append(task)
+    return task
+
+
+async def start_background_tasks() -> None:
+    for task in _tasks:
+        task.start()
+
+
+async def stop_background_tasks() -> None:
+    for task in _tasks:
+        await task.stop()
+
+
+def background_tasks_info() -> List[Dict[str, Any]]:
+    return [t.info() for t in _tasks]
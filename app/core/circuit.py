@@ -0,0 +1,277 @@
+## circuit breakers por upstream (chatwoot, evolution, google) e por escopo (conta Chatwoot / instância Evolution)
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logs import get_logger
+
+_log = get_logger("circuit")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada na hora: o circuito do upstream/escopo está aberto."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit open: {name} (retry em {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed -> (N falhas seguidas) -> open -> (reset_seconds) -> half_open
+    Em half_open só `half_open_max_calls` chamadas de teste passam por vez:
+    sucesso fecha o circuito, falha reabre (e o relógio recomeça).
+
+    Thread-safe: usado pelo event loop (httpx) e pelo threadpool (requests).
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_seconds = float(reset_seconds)
+        self.half_open_max_calls = max(int(half_open_max_calls), 1)
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.rejected = 0
+        self.opened_count = 0
+        self.last_error: Optional[str] = None
+
+    def _retry_after(self, now: float) -> float:
+        return max(self.reset_seconds - (now - self._opened_at), 0.0)
+
+    def acquire(self) -> None:
+        """Antes da chamada. Levanta CircuitOpenError se não pode passar."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                if now - self._opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self._retry_after(now))
+                self._state = HALF_OPEN
+                self._probes = 0
+                _log.info("CIRCUIT_HALF_OPEN", circuit=self.name)
+
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.reset_seconds)
+                self._probes += 1
+
+    def release(self) -> None:
+        """Desiste da chamada sem resultado (outro breaker recusou / erro local)."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                # chamada lenta que começou antes de abrir: não fecha o circuito
+                return
+            if self._state == HALF_OPEN:
+                _log.info("CIRCUIT_CLOSED", circuit=self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self._failures += 1
+            self.last_error = error[:300]
+
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened_count += 1
+                    _log.warning("CIRCUIT_OPEN", circuit=self.name, failures=self._failures, error=self.last_error)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._state
+            retry_after = None
+            if state == OPEN:
+                retry_after = round(self._retry_after(now), 1)
+                if retry_after == 0:
+                    state = HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after_seconds": retry_after,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+# escopo "tenant" extraído da URL: conta no Chatwoot, instância na Evolution
+_CHATWOOT_ACCOUNT_RE = re.compile(r"/api/v1/accounts/(\d+)(?:/|$)")
+_EVOLUTION_INSTANCE_RE = re.compile(r"^(?:/api)?/(?:message|chat)/(?:[^/?]+/)+([^/?]+)$")
+_EVOLUTION_INSTANCE_QS_RE = re.compile(r"[?&]instanceName=([^&]+)")
+
+
+def scope_for_url(upstream: str, path: str) -> Optional[str]:
+    if upstream == "chatwoot":
+        m = _CHATWOOT_ACCOUNT_RE.search(path)
+        return f"account:{m.group(1)}" if m else None
+
+    if upstream == "evolution":
+        m = _EVOLUTION_INSTANCE_QS_RE.search(path)
+        if m:
+            return f"instance:{m.group(1)}"
+        m = _EVOLUTION_INSTANCE_RE.match(path.split("?", 1)[0])
+        return f"instance:{m.group(1)}" if m else None
+
+    return None
+
+
+def get_breaker(upstream: str, scope: Optional[str] = None) -> CircuitBreaker:
+    name = f"{upstream}/{scope}" if scope else upstream
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            threshold = settings.CIRCUIT_SCOPE_FAILURE_THRESHOLD if scope else settings.CIRCUIT_UPSTREAM_FAILURE_THRESHOLD
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=threshold,
+                reset_seconds=settings.CIRCUIT_RESET_SECONDS,
+                half_open_max_calls=settings.CIRCUIT_HALF_OPEN_MAX_CALLS,
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def is_failure_status(status_code: int) -> bool:
+    # 4xx é problema do request (rota errada, payload), não do upstream
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitGuard:
+    """
+    Envolve uma chamada HTTP: breaker do escopo + breaker do upstream.
+        guard = CircuitGuard.enter("evolution", path)   # pode levantar CircuitOpenError
+        ... chamada ...
+        guard.success() / guard.failure(repr(e), connection=...) / guard.status(r.status_code)
+
+    Falha de chamada com escopo (5xx/429, timeout de leitura) só conta no escopo: uma
+    conta/instância quebrada não derruba o upstream pros outros tenants. O upstream
+    conta falhas sem escopo e falhas de conexão (não chegou no servidor).
+    """
+
+    __slots__ = ("breakers", "scoped")
+
+    def __init__(self, breakers: List[CircuitBreaker], scoped: bool = False):
+        # [escopo, upstream] quando scoped; senão [upstream]
+        self.breakers = breakers
+        self.scoped = scoped
+
+    @classmethod
+    def enter(cls, upstream: str, path: str) -> "CircuitGuard":
+        if not settings.CIRCUIT_ENABLED:
+            return cls([])
+
+        scope = scope_for_url(upstream, path)
+        breakers = [get_breaker(upstream, scope)] if scope else []
+        breakers.append(get_breaker(upstream))
+
+        acquired: List[CircuitBreaker] = []
+        try:
+            for b in breakers:
+                b.acquire()
+                acquired.append(b)
+        except CircuitOpenError:
+            for b in acquired:
+                b.release()
+            raise
+        return cls(breakers, scoped=bool(scope))
+
+    def success(self) -> None:
+        for b in self.breakers:
+            b.record_success()
+
+    def failure(self, error: str, connection: bool = False) -> None:
+        if not self.scoped or connection:
+            for b in self.breakers:
+                b.record_failure(error)
+            return
+        scope, upstream = self.breakers
+        scope.record_failure(error)
+        upstream.release()
+
+    def cancel(self) -> None:
+        for b in self.breakers:
+            b.release()
+
+    def status(self, status_code: int) -> None:
+        if is_failure_status(status_code):
+            self.failure(f"HTTP {status_code}")
+        else:
+            self.success()
+
+
+def breakers_snapshot() -> Dict[str, Any]:
+    with _breakers_lock:
+        items: List[Tuple[str, CircuitBreaker]] = sorted(_breakers.items())
+    return {name: b.snapshot() for name, b in items}
+
+
+def health() -> Dict[str, Any]:
+    """ok | degraded (algum escopo aberto) | down (algum upstream inteiro aberto)."""
+    snap = breakers_snapshot()
+    upstream_open = [n for n, s in snap.items() if "/" not in n and s["state"] != CLOSED]
+    scope_open = [n for n, s in snap.items() if "/" in n and s["state"] != CLOSED]
+
+    status = "ok"
+    if scope_open:
+        status = "degraded"
+    if upstream_open:
+        status = "down"
+
+    return {
+        "status": status,
+        "enabled": bool(settings.CIRCUIT_ENABLED),
+        "open_upstreams": upstream_open,
+        "open_scopes": scope_open,
+        "circuits": snap,
+    }
+
+
+def find_circuit_open(exc: BaseException) -> Optional[CircuitOpenError]:
+    """CircuitOpenError na cadeia da exceção (pode vir embrulhada por RuntimeError do service)."""
+    seen = 0
+    while exc is not None and seen < 10:
+        if isinstance(exc, CircuitOpenError):
+            return exc
+        exc = exc.__cause__ or exc.__context__
+        seen += 1
+    return None
@@ -54,8 +54,207 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
     GOOGLE_SCOPES: str
+    # access token em cache por user_id; refresh só quando faltar menos que a margem pro vencimento
+    GOOGLE_TOKEN_CACHE_SIZE: int = 10000
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: int = 300
+    # entre workers: quanto tempo espera o advisory lock de quem já está renovando o mesmo usuário
+    GOOGLE_TOKEN_REFRESH_LOCK_WAIT_SECONDS: float = 15
+    # renovação em background dos tokens que vencem dentro da janela (maior que a margem)
+    GOOGLE_TOKEN_PREREFRESH_ENABLED: bool = True
+    GOOGLE_TOKEN_PREREFRESH_POLL_SECONDS: int = 60
+    GOOGLE_TOKEN_PREREFRESH_WINDOW_SECONDS: int = 600
+    GOOGLE_TOKEN_PREREFRESH_BATCH_SIZE: int = 50
     
     FRONTEND_BASE_URL: str = "http://localhost:5173"
+
+    # ----------------------------------------------------
+    # 5. INGESTÃO DO WEBHOOK EVOLUTION
+    # ----------------------------------------------------
+    # "inline" = processa dentro do request (legado)
+    # "queue"  = persiste o payload, responde na hora e processa nas lanes
+    EVOLUTION_INGEST_MODE: str = "inline"
+    # modo fila: nº de lanes (cada lane = 1 conversa por vez, em ordem)
+    EVOLUTION_INGEST_CONCURRENCY: int = 4
+    EVOLUTION_INGEST_QUEUE_SIZE: int = 1000
+    EVOLUTION_INGEST_MAX_ATTEMPTS: int = 5
+    EVOLUTION_INGEST_RETRY_BASE_SECONDS: int = 5
+    EVOLUTION_INGEST_RETRY_MAX_SECONDS: int = 600
+    EVOLUTION_INGEST_POLL_SECONDS: int = 10
+    # tempo máximo que um evento pode ficar "processing" antes de voltar pra fila (crash do worker)
+    EVOLUTION_INGEST_LEASE_SECONDS: int = 300
+    # limite da mídia (decodificada) repassada da Evolution pro Chatwoot
+    EVOLUTION_MEDIA_MAX_BYTES: int = 16 * 1024 * 1024
+    # cache local de mídia por fileSha256 (encaminhadas / reenvios não baixam de novo)
+    MEDIA_CACHE_ENABLED: bool = True
+    MEDIA_CACHE_DIR: str = "/tmp/sofia-media-cache"
+    MEDIA_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # eventos assinados na instância (CSV); só messages-upsert é processado, o resto é ruído
+    EVOLUTION_WEBHOOK_EVENTS: str = "messages-upsert"
+    # loga cada evento descartado pelo pré-filtro (senão só conta em /ops/metrics)
+    EVOLUTION_LOG_IGNORED_EVENTS: bool = False
+
+    # ----------------------------------------------------
+    # 6. HTTP EXTERNO (clientes compartilhados)
+    # ----------------------------------------------------
+    HTTP_ASYNC_MAX_CONNECTIONS: int = 100
+    HTTP_ASYNC_MAX_KEEPALIVE: int = 20
+
+    # sessões sync (requests) por upstream: chatwoot | evolution | google_api | google_oauth
+    HTTP_POOL_CONNECTIONS: int = 4
+    HTTP_POOL_MAXSIZE: int = 20
+    HTTP_TIMEOUT_CHATWOOT: float = 30
+    HTTP_TIMEOUT_EVOLUTION: float = 30
+    HTTP_TIMEOUT_GOOGLE_API: float = 30
+    HTTP_TIMEOUT_GOOGLE_OAUTH: float = 15
+    # retries só para métodos idempotentes (GET/PUT/DELETE...) e erros de conexão
+    HTTP_RETRIES_CHATWOOT: int = 2
+    HTTP_RETRIES_EVOLUTION: int = 1
+    HTTP_RETRIES_GOOGLE_API: int = 3
+    HTTP_RETRIES_GOOGLE_OAUTH: int = 2
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.3
+
+    # ----------------------------------------------------
+    # 7. DE-DUPLICAÇÃO DE MENSAGENS (Evolution key.id)
+    # ----------------------------------------------------
+    MESSAGE_DEDUP_CACHE_SIZE: int = 50000
+    MESSAGE_DEDUP_CACHE_TTL_SECONDS: int = 86400
+    MESSAGE_DEDUP_CLAIM_LEASE_SECONDS: int = 300
+    MESSAGE_DEDUP_RETENTION_DAYS: int = 7
+
+    # ----------------------------------------------------
+    # 8. CACHE DE ROTEAMENTO DE TENANT (instância Evolution / inbox Chatwoot)
+    # ----------------------------------------------------
+    TENANT_CACHE_SIZE: int = 10000
+    TENANT_CACHE_TTL_SECONDS: int = 300
+    # instância/inbox desconhecida fica em cache por menos tempo
+    TENANT_CACHE_NEGATIVE_TTL_SECONDS: int = 10
+    # invalidação entre workers: cada processo confere a versão no banco no máximo a cada N s
+    CACHE_VERSION_CHECK_SECONDS: float = 2
+    # eventos outgoing do Chatwoot: (account, inbox) -> tenant/instância e (account, conversa) -> telefone
+    CHATWOOT_ROUTING_CACHE_TTL_SECONDS: int = 60
+    CHATWOOT_ROUTING_NEGATIVE_TTL_SECONDS: int = 15
+
+    # ----------------------------------------------------
+    # 9. RESOLUÇÃO CHATWOOT (telefone -> contato/conversa)
+    # ----------------------------------------------------
+    CHATWOOT_RESOLUTION_CACHE_SIZE: int = 20000
+    CHATWOOT_RESOLUTION_CACHE_TTL_SECONDS: int = 86400
+
+    # ----------------------------------------------------
+    # 10. LOGS (JSON lines via fila + thread escritora)
+    # ----------------------------------------------------
+    # "json" | "text" (formato legado EVENTO: k=v)
+    LOG_FORMAT: str = "json"
+    LOG_LEVEL: str = "INFO"
+    # fila cheia = registro descartado (contado em /ops/metrics), nunca bloqueia o request
+    LOG_QUEUE_SIZE: int = 10000
+    # amostragem de INFO/DEBUG por categoria, ex.: "chatwoot.http=0.1,evolution.webhook=0.5"
+    LOG_SAMPLING: str = ""
+    # nível por categoria, ex.: "chatwoot.http=WARNING,tenant=WARNING"
+    LOG_CATEGORY_LEVELS: str = ""
+
+    # ----------------------------------------------------
+    # 11. DEAD-LETTER DOS WEBHOOKS (Evolution / Chatwoot)
+    # ----------------------------------------------------
+    DEAD_LETTER_POLL_SECONDS: int = 30
+    # por rodada do retrier, processados em série
+    DEAD_LETTER_BATCH_SIZE: int = 20
+    DEAD_LETTER_MAX_ATTEMPTS: int = 10
+    DEAD_LETTER_RETRY_BASE_SECONDS: int = 60
+    DEAD_LETTER_RETRY_MAX_SECONDS: int = 3600
+    DEAD_LETTER_LEASE_SECONDS: int = 300
+
+    # ----------------------------------------------------
+    # 12. CIRCUIT BREAKERS (por upstream e por conta/instância)
+    # ----------------------------------------------------
+    CIRCUIT_ENABLED: bool = True
+    # falhas seguidas (erro de conexão/timeout, 5xx, 429) pra abrir; no upstream só
+    # contam falhas sem escopo e erros de conexão (5xx de uma conta/instância fica no escopo)
+    CIRCUIT_UPSTREAM_FAILURE_THRESHOLD: int = 20
+    CIRCUIT_SCOPE_FAILURE_THRESHOLD: int = 5
+    # aberto por N segundos; depois deixa passar chamadas de teste (half-open)
+    CIRCUIT_RESET_SECONDS: int = 30
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = 1
+
+    # ----------------------------------------------------
+    # 13. ENVIO WHATSAPP (fila de saída por instância Evolution)
+    # ----------------------------------------------------
+    # "queue"  = persiste o envio, responde na hora e o dispatcher envia no ritmo da instância
+    # "inline" = envia dentro do request (legado)
+    OUTBOUND_MODE: str = "queue"
+    # envios simultâneos por instância (mesmo destinatário sempre em ordem)
+    OUTBOUND_INSTANCE_CONCURRENCY: int = 1
+    OUTBOUND_INSTANCE_QUEUE_SIZE: int = 500
+    # intervalo mínimo entre dois envios da mesma instância
+    OUTBOUND_MIN_INTERVAL_MS: int = 1000
+    # "delay" da Evolution (digitando... antes de enviar)
+    OUTBOUND_TYPING_DELAY_MS: int = 1200
+    OUTBOUND_MAX_ATTEMPTS: int = 5
+    OUTBOUND_RETRY_BASE_SECONDS: int = 5
+    OUTBOUND_RETRY_MAX_SECONDS: int = 300
+    OUTBOUND_POLL_SECONDS: int = 5
+    OUTBOUND_LEASE_SECONDS: int = 120
+
+    # ----------------------------------------------------
+    # 14. SYNC INCREMENTAL DO GOOGLE CALENDAR (espelho local via syncToken)
+    # ----------------------------------------------------
+    # leituras dentro desse intervalo usam o espelho sem consultar o Google
+    GOOGLE_CALENDAR_SYNC_MIN_INTERVAL_SECONDS: int = 30
+    # entre workers: espera o sync incremental que já está rodando pro mesmo calendário
+    GOOGLE_CALENDAR_SYNC_LOCK_WAIT_SECONDS: float = 20
+    # lease do sync (renovado a cada página); vencido = worker morreu, outro pode assumir
+    GOOGLE_CALENDAR_SYNC_LEASE_SECONDS: int = 300
+    GOOGLE_CALENDAR_SYNC_PAGE_SIZE: int = 2500
+    # sync completo (1º sync / 410) roda só em background
+    GOOGLE_CALENDAR_FULL_SYNC_POLL_SECONDS: int = 5
+    GOOGLE_CALENDAR_FULL_SYNC_BATCH_SIZE: int = 5
+    GOOGLE_CALENDAR_FULL_SYNC_RETRY_SECONDS: int = 300
+
+    # ----------------------------------------------------
+    # 15. PUSH DO GOOGLE CALENDAR (watch channels -> sync só de quem mudou)
+    # ----------------------------------------------------
+    # exige URL HTTPS pública apontando pra /google/calendar/notifications
+    GOOGLE_CALENDAR_WATCH_ENABLED: bool = False
+    GOOGLE_CALENDAR_WATCH_ADDRESS: Optional[str] = None
+    # validade pedida ao Google pro canal (o Google pode devolver menos)
+    GOOGLE_CALENDAR_WATCH_TTL_SECONDS: int = 604800
+    # renova canais que vencem dentro dessa janela
+    GOOGLE_CALENDAR_WATCH_RENEW_BEFORE_SECONDS: int = 86400
+    GOOGLE_CALENDAR_WATCH_RENEW_POLL_SECONDS: int = 900
+    GOOGLE_CALENDAR_WATCH_RENEW_BATCH_SIZE: int = 50
+    # com canal ativo e sem notificação, o espelho vale até esse limite (rede de segurança
+    # pra notificação perdida); sem canal vale GOOGLE_CALENDAR_SYNC_MIN_INTERVAL_SECONDS
+    GOOGLE_CALENDAR_WATCH_MAX_STALENESS_SECONDS: int = 3600
+    GOOGLE_CALENDAR_WATCH_LANES: int = 4
+    GOOGLE_CALENDAR_WATCH_LANE_QUEUE_SIZE: int = 200
+
+    # ----------------------------------------------------
+    # 16. FREEBUSY EM LOTE (vários profissionais / agendas)
+    # ----------------------------------------------------
+    # agendas por request (limite do Google: 50)
+    GOOGLE_FREEBUSY_MAX_ITEMS: int = 50
+    # usuários (tokens) diferentes consultados em paralelo
+    GOOGLE_FREEBUSY_MAX_WORKERS: int = 8
+
+    # ----------------------------------------------------
+    # 17. HORÁRIOS LIVRES (grade semanal - ocupados do Google, em slots de duracao_consulta)
+    # ----------------------------------------------------
+    SLOT_CACHE_SIZE: int = 2000
+    # teto do cache; mudança de agenda/grade invalida antes (impressão digital no banco)
+    SLOT_CACHE_TTL_SECONDS: int = 300
+    SLOT_MAX_DAYS: int = 60
+    # horizonte de "próximos N horários"
+    SLOT_NEXT_HORIZON_DAYS: int = 14
+    # antecedência mínima para oferecer um horário
+    SLOT_MIN_LEAD_MINUTES: int = 0
+
+    # ----------------------------------------------------
+    # 18. OPERAÇÕES EM MASSA NO GOOGLE CALENDAR (batch multipart/mixed)
+    # ----------------------------------------------------
+    # operações por request batch (limite do Google Calendar: 50)
+    GOOGLE_BATCH_MAX_PARTS: int = 50
+
 # Cria uma instância única da classe Settings para ser importada em toda a aplicação
 settings = Settings()
 
@@ -0,0 +1,30 @@
+## JSON rápido: orjson quando instalado, json da stdlib como fallback (mesma interface)
+from __future__ import annotations
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Decodifica JSON. Levanta ValueError se inválido (orjson.JSONDecodeError herda de ValueError)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializa em bytes UTF-8 (compacto). Tipos não serializáveis viram str()."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
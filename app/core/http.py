@@ -0,0 +1,190 @@
+## clientes HTTP compartilhados para integrações externas (Chatwoot, Evolution, Google)
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.core.circuit import CircuitGuard
+from app.core.config import settings
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+# upstream -> (timeout, retries)
+UPSTREAMS = {
+    "chatwoot": ("HTTP_TIMEOUT_CHATWOOT", "HTTP_RETRIES_CHATWOOT"),
+    "evolution": ("HTTP_TIMEOUT_EVOLUTION", "HTTP_RETRIES_EVOLUTION"),
+    "google_api": ("HTTP_TIMEOUT_GOOGLE_API", "HTTP_RETRIES_GOOGLE_API"),
+    "google_oauth": ("HTTP_TIMEOUT_GOOGLE_OAUTH", "HTTP_RETRIES_GOOGLE_OAUTH"),
+}
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _is_connection_error(e: BaseException) -> bool:
+    """Não chegou no servidor (DNS, recusa, connect timeout): problema do upstream inteiro."""
+    return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, requests.ConnectionError))
+
+
+def _path_of(url: str) -> str:
+    parts = urlsplit(str(url))
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+class UpstreamSession(requests.Session):
+    """
+    requests.Session com timeout padrão (quem chama ainda pode passar timeout=...)
+    e circuit breaker do upstream/escopo: circuito aberto = CircuitOpenError na hora,
+    sem ocupar a thread pelo timeout inteiro.
+    """
+
+    def __init__(self, upstream: str, timeout: float):
+        super().__init__()
+        self.upstream = upstream
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.default_timeout
+
+        guard = CircuitGuard.enter(self.upstream, _path_of(url))
+        try:
+            r = super().request(method, url, **kwargs)
+        except requests.RequestException as e:
+            guard.failure(repr(e), connection=_is_connection_error(e))
+            raise
+        except BaseException:
+            guard.cancel()
+            raise
+        guard.status(r.status_code)
+        return r
+
+
+def _build_session(upstream: str) -> UpstreamSession:
+    timeout_attr, retries_attr = UPSTREAMS[upstream]
+    retries = int(getattr(settings, retries_attr))
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=float(settings.HTTP_RETRY_BACKOFF_SECONDS),
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # POST/PATCH nunca são reenviados
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+
+    session = UpstreamSession(upstream, float(getattr(settings, timeout_attr)))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(upstream: str) -> requests.Session:
+    """
+    Session sync (keep-alive + pool) por upstream, compartilhada pelo processo.
+    Usada pelos services que ainda rodam em threadpool/rotas sync.
+    """
+    session = _sessions.get(upstream)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(upstream)
+        if session is None:
+            session = _build_session(upstream)
+            _sessions[upstream] = session
+        return session
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    AsyncClient único por processo (keep-alive + pool de conexões).
+    Criado sob demanda; fechado no shutdown do app.
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_ASYNC_MAX_KEEPALIVE,
+            ),
+        )
+    return _async_client
+
+
+async def upstream_request(upstream: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Request async pelo client compartilhado, passando pelo circuit breaker do upstream/escopo."""
+    guard = CircuitGuard.enter(upstream, _path_of(url))
+    try:
+        r = await get_async_client().request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        guard.failure(repr(e), connection=_is_connection_error(e))
+        raise
+    except BaseException:
+        guard.cancel()
+        raise
+    guard.status(r.status_code)
+    return r
+
+
+class ResponseTooLarge(ValueError):
+    """Corpo da resposta acima do limite: a leitura é abortada antes de chegar ao fim."""
+
+
+async def upstream_request_limited(upstream: str, method: str, url: str, max_bytes: int, **kwargs: Any) -> httpx.Response:
+    """
+    upstream_request com o corpo lido em streaming e teto de bytes: aborta pelo
+    Content-Length ou assim que a contagem passa de `max_bytes` (ResponseTooLarge),
+    sem nunca ter o corpo inteiro de uma resposta grande em memória.
+    """
+    guard = CircuitGuard.enter(upstream, _path_of(url))
+    try:
+        async with get_async_client().stream(method, url, **kwargs) as r:
+            declared = r.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f"resposta com {declared} bytes (limite {max_bytes})")
+            body = bytearray()
+            async for chunk in r.aiter_bytes():
+                body += chunk
+                if len(body) > max_bytes:
+                    raise ResponseTooLarge(f"resposta passou de {max_bytes} bytes")
+    except httpx.HTTPError as e:
+        guard.failure(repr(e), connection=_is_connection_error(e))
+        raise
+    except BaseException:
+        guard.cancel()
+        raise
+    guard.status(r.status_code)
+
+    # corpo já decodificado (gzip etc.): não repassa os headers de transporte
+    headers = [(k, v) for k, v in r.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+    return httpx.Response(r.status_code, headers=headers, content=bytes(body), request=r.request)
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
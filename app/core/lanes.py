@@ -0,0 +1,185 @@
+## executor em "lanes": mesma chave -> mesma fila (ordem estrita); chaves diferentes rodam em paralelo
+## KeyedSerializer: ordem por chave exata pra quem espera o resultado (request inline), sem teto global
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from app.core.logs import get_logger
+
+Job = Callable[[], Awaitable[Any]]
+
+_log = get_logger("lanes")
+
+
+class LaneExecutor:
+    """
+    `lanes` filas asyncio, cada uma com um único consumidor.
+    A chave (ex.: (instance_name, remote_jid) ou (inbox_id, conversation_id)) é
+    hasheada de forma estável pra uma lane: jobs da mesma chave executam na ordem
+    de chegada; chaves em lanes diferentes executam concorrentemente.
+    """
+
+    def __init__(self, name: str, lanes: int, lane_queue_size: int):
+        self.name = name
+        self.lanes = max(int(lanes), 1)
+        self.lane_queue_size = max(int(lane_queue_size), 1)
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._busy: List[bool] = []
+        self._processed: List[int] = []
+        self._errors: List[int] = []
+        self._max_depth: List[int] = []
+        self._rejected = 0
+
+    # ======================
+    # ciclo de vida
+    # ======================
+
+    def is_running(self) -> bool:
+        return bool(self._workers) and any(not w.done() for w in self._workers)
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        self._queues = [asyncio.Queue(maxsize=self.lane_queue_size) for _ in range(self.lanes)]
+        self._busy = [False] * self.lanes
+        self._processed = [0] * self.lanes
+        self._errors = [0] * self.lanes
+        self._max_depth = [0] * self.lanes
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-lane-{i}")
+            for i in range(self.lanes)
+        ]
+        _log.info("LANES_STARTED", executor=self.name, lanes=self.lanes, lane_queue_size=self.lane_queue_size)
+
+    async def stop(self) -> None:
+        for w in self._workers:
+            w.cancel()
+        for w in self._workers:
+            try:
+                await w
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._queues = []
+
+    # ======================
+    # roteamento
+    # ======================
+
+    def lane_for(self, key: Hashable) -> int:
+        # crc32 (e não hash()) pra lane ser a mesma entre processos/restarts
+        return zlib.crc32(repr(key).encode("utf-8")) % self.lanes
+
+    def _put_nowait(self, lane: int, item: tuple) -> bool:
+        queue = self._queues[lane]
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            return False
+        self._max_depth[lane] = max(self._max_depth[lane], queue.qsize())
+        return True
+
+    def submit_nowait(self, key: Hashable, job: Job) -> bool:
+        """Enfileira sem esperar. False se o executor está parado ou a lane está cheia."""
+        if not self.is_running():
+            self._rejected += 1
+            return False
+        return self._put_nowait(self.lane_for(key), (job, None, contextvars.copy_context()))
+
+    # ======================
+    # consumo
+    # ======================
+
+    async def _worker(self, lane: int) -> None:
+        queue = self._queues[lane]
+        while True:
+            job, future, ctx = await queue.get()
+            self._busy[lane] = True
+            try:
+                # roda no contexto de quem enfileirou (request_id/trace_id dos logs)
+                result = await asyncio.create_task(job(), context=ctx)
+            except asyncio.CancelledError:
+                if future is not None and not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                self._errors[lane] += 1
+                if future is not None:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    _log.error("LANE_JOB_ERROR", executor=self.name, lane=lane, error=repr(e))
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                self._processed[lane] += 1
+                self._busy[lane] = False
+                queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [q.qsize() for q in self._queues]
+        return {
+            "name": self.name,
+            "running": self.is_running(),
+            "lanes": self.lanes,
+            "lane_queue_size": self.lane_queue_size,
+            "queued_total": sum(depths),
+            "busy_lanes": sum(1 for b in self._busy if b),
+            "rejected": self._rejected,
+            "lane_depth": depths,
+            "lane_max_depth": list(self._max_depth),
+            "lane_processed": list(self._processed),
+            "lane_errors": list(self._errors),
+        }
+
+
+class KeyedSerializer:
+    """
+    Serializa jobs pela chave exata, no próprio task do chamador: mesma chave espera
+    a anterior terminar (asyncio.Lock é FIFO), chaves diferentes nunca se bloqueiam
+    e não há limite de concorrência entre elas. O lock de uma chave existe só enquanto
+    há alguém rodando/esperando nela.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # chave -> [lock, nº de jobs rodando/esperando]
+        self._keys: Dict[Hashable, list] = {}
+        self._processed = 0
+        self._errors = 0
+        self._max_waiting = 0
+
+    async def run(self, key: Hashable, job: Job) -> Any:
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self._max_waiting = max(self._max_waiting, entry[1] - 1)
+        try:
+            async with entry[0]:
+                return await job()
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._processed += 1
+            entry[1] -= 1
+            if entry[1] == 0 and self._keys.get(key) is entry:
+                del self._keys[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "active_keys": len(self._keys),
+            "waiting": sum(max(e[1] - 1, 0) for e in self._keys.values()),
+            "max_waiting_per_key": self._max_waiting,
+            "processed": self._processed,
+            "errors": self._errors,
+        }
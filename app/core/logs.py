@@ -0,0 +1,303 @@
+## logging estruturado (JSON lines) sem I/O no caminho quente: QueueHandler -> thread escritora
+from __future__ import annotations
+
+import contextvars
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core import fastjson
+from app.core.config import settings
+
+ROOT = "app"
+
+# ids da requisição/trace corrente (setados pelo middleware e pelos workers)
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def bind_log_context(request_id: Optional[str] = None, trace_id: Optional[str] = None) -> None:
+    """Seta os ids no contexto atual (request / task). trace_id herda o request_id se vazio."""
+    if request_id:
+        request_id_var.set(request_id)
+    trace = trace_id or request_id
+    if trace:
+        trace_id_var.set(trace)
+
+
+def _parse_map(raw: str) -> Dict[str, str]:
+    # "chatwoot.http=0.1,evolution.webhook=0.5"
+    out: Dict[str, str] = {}
+    for part in (raw or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            if k.strip() and v.strip():
+                out[k.strip()] = v.strip()
+    return out
+
+
+def _category(record: logging.LogRecord) -> str:
+    name = record.name
+    return name[len(ROOT) + 1:] if name.startswith(ROOT + ".") else name
+
+
+class _ContextFilter(logging.Filter):
+    """Roda no caminho quente: só anexa os ids do contexto e aplica a amostragem."""
+
+    def __init__(self, sampling: Dict[str, float]):
+        super().__init__()
+        self.sampling = sampling
+        self.sampled_out = 0
+
+    def _rate(self, category: str) -> Optional[float]:
+        # categoria mais específica primeiro: "chatwoot.http" antes de "chatwoot"
+        while category:
+            rate = self.sampling.get(category)
+            if rate is not None:
+                return rate
+            category = category.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # warning/erro nunca são amostrados
+        if record.levelno < logging.WARNING and self.sampling:
+            rate = self._rate(_category(record))
+            if rate is not None and random.random() >= rate:
+                self.sampled_out += 1
+                return False
+
+        record.request_id = request_id_var.get()
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    put_nowait numa fila limitada: com a fila cheia o registro é descartado e contado,
+    em vez de travar o request. A formatação fica toda na thread escritora.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # resolve msg % args aqui (args podem mudar depois); sem formatar JSON
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "category": _category(record),
+            "event": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            doc["request_id"] = record.request_id
+        if getattr(record, "trace_id", None):
+            doc["trace_id"] = record.trace_id
+
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED and k not in ("request_id", "trace_id") and not k.startswith("_"):
+                doc[k] = v
+
+        if record.exc_text:
+            doc["exc"] = record.exc_text
+
+        return fastjson.dumps(doc).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legado "EVENTO: k=v" (LOG_FORMAT=text), útil em dev."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(
+            f"{k}={v}" for k, v in record.__dict__.items()
+            if k not in _RESERVED and k not in ("request_id", "trace_id") and not k.startswith("_")
+        )
+        trace = f" trace={record.trace_id}" if getattr(record, "trace_id", None) else ""
+        line = f"{record.getMessage()}:{trace} {fields}".rstrip()
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _LogState:
+    lock = threading.Lock()
+    listener: Optional[logging.handlers.QueueListener] = None
+    handler: Optional[NonBlockingQueueHandler] = None
+    context_filter: Optional[_ContextFilter] = None
+
+
+def setup_logging() -> None:
+    """
+    Idempotente. Liga o logger raiz `app` (e o root, pros loggers da stdlib) num
+    QueueHandler; uma QueueListener escreve no stdout fora do event loop.
+    """
+    with _LogState.lock:
+        if _LogState.listener is not None:
+            return
+
+        q: queue.Queue = queue.Queue(maxsize=max(int(settings.LOG_QUEUE_SIZE), 1))
+        handler = NonBlockingQueueHandler(q)
+        sampling = {k: float(v) for k, v in _parse_map(settings.LOG_SAMPLING).items()}
+        context_filter = _ContextFilter(sampling)
+        handler.addFilter(context_filter)
+
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+        listener = logging.handlers.QueueListener(q, out, respect_handler_level=False)
+        listener.start()
+
+        app_logger = logging.getLogger(ROOT)
+        app_logger.setLevel(settings.LOG_LEVEL.upper())
+        app_logger.addHandler(handler)
+        app_logger.propagate = False
+
+        root = logging.getLogger()
+        root.addHandler(handler)
+        if root.level == logging.NOTSET or root.level > logging.WARNING:
+            root.setLevel(logging.WARNING)
+
+        for category, level in _parse_map(settings.LOG_CATEGORY_LEVELS).items():
+            logging.getLogger(f"{ROOT}.{category}").setLevel(level.upper())
+
+        _LogState.listener = listener
+        _LogState.handler = handler
+        _LogState.context_filter = context_filter
+
+
+def shutdown_logging() -> None:
+    """Drena a fila e para a thread escritora (shutdown do app)."""
+    with _LogState.lock:
+        listener, handler = _LogState.listener, _LogState.handler
+        if listener is None:
+            return
+        logging.getLogger(ROOT).removeHandler(handler)
+        logging.getLogger().removeHandler(handler)
+        listener.stop()
+        _LogState.listener = None
+        _LogState.handler = None
+        _LogState.context_filter = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    handler, context_filter = _LogState.handler, _LogState.context_filter
+    return {
+        "running": _LogState.listener is not None,
+        "format": settings.LOG_FORMAT,
+        "queue_depth": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "sampled_out": context_filter.sampled_out if context_filter else 0,
+    }
+
+
+class EventLogger:
+    """
+    Logger de eventos: `log.info("EVOLUTION_IGNORED", {...})` ou `log.info("EVOLUTION_IGNORED", reason=...)`.
+    O nome do evento vira "event"; o dict/kwargs viram campos do JSON.
+    O isEnabledFor() evita montar o registro quando a categoria está silenciada.
+    """
+
+    __slots__ = ("logger",)
+
+    def __init__(self, category: str):
+        self.logger = logging.getLogger(f"{ROOT}.{category}")
+
+    def is_enabled(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def _log(self, level: int, event: str, fields: Optional[Dict[str, Any]], kw: Dict[str, Any], exc_info: Any = None) -> None:
+        if self.logger.isEnabledFor(level):
+            merged = {**fields, **kw} if fields else kw
+            # campos com nome reservado do LogRecord ganham prefixo pra não colidir
+            extra = {(f"f_{k}" if k in _RESERVED else k): v for k, v in merged.items()}
+            self.logger.log(level, event, extra=extra, exc_info=exc_info)
+
+    def debug(self, event: str, fields: Optional[Dict[str, Any]] = None, **kw: Any) -> None:
+        self._log(logging.DEBUG, event, fields, kw)
+
+    def info(self, event: str, fields: Optional[Dict[str, Any]] = None, **kw: Any) -> None:
+        self._log(logging.INFO, event, fields, kw)
+
+    def warning(self, event: str, fields: Optional[Dict[str, Any]] = None, **kw: Any) -> None:
+        self._log(logging.WARNING, event, fields, kw)
+
+    def error(self, event: str, fields: Optional[Dict[str, Any]] = None, exc_info: Any = None, **kw: Any) -> None:
+        self._log(logging.ERROR, event, fields, kw, exc_info=exc_info)
+
+
+def get_logger(category: str) -> EventLogger:
+    return EventLogger(category)
+
+
+def _trace_from_headers(headers: Dict[bytes, bytes]) -> Optional[str]:
+    # W3C traceparent: "00-<trace_id>-<span_id>-<flags>"
+    tp = headers.get(b"traceparent")
+    if tp:
+        parts = tp.decode("latin-1").split("-")
+        if len(parts) >= 2 and parts[1]:
+            return parts[1]
+    xt = headers.get(b"x-trace-id")
+    return xt.decode("latin-1") if xt else None
+
+
+class RequestContextMiddleware:
+    """
+    Middleware ASGI puro: seta request_id/trace_id (X-Request-ID / traceparent / X-Trace-Id,
+    ou gerados) no contexto do request e devolve o X-Request-ID na resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = (headers.get(b"x-request-id") or b"").decode("latin-1") or new_id()
+        trace_id = _trace_from_headers(headers) or request_id
+
+        request_token = request_id_var.set(request_id)
+        trace_token = trace_id_var.set(trace_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers") or []) + [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(request_token)
+            trace_id_var.reset(trace_token)
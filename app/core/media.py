@@ -0,0 +1,142 @@
+## relay de mídia: base64 (Evolution) -> upload multipart (Chatwoot) sem cópias intermediárias
+from __future__ import annotations
+
+import base64
+import binascii
+import io
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class MediaTooLarge(ValueError):
+    """Mídia acima de EVOLUTION_MEDIA_MAX_BYTES."""
+
+
+def base64_response_limit(max_bytes: Optional[int] = None) -> int:
+    """Teto da resposta JSON que traz a mídia em base64: 4/3 do limite + folga pros outros campos."""
+    limit = settings.EVOLUTION_MEDIA_MAX_BYTES if max_bytes is None else max_bytes
+    return (limit + 2) // 3 * 4 + 64 * 1024
+
+
+class Base64Reader(io.RawIOBase):
+    """
+    Arquivo somente-leitura sobre uma string base64: decodifica sob demanda,
+    em blocos alinhados de 4 caracteres, só o trecho pedido em cada read().
+
+    É seekable (base64 tem acesso aleatório), então o httpx consegue medir o
+    tamanho (Content-Length) e rebobinar o arquivo num retry sem decodificar tudo.
+    """
+
+    def __init__(self, data: str):
+        super().__init__()
+
+        start = 0
+        if data.startswith("data:"):
+            comma = data.find(",")
+            start = comma + 1 if comma != -1 else 0
+
+        end = len(data)
+        while end > start and data[end - 1] in " \r\n\t":
+            end -= 1
+
+        # base64 com quebras de linha (MIME) perde o alinhamento de 4 chars: normaliza (raro)
+        if any(data.find(ch, start, end) != -1 for ch in "\n\r "):
+            data = "".join(data[start:end].split())
+            start, end = 0, len(data)
+
+        if (end - start) % 4 != 0:
+            raise ValueError("base64 inválido: tamanho não é múltiplo de 4")
+
+        padding = 0
+        if end > start and data[end - 1] == "=":
+            padding = 2 if data[end - 2] == "=" else 1
+
+        self._data = data
+        self._start = start
+        self._end = end
+        self._size = (end - start) // 4 * 3 - padding
+        self._pos = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+
+        self._pos = max(0, min(pos, self._size))
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._size - self._pos)
+        if n <= 0:
+            return 0
+
+        # grupos de 4 chars (3 bytes) que cobrem [pos, pos + n)
+        first_group = self._pos // 3
+        last_group = (self._pos + n - 1) // 3
+        c0 = self._start + first_group * 4
+        c1 = self._start + (last_group + 1) * 4
+
+        try:
+            decoded = base64.b64decode(self._data[c0:c1], validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"base64 inválido: {e}") from e
+
+        skip = self._pos - first_group * 3
+        chunk = decoded[skip:skip + n]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+
+def extract_base64_payload(evo_media: Dict[str, Any]) -> Optional[str]:
+    """Acha o campo base64 na resposta do getBase64FromMediaMessage (varia entre versões)."""
+    possible_base64 = (
+        evo_media.get("base64")
+        or evo_media.get("data")
+        or evo_media.get("media")
+        or evo_media.get("file")
+        or evo_media.get("buffer")
+    )
+
+    if isinstance(possible_base64, dict):
+        possible_base64 = (
+            possible_base64.get("base64")
+            or possible_base64.get("data")
+        )
+
+    if not possible_base64 or not isinstance(possible_base64, str):
+        return None
+
+    return possible_base64
+
+
+def open_base64_media(data: str, max_bytes: Optional[int] = None) -> Base64Reader:
+    """
+    Abre a mídia base64 como arquivo (leitura em blocos) para upload multipart.
+    Levanta MediaTooLarge antes de decodificar qualquer byte se passar do limite.
+    """
+    raw = Base64Reader(data)
+    limit = settings.EVOLUTION_MEDIA_MAX_BYTES if max_bytes is None else max_bytes
+    if limit and raw.size > limit:
+        raise MediaTooLarge(f"mídia com {raw.size} bytes (limite {limit})")
+
+    return raw
@@ -0,0 +1,209 @@
+## cache de mídia em disco endereçado por conteúdo (sha256), com limite de tamanho e despejo LRU
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Any, BinaryIO, Dict, Optional
+
+from app.core.config import settings
+from app.core.logs import get_logger
+
+_log = get_logger("media")
+_COPY_CHUNK = 64 * 1024
+
+
+def normalize_sha256(value: Any) -> Optional[str]:
+    """
+    fileSha256 do WhatsApp chega como base64 (JSON da Evolution), hex ou Buffer
+    serializado ({"0": 12, "1": 200, ...}). Devolve sempre hex minúsculo ou None.
+    """
+    raw: Optional[bytes] = None
+
+    if isinstance(value, str):
+        v = value.strip()
+        if len(v) == 64:
+            try:
+                bytes.fromhex(v)
+                return v.lower()
+            except ValueError:
+                pass
+        try:
+            raw = base64.b64decode(v, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+
+    elif isinstance(value, dict):
+        try:
+            raw = bytes(int(value[k]) for k in sorted(value, key=lambda k: int(k)))
+        except (TypeError, ValueError):
+            return None
+
+    elif isinstance(value, (list, bytes, bytearray)):
+        try:
+            raw = bytes(value)
+        except (TypeError, ValueError):
+            return None
+
+    if raw is None or len(raw) != 32:
+        return None
+
+    return raw.hex()
+
+
+class MediaStore:
+    """
+    Arquivos em <root>/<aa>/<sha256>. O mtime é o "último uso": get() toca o arquivo
+    e o despejo remove os mais antigos até voltar abaixo de max_bytes.
+
+    put() grava em arquivo temporário calculando o sha256 no caminho; se não bater
+    com a chave, descarta (nunca serve conteúdo errado para um hash).
+    """
+
+    def __init__(self, root: str, max_bytes: int, name: str = "media_store"):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _path(self, sha256_hex: str) -> str:
+        return os.path.join(self.root, sha256_hex[:2], sha256_hex)
+
+    def _scan(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for fn in filenames:
+                if fn.endswith(".tmp"):
+                    continue
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, fn))
+                except OSError:
+                    pass
+        return total
+
+    def _ensure_total(self) -> int:
+        if self._total_bytes is None:
+            self._total_bytes = self._scan()
+        return self._total_bytes
+
+    def get(self, sha256_hex: str) -> Optional[str]:
+        path = self._path(sha256_hex)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, sha256_hex: str, stream: BinaryIO) -> Optional[str]:
+        """Copia `stream` (do início) pro cache. Devolve o caminho, ou None se o hash não bateu."""
+        path = self._path(sha256_hex)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        stream.seek(0)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                chunk = stream.read(_COPY_CHUNK)
+                while chunk:
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                    chunk = stream.read(_COPY_CHUNK)
+
+            if digest.hexdigest() != sha256_hex:
+                os.unlink(tmp_path)
+                with self._lock:
+                    self.rejected += 1
+                _log.warning("MEDIA_STORE_HASH_MISMATCH", expected=sha256_hex, got=digest.hexdigest())
+                return None
+
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self.stores += 1
+            if not existed:
+                self._ensure_total()
+                self._total_bytes += size
+            over = self._total_bytes > self.max_bytes
+
+        if over:
+            self.evict()
+
+        return path
+
+    def evict(self) -> int:
+        """Remove os menos usados (mtime mais antigo) até ficar em 90% do limite."""
+        with self._lock:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for fn in filenames:
+                    if fn.endswith(".tmp"):
+                        continue
+                    full = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, full))
+
+            total = sum(e[1] for e in entries)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+
+            for _, size, full in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(full)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+
+            self._total_bytes = total
+            self.evictions += removed
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "root": self.root,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+media_store = MediaStore(
+    root=settings.MEDIA_CACHE_DIR,
+    max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+)
@@ -7,6 +7,15 @@ from app.api.models.google_token import GoogleToken
 from app.api.models.disponibilidade import ProfissionalDisponibilidade
 from app.api.models.conversation_context import ConversationContext
 from app.api.models.appointment import Appointment   # <- importar também
+from app.api.models.evolution_inbound_event import EvolutionInboundEvent
+from app.api.models.processed_message import ProcessedMessage
+from app.api.models.chatwoot_phone_link import ChatwootPhoneLink
+from app.api.models.webhook_dead_letter import WebhookDeadLetter
+from app.api.models.outbound_message import OutboundMessage
+from app.api.models.google_calendar_event import GoogleCalendarEvent
+from app.api.models.google_calendar_sync_state import GoogleCalendarSyncState
+from app.api.models.google_calendar_channel import GoogleCalendarChannel
+from app.api.models.cache_version import CacheVersion
 
 # Se futuramente tiver mais modelos, importe aqui
 
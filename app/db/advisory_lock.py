@@ -0,0 +1,27 @@
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+# namespaces (1º argumento do lock de 2 chaves) — um por recurso coordenado entre processos
+LOCK_GOOGLE_TOKEN_REFRESH = 1001
+LOCK_GOOGLE_CALENDAR_WATCH = 1003
+
+
+def advisory_xact_lock(db: Session, namespace: int, key: int, wait_seconds: float, poll_seconds: float = 0.05) -> bool:
+    """
+    pg_try_advisory_xact_lock(namespace, key) em loop até `wait_seconds`.
+    O lock é da transação da sessão: sai no commit/rollback.
+    Retorna False se não conseguiu no prazo. Fora do Postgres (sqlite local) não há
+    outros processos a coordenar: retorna True direto.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+
+    deadline = time.monotonic() + max(float(wait_seconds), 0.0)
+    while True:
+        if db.execute(select(func.pg_try_advisory_xact_lock(int(namespace), int(key)))).scalar():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_seconds)
@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session, model):
+    """
+    INSERT com suporte a ON CONFLICT (on_conflict_do_nothing / on_conflict_do_update)
+    no dialeto da sessão. Produção é Postgres; sqlite só pra rodar local.
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"insert-on-conflict não suportado no dialeto {dialect}")
+
+    return insert(model)
@@ -17,7 +17,21 @@ from app.api.endpoints import finance
 from app.api.endpoints import analytics
 from app.api.endpoints import patients
 from app.api.endpoints import reminders
+from app.api.endpoints import ops
+from app.api.endpoints import google_calendar_push
 from app.api.routes import payment_config
+from app.core.background import register_periodic, start_background_tasks, stop_background_tasks
+from app.api.services.evolution_ingest_service import EvolutionIngestService
+from app.api.services.message_dedup_service import MessageDedupService
+from app.api.services.dead_letter_service import DeadLetterService
+from app.api.services.outbound_dispatcher import OutboundDispatcher
+from app.api.services.google_token_service import GoogleTokenManager
+from app.api.services.google_calendar_sync_service import GoogleCalendarSyncService
+from app.api.services.google_calendar_watch_service import GoogleCalendarWatchService
+from app.core.http import close_async_client, close_sessions
+from app.core.logs import RequestContextMiddleware, setup_logging, shutdown_logging
+
+setup_logging()
 
 app = FastAPI(
     title="SaaS Secretaria Inteligente",
@@ -51,6 +65,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestContextMiddleware)
+
 
 app.include_router(google.router)
 app.include_router(auth.router)
@@ -76,6 +92,8 @@ app.include_router(analytics.router)
 app.include_router(patients.router)
 app.include_router(reminders.router)
 app.include_router(payment_config.router)
+app.include_router(ops.router)
+app.include_router(google_calendar_push.router)
 
 # Exemplo: Usando uma variável de configuração
 @app.get("/")
@@ -91,6 +109,64 @@ def startup_log():
     safe = re.sub(r":([^:@/]+)@", ":***@", settings.DATABASE_URL)
     logger.warning("STARTUP DATABASE_URL = %s", safe)
 
+
+@app.on_event("startup")
+async def start_workers():
+    # lanes por conversa do modo fila (o inline serializa por chave, sem lanes)
+    await EvolutionIngestService.start(processor=evolution_webhooks.process_evolution_event)
+
+    if settings.EVOLUTION_INGEST_MODE == "queue":
+        register_periodic(
+            "evolution_ingest_requeue",
+            settings.EVOLUTION_INGEST_POLL_SECONDS,
+            EvolutionIngestService.requeue_due,
+        )
+
+    register_periodic("message_dedup_purge", 3600, MessageDedupService.purge_expired)
+
+    DeadLetterService.register("evolution", evolution_webhooks.replay_evolution_event)
+    DeadLetterService.register("chatwoot", tenant_integration.replay_chatwoot_event)
+    register_periodic("dead_letter_retry", settings.DEAD_LETTER_POLL_SECONDS, DeadLetterService.retry_due)
+
+    # fila de saída do WhatsApp (por instância); o poller cobre retry e restart
+    await OutboundDispatcher.start()
+    register_periodic("outbound_requeue", settings.OUTBOUND_POLL_SECONDS, OutboundDispatcher.requeue_due)
+
+    if settings.GOOGLE_TOKEN_PREREFRESH_ENABLED:
+        register_periodic(
+            "google_token_prerefresh",
+            settings.GOOGLE_TOKEN_PREREFRESH_POLL_SECONDS,
+            GoogleTokenManager.prerefresh_due,
+        )
+
+    # sync completo do espelho (1º sync / 410) fora do request
+    register_periodic(
+        "google_calendar_full_sync",
+        settings.GOOGLE_CALENDAR_FULL_SYNC_POLL_SECONDS,
+        GoogleCalendarSyncService.full_sync_due,
+    )
+
+    # push do Google Calendar: notificação -> sync incremental só do calendário alterado
+    GoogleCalendarWatchService.start()
+    if settings.GOOGLE_CALENDAR_WATCH_ENABLED:
+        register_periodic(
+            "google_calendar_watch_renew",
+            settings.GOOGLE_CALENDAR_WATCH_RENEW_POLL_SECONDS,
+            GoogleCalendarWatchService.renew_due,
+        )
+    await start_background_tasks()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await stop_background_tasks()
+    await EvolutionIngestService.stop()
+    await OutboundDispatcher.stop()
+    await GoogleCalendarWatchService.stop_workers()
+    await close_async_client()
+    close_sessions()
+    shutdown_logging()
+
 # Incluindo as rotas
 # app.include_router(users.router, prefix="/api/users", tags=["users"])
 # app.include_router(whatsapp.router, prefix="/api/whatsapp", tags=["whatsapp"])
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 
 class GoogleEventCreateIn(BaseModel):
     user_id: int = Field(..., ge=1)
@@ -44,3 +44,45 @@ class GoogleEventOut(BaseModel):
     allDay: bool = False
     location: Optional[str] = None
     description: Optional[str] = None
+
+
+class GoogleEventBulkOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    calendar_id: str = "primary"
+    event_id: Optional[str] = None  # update/delete
+    title: Optional[str] = None
+    description: Optional[str] = None
+    location: Optional[str] = None
+    start: Optional[str] = None  # RFC3339 com offset
+    end: Optional[str] = None
+    timezone: Optional[str] = "America/Sao_Paulo"
+
+class GoogleEventBulkIn(BaseModel):
+    user_id: int = Field(..., ge=1)
+    operations: List[GoogleEventBulkOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class GoogleEventDateTimeOut(BaseModel):
+    date: Optional[str] = None  # dia inteiro (YYYY-MM-DD)
+    dateTime: Optional[str] = None
+    timeZone: Optional[str] = None
+
+class GoogleEventListItemOut(BaseModel):
+    """Evento do espelho local: só os campos sincronizados (EVENT_FIELDS), com os nomes do Google."""
+    id: str
+    status: Optional[str] = None
+    summary: Optional[str] = None
+    description: Optional[str] = None
+    location: Optional[str] = None
+    start: Optional[GoogleEventDateTimeOut] = None
+    end: Optional[GoogleEventDateTimeOut] = None
+    htmlLink: Optional[str] = None
+    updated: Optional[str] = None
+    recurringEventId: Optional[str] = None
+    originalStartTime: Optional[GoogleEventDateTimeOut] = None
+    transparency: Optional[str] = None
+
+class GoogleEventListOut(BaseModel):
+    total: int
+    filtered: bool
+    events: List[GoogleEventListItemOut]
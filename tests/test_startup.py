@@ -0,0 +1,44 @@
+## smoke test: a app sobe (startup/shutdown) e registra as tarefas de background
+import os
+import tempfile
+
+_ENV = {
+    "ENV": "test",
+    "SECRET_KEY": "x",
+    "BASE_URL": "http://x",
+    "N8N_API_KEY": "k",
+    "CHATWOOT_BASE_URL": "http://cw",
+    "CHATWOOT_API_TOKEN": "t",
+    "CHATWOOT_WEBHOOK_SECRET": "s",
+    "CHATWOOT_ACCOUNT_ID": "1",
+    "EVOLUTION_BASE_URL": "http://evo",
+    "EVOLUTION_API_KEY": "k",
+    "EVOLUTION_WEBHOOK_SECRET": "s",
+    "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db"),
+    "DB_USER": "u",
+    "DB_PASSWORD": "p",
+    "DB_HOST": "h",
+    "DB_NAME": "d",
+    "WHATSAPP_API_BASE_URL": "http://w",
+    "WHATSAPP_PARTNER_TOKEN": "t",
+    "WHATSAPP_WEBHOOK_URL": "http://w",
+    "GOOGLE_CLIENT_ID": "c",
+    "GOOGLE_CLIENT_SECRET": "s",
+    "GOOGLE_REDIRECT_URI": "http://x",
+    "GOOGLE_REDIRECT_URI_AGENDA": "http://x",
+    "GOOGLE_SCOPES": "a,b",
+}
+for _k, _v in _ENV.items():
+    os.environ.setdefault(_k, _v)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.background import background_tasks_info  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def test_startup_registers_background_tasks():
+    with TestClient(app) as client:
+        assert client.get("/").status_code == 200
+        names = {t["name"] for t in background_tasks_info()}
+        assert {"dead_letter_retry", "outbound_requeue", "google_calendar_full_sync"} <= names